@@ -0,0 +1,271 @@
+import argparse
+import json
+import time
+import multiprocessing as mp
+import numpy as np
+from itertools import combinations
+from leduc.game.card import Card
+from leduc.game.hand_eval import evaluate, leduc_evaluate
+from leduc.abstraction.indexer import hand_indexer
+
+
+def leduc_game(card_ids=None):
+    """Equity settings of Leduc Hold'em
+
+    Args:
+        card_ids: list of ints of the deck (see Card.id), the 6 card deck
+            of main.py if None
+
+    Returns:
+        dict: equity settings, see GAMES
+    """
+    if card_ids is None:
+        card_ids = [Card(rank, suit).id for rank in (12, 13, 14) for suit in (1, 2)]
+    return {'name': 'leduc', 'deck': sorted(card_ids), 'hole_cards': 1, 'board_cards': [0, 1],
+        'evaluate': leduc_evaluate}
+
+
+def holdem_game(card_ids=None):
+    """Equity settings of Texas Hold'em, with the board_cards of HoldemConfig"""
+    if card_ids is None:
+        card_ids = [Card(rank, suit).id for rank in range(2, 15) for suit in range(1, 5)]
+    return {'name': 'holdem', 'deck': sorted(card_ids), 'hole_cards': 2, 'board_cards': [0, 3, 4, 5],
+        'evaluate': evaluate}
+
+
+# Equity settings are dicts of the deck ('deck', ints of Card.id), the
+# cards of each player ('hole_cards'), the board dealt by each round
+# ('board_cards') and a batched evaluator of (n, k) card ids, hole cards
+# first ('evaluate')
+GAMES = {'leduc': leduc_game, 'holdem': holdem_game}
+
+
+def num_cards(game, street):
+    """int number of cards a player sees on a street"""
+    return game['hole_cards'] + game['board_cards'][street]
+
+
+def _combinations(n, size):
+    combos = list(combinations(range(n), size))
+    return np.array(combos, dtype=np.int64).reshape(len(combos), size)
+
+
+def equities(game, cards, runouts=None, opponents=None, rng=np.random):
+    """Equity of a situation against one random hand, per runout of the board
+
+    Args:
+        game: dict of equity settings
+        cards: array_like (k,) of card ids, hole cards then the board
+        runouts: int number of sampled runouts of the board, all of them if None
+        opponents: int number of sampled opponent hands per runout, all of them if None
+        rng: numpy random generator
+
+    Returns:
+        array_like: (R,) floats of the probability of winning plus half the
+            probability of a tie after each runout
+    """
+    cards = np.asarray(cards, dtype=np.int64)
+    hole_size = game['hole_cards']
+    final = hole_size + game['board_cards'][-1]
+    need = final - len(cards)
+    deck = np.array(game['deck'], dtype=np.int64)
+    live = deck[~np.isin(deck, cards)]
+
+    if runouts is None or need == 0:
+        positions = _combinations(len(live), need)
+    else:
+        positions = rng.random((runouts, len(live))).argsort(axis=1)[:, :need]
+    boards = live[positions]
+    num_runouts = len(boards)
+
+    if opponents is None:
+        opponent_cards = live[_combinations(len(live), hole_size)]
+        opponent_masks = np.bitwise_or.reduce(np.left_shift(1, opponent_cards), axis=1)
+        board_masks = np.bitwise_or.reduce(np.left_shift(1, boards), axis=1) if need else np.zeros(num_runouts, dtype=np.int64)
+        valid = (board_masks[:, None] & opponent_masks[None, :]) == 0
+        opponent_cards = np.broadcast_to(opponent_cards, (num_runouts,) + opponent_cards.shape)
+    else:
+        # cards of the runout sort last so opponents are dealt from the rest
+        order = rng.random((num_runouts, opponents, len(live)))
+        np.put_along_axis(order, np.broadcast_to(positions[:, None, :], (num_runouts, opponents, need)), 2, axis=2)
+        opponent_cards = live[order.argsort(axis=2)[..., :hole_size]]
+        valid = np.ones((num_runouts, opponents), dtype=bool)
+
+    public = np.hstack([np.broadcast_to(cards[hole_size:], (num_runouts, len(cards) - hole_size)), boards])
+    hero = game['evaluate'](np.hstack([np.broadcast_to(cards[:hole_size], (num_runouts, hole_size)), public]))
+
+    num_opponents = opponent_cards.shape[1]
+    hands = np.concatenate([opponent_cards,
+        np.broadcast_to(public[:, None, :], (num_runouts, num_opponents, public.shape[1]))], axis=2)
+    villain = np.zeros((num_runouts, num_opponents), dtype=hero.dtype)
+    villain[valid] = game['evaluate'](hands[valid])
+
+    score = (hero[:, None] > villain) + .5 * (hero[:, None] == villain)
+    return (score * valid).sum(axis=1) / valid.sum(axis=1)
+
+
+class EquityTable:
+    """Expected hand strength and equity histograms of a street
+
+    Each row holds a canonical situation: its expected hand strength
+    (EHS, the equity against one random hand averaged over the runouts of
+    the board) and the histogram of its equity over those runouts, the
+    features card abstraction clusters on. The row of a situation is its
+    index in the game's HandIndexer, so the tables are plain arrays that
+    can stay memory mapped on disk.
+
+    Attributes:
+        game: dict of equity settings
+        street: int betting round
+        ehs: array_like (n,) of float32 expected hand strength
+        hist: array_like (n, bins) of float32 fraction of runouts per equity bin
+    """
+    def __init__(self, game, street, ehs, hist):
+        self.game = game
+        self.street = street
+        self.ehs = ehs
+        self.hist = hist
+
+    def __len__(self):
+        return len(self.ehs)
+
+    @property
+    def bins(self):
+        return self.hist.shape[1]
+
+    def rows(self, cards):
+        """Rows of many situations
+
+        Args:
+            cards: array_like (n, k) of card ids, hole cards then the board
+
+        Returns:
+            array_like: (n,) ints of rows
+        """
+        return street_index(self.game, self.street, cards)
+
+    def lookup(self, hole_cards, board):
+        """EHS and equity histogram of hole cards and a board of Card
+
+        Returns:
+            tuple: float EHS and array_like (bins,) of the histogram
+        """
+        row = self.rows([[card.id for card in hole_cards] + [card.id for card in board]])[0]
+        return float(self.ehs[row]), self.hist[row]
+
+    def save(self, path):
+        """Writes the table as path.json and a .npy file per array"""
+        with open(path + '.json', 'w') as f:
+            json.dump({'game': self.game['name'], 'deck': self.game['deck'], 'street': self.street}, f)
+        np.save(path + '.ehs.npy', self.ehs)
+        np.save(path + '.hist.npy', self.hist)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Reads a table written by save, memory mapped by default"""
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        game = GAMES[meta['game']](meta['deck'])
+        return cls(game, meta['street'], np.load(path + '.ehs.npy', mmap_mode=mmap_mode),
+            np.load(path + '.hist.npy', mmap_mode=mmap_mode))
+
+
+def street_index(game, street, cards):
+    """Indexes of many situations of a street in the game's HandIndexer
+
+    Args:
+        game: dict of equity settings
+        street: int betting round
+        cards: array_like (n, k) of card ids, hole cards then the board
+
+    Returns:
+        array_like: (n,) int64 indexes
+    """
+    cards = np.asarray(cards, dtype=np.int64)
+    if cards.shape[1] != num_cards(game, street):
+        raise ValueError('Street {} situations hold {} cards, not {}'.format(
+            street, num_cards(game, street), cards.shape[1]))
+    return hand_indexer(game).index(cards)
+
+
+def situations(game, street):
+    """int number of canonical situations of a street"""
+    indexer = hand_indexer(game)
+    return indexer.size(indexer.round_of(num_cards(game, street)))
+
+
+_worker = {}
+
+
+def _init_worker(game, street, runouts, opponents, bins):
+    _worker.update(game=game, street=street, runouts=runouts, opponents=opponents, bins=bins)
+
+
+def _equity_rows(seed, start, stop):
+    rng = np.random.default_rng(seed)
+    game = _worker['game']
+    bins = _worker['bins']
+    indexer = hand_indexer(game)
+    deals = indexer.unindex(indexer.round_of(num_cards(game, _worker['street'])), np.arange(start, stop))
+
+    ehs = np.zeros(len(deals), dtype=np.float32)
+    hist = np.zeros((len(deals), bins), dtype=np.float32)
+    for i, cards in enumerate(deals):
+        equity = equities(game, cards, _worker['runouts'], _worker['opponents'], rng)
+        ehs[i] = equity.mean()
+        counts = np.bincount(np.minimum((equity * bins).astype(int), bins - 1), minlength=bins)
+        hist[i] = counts / len(equity)
+
+    return ehs, hist
+
+
+def build(game, street, runouts=None, opponents=None, bins=50, processes=None, seed=0, chunk=256):
+    """Computes the equity table of a street over a pool of processes
+
+    Args:
+        game: dict of equity settings
+        street: int betting round
+        runouts: int number of sampled board runouts per situation, all if None
+        opponents: int number of sampled opponent hands per runout, all if None
+        bins: int number of equity histogram bins
+        processes: int number of processes, defaults to the cpu count
+        seed: int base random seed
+        chunk: int number of situations per task
+
+    Returns:
+        EquityTable: the table of every canonical situation of the street
+    """
+    size = situations(game, street)
+    tasks = [(seed + i, start, min(start + chunk, size)) for i, start in enumerate(range(0, size, chunk))]
+
+    if 'fork' in mp.get_all_start_methods():
+        context = mp.get_context('fork')
+    else:
+        context = mp.get_context()
+
+    with context.Pool(processes, initializer=_init_worker,
+            initargs=(game, street, runouts, opponents, bins)) as pool:
+        results = pool.starmap(_equity_rows, tasks)
+
+    ehs = np.concatenate([result[0] for result in results])
+    hist = np.concatenate([result[1] for result in results])
+    return EquityTable(game, street, ehs, hist)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Expected hand strength and equity histograms of a street')
+    parser.add_argument('-g', '--game', default='leduc', choices=sorted(GAMES), help='game of the table')
+    parser.add_argument('-r', '--street', default=0, type=int, help='betting round (0 is preflop)')
+    parser.add_argument('--runouts', default=0, type=int, help='sampled board runouts per situation (0 for all)')
+    parser.add_argument('--opponents', default=0, type=int, help='sampled opponent hands per runout (0 for all)')
+    parser.add_argument('-b', '--bins', default=50, type=int, help='number of equity histogram bins')
+    parser.add_argument('-p', '--processes', default=None, type=int, help='number of processes')
+    parser.add_argument('-s', '--seed', default=0, type=int, help='random seed')
+    parser.add_argument('-o', '--output', required=True, help='path prefix of the table files')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = build(GAMES[args.game](), args.street, args.runouts or None, args.opponents or None,
+        args.bins, args.processes, args.seed)
+    table.save(args.output)
+    print("{} situations in {:.1f}s, written to {}.*".format(len(table), time.perf_counter() - start, args.output))
@@ -0,0 +1,398 @@
+import numpy as np
+from math import comb
+
+
+_indexers = {}
+
+
+def hand_indexer(game):
+    """Gets the indexer of a game's deals, building it once per configuration
+
+    Args:
+        game: dict of equity settings (see equity.GAMES)
+
+    Returns:
+        HandIndexer: indexer of the hole cards then each deal of the board
+    """
+    board = game['board_cards']
+    rounds = [game['hole_cards']] + [board[i] - board[i - 1] for i in range(1, len(board)) if board[i] > board[i - 1]]
+    key = (tuple(game['deck']), tuple(rounds))
+    try:
+        return _indexers[key]
+    except KeyError:
+        indexer = _indexers[key] = HandIndexer(game['deck'], rounds)
+        return indexer
+
+
+def _comb(n, k):
+    """Vectorized binomial coefficient of int arrays, 0 when n < k"""
+    n = np.asarray(n, dtype=np.int64)
+    k = np.asarray(k, dtype=np.int64)
+    result = np.ones(np.broadcast(n, k).shape, dtype=np.int64)
+    for i in range(int(k.max(initial=0))):
+        result = np.where(i < k, result * np.maximum(n - i, 0) // (i + 1), result)
+    return result
+
+
+class HandIndexer:
+    """A perfect index of the suit isomorphic deals of a multi round game
+
+    Two deals are isomorphic when renaming the suits turns one into the
+    other, and then they play the same. For each round the indexer maps
+    every class of isomorphic (hole cards, board so far) deals to a dense
+    int in [0, size(round)) and back. See Waugh, "A Fast and Optimal Hand
+    Isomorphism Algorithm".
+
+    A deal is described per suit by the cards of that suit dealt each
+    round. The counts of each suit over the rounds, sorted, are the
+    configuration of the deal. Within a suit, the rank set of each round is
+    ranked in colex order among the ranks still undealt in that suit, and
+    the ranks of all the rounds are combined into a single suit index.
+    Suits with the same counts are interchangeable, so the indexes of such
+    a group are ranked as a multiset. A deal's index is the offset of its
+    configuration plus the mixed radix number of its group indexes.
+
+    Attributes:
+        rounds: list of int number of cards dealt each round (hole cards first)
+        ranks: list of int ranks of the deck (Card.rank)
+        suits: list of int suits of the deck, as Card.id % 4
+        configurations: list per round of tuples of each suit's counts per round
+        offsets: list per round of array_like of the first index of each
+            configuration, and the size of the round last
+    """
+    def __init__(self, deck, rounds):
+        """Builds the configurations of every round
+
+        Args:
+            deck: list of int card ids (see Card.id), every rank in every suit
+            rounds: list of int number of cards dealt each round
+        """
+        deck = sorted(deck)
+        self.ranks = sorted(set(card // 4 for card in deck))
+        self.suits = sorted(set(card % 4 for card in deck))
+        if len(deck) != len(self.ranks) * len(self.suits):
+            raise ValueError('The deck must hold every rank in every suit')
+
+        self.rounds = list(rounds)
+        num_ranks = len(self.ranks)
+        num_suits = len(self.suits)
+        # card id -> rank and suit position in the deck
+        self._rank = np.zeros(64, dtype=np.int64)
+        self._suit = np.zeros(64, dtype=np.int64)
+        for card in deck:
+            self._rank[card] = self.ranks.index(card // 4)
+            self._suit[card] = self.suits.index(card % 4)
+        self._popcount = np.array([bin(mask).count('1') for mask in range(1 << num_ranks)], dtype=np.int64)
+
+        self.configurations = []
+        self.offsets = []
+        self._codes = []
+        self._tables = []
+        suit_counts = [()]
+        for r, cards in enumerate(self.rounds):
+            suit_counts = [counts + (c,) for counts in suit_counts for c in range(min(cards, num_ranks) + 1)
+                if sum(counts) + c <= num_ranks]
+            configurations = self._configurations(suit_counts, self.rounds[:r + 1])
+            configurations = sorted(configurations, key=self._configuration_code)
+            sizes = [self._configuration_size(configuration) for configuration in configurations]
+            self.configurations.append(configurations)
+            self.offsets.append(np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64))
+            self._codes.append(np.array([self._configuration_code(c) for c in configurations], dtype=np.int64))
+            self._tables.append(self._configuration_tables(configurations))
+        self._configuration_of = [{int(code): i for i, code in enumerate(codes)} for codes in self._codes]
+        self._rank_of = self._rank.tolist()
+        self._suit_of = self._suit.tolist()
+
+    def _configurations(self, suit_counts, totals):
+        """Every deal of totals cards per round as non increasing suit counts"""
+        configurations = []
+
+        def extend(deal, remaining):
+            if len(deal) == len(self.suits):
+                if not any(remaining):
+                    configurations.append(tuple(deal))
+                return
+            for counts in suit_counts:
+                if (not deal or counts <= deal[-1]) and all(c <= left for c, left in zip(counts, remaining)):
+                    extend(deal + [counts], [left - c for c, left in zip(counts, remaining)])
+
+        extend([], list(totals))
+        return configurations
+
+    def _suit_code(self, counts):
+        code = 0
+        for r, count in enumerate(counts):
+            code = code * (self.rounds[r] + 1) + count
+        return code
+
+    def _configuration_code(self, configuration):
+        base = 1
+        for cards in self.rounds[:len(configuration[0])]:
+            base *= cards + 1
+        code = 0
+        for counts in configuration:
+            code = code * base + self._suit_code(counts)
+        return code
+
+    def _suit_size(self, counts):
+        """Number of rank sets per round of a suit with these counts"""
+        size = 1
+        used = 0
+        for count in counts:
+            size *= comb(len(self.ranks) - used, count)
+            used += count
+        return size
+
+    def _groups(self, configuration):
+        """Per suit position, its position in its group of equal suits and the group's size"""
+        groups = []
+        for i, counts in enumerate(configuration):
+            if i > 0 and counts == configuration[i - 1]:
+                groups.append(groups[-1] + 1)
+            else:
+                groups.append(1)
+        sizes = list(groups)
+        for i in range(len(configuration) - 2, -1, -1):
+            if configuration[i] == configuration[i + 1]:
+                sizes[i] = sizes[i + 1]
+        return groups, sizes
+
+    def _configuration_size(self, configuration):
+        groups, sizes = self._groups(configuration)
+        size = 1
+        for i, counts in enumerate(configuration):
+            if groups[i] == 1:
+                size *= comb(self._suit_size(counts) + sizes[i] - 1, sizes[i])
+        return size
+
+    def _configuration_tables(self, configurations):
+        """Per configuration and suit position: counts per round, suit size, group position and size"""
+        counts = np.array(configurations, dtype=np.int64)
+        suit_sizes = np.array([[self._suit_size(c) for c in configuration] for configuration in configurations],
+            dtype=np.int64)
+        groups = np.array([self._groups(configuration) for configuration in configurations], dtype=np.int64)
+        return {'counts': counts, 'suit_sizes': suit_sizes, 'position': groups[:, 0], 'group': groups[:, 1]}
+
+    def size(self, round):
+        """int number of isomorphism classes of deals up to a round"""
+        return int(self.offsets[round][-1])
+
+    def round_of(self, num_cards):
+        """Round whose deals hold num_cards cards"""
+        total = 0
+        for r, cards in enumerate(self.rounds):
+            total += cards
+            if total == num_cards:
+                return r
+        raise ValueError('No round deals {} cards'.format(num_cards))
+
+    def index(self, cards):
+        """Indexes many deals at once
+
+        Args:
+            cards: array_like (n, k) of card ids, the hole cards then the
+                board dealt by some round
+
+        Returns:
+            array_like: (n,) int64 indexes in [0, size(round))
+        """
+        cards = np.asarray(cards, dtype=np.int64)
+        n = len(cards)
+        last = self.round_of(cards.shape[1])
+        num_suits = len(self.suits)
+        num_ranks = len(self.ranks)
+        ranks = self._rank[cards]
+        suits = self._suit[cards]
+
+        used = np.zeros((n, num_suits), dtype=np.int64)
+        suit_index = np.zeros((n, num_suits), dtype=np.int64)
+        multiplier = np.ones((n, num_suits), dtype=np.int64)
+        suit_code = np.zeros((n, num_suits), dtype=np.int64)
+        start = 0
+        for r in range(last + 1):
+            rank = ranks[:, start:start + self.rounds[r]]
+            suit = suits[:, start:start + self.rounds[r]]
+            start += self.rounds[r]
+
+            # rank among the ranks of the suit not dealt in earlier rounds
+            used_mask = np.take_along_axis(used, suit, axis=1)
+            shifted = rank - self._popcount[used_mask & ((1 << rank) - 1)]
+            same_suit = suit[:, :, None] == suit[:, None, :]
+            below = (same_suit & (rank[:, None, :] < rank[:, :, None])).sum(axis=2)
+            colex = _comb(shifted, below + 1)
+            for s in range(num_suits):
+                in_suit = suit == s
+                count = in_suit.sum(axis=1)
+                suit_index[:, s] += multiplier[:, s] * (colex * in_suit).sum(axis=1)
+                multiplier[:, s] *= _comb(num_ranks - self._popcount[used[:, s]], count)
+                used[:, s] |= np.bitwise_or.reduce(np.where(in_suit, 1 << rank, 0), axis=1)
+                suit_code[:, s] = suit_code[:, s] * (self.rounds[r] + 1) + count
+
+        # canonical suit order: by counts, then by suit index, decreasing
+        order = np.argsort(-(suit_code * (multiplier.max() + 1) + suit_index), axis=1, kind='stable')
+        suit_code = np.take_along_axis(suit_code, order, axis=1)
+        suit_index = np.take_along_axis(suit_index, order, axis=1)
+
+        base = int(np.prod([cards + 1 for cards in self.rounds[:last + 1]]))
+        code = np.zeros(n, dtype=np.int64)
+        for s in range(num_suits):
+            code = code * base + suit_code[:, s]
+        configuration = np.searchsorted(self._codes[last], code)
+
+        tables = self._tables[last]
+        position = tables['position'][configuration]
+        group = tables['group'][configuration]
+        suit_sizes = tables['suit_sizes'][configuration]
+
+        index = self.offsets[last][configuration].copy()
+        radix = np.ones(n, dtype=np.int64)
+        part = np.zeros(n, dtype=np.int64)
+        for s in range(num_suits):
+            # suits of a group are sorted decreasing, add them as a multiset
+            k = group[:, s] - position[:, s] + 1
+            part += _comb(suit_index[:, s] + k - 1, k)
+            end = position[:, s] == group[:, s]
+            index += np.where(end, part * radix, 0)
+            radix *= np.where(end, _comb(suit_sizes[:, s] + group[:, s] - 1, group[:, s]), 1)
+            part = np.where(end, 0, part)
+
+        return index
+
+    def index_one(self, card_ids):
+        """Indexes a single deal with plain ints, the same index as index
+
+        Cheaper than index on a one row array when deals are looked up one
+        at a time, e.g. while training.
+
+        Args:
+            card_ids: sequence of card ids, the hole cards then the board
+                dealt by some round
+
+        Returns:
+            int: index in [0, size(round))
+        """
+        last = self.round_of(len(card_ids))
+        num_suits = len(self.suits)
+        num_ranks = len(self.ranks)
+        used = [0] * num_suits
+        suit_index = [0] * num_suits
+        multiplier = [1] * num_suits
+        suit_code = [0] * num_suits
+        start = 0
+        for r in range(last + 1):
+            dealt = [(self._rank_of[card], self._suit_of[card]) for card in card_ids[start:start + self.rounds[r]]]
+            start += self.rounds[r]
+
+            counts = [0] * num_suits
+            masks = [0] * num_suits
+            for rank, suit in dealt:
+                shifted = rank - bin(used[suit] & ((1 << rank) - 1)).count('1')
+                below = sum(1 for other, other_suit in dealt if other_suit == suit and other < rank)
+                suit_index[suit] += multiplier[suit] * comb(shifted, below + 1)
+                counts[suit] += 1
+                masks[suit] |= 1 << rank
+            for s in range(num_suits):
+                multiplier[s] *= comb(num_ranks - bin(used[s]).count('1'), counts[s])
+                used[s] |= masks[s]
+                suit_code[s] = suit_code[s] * (self.rounds[r] + 1) + counts[s]
+
+        # canonical suit order: by counts, then by suit index, decreasing
+        suits = sorted(zip(suit_code, suit_index), reverse=True)
+
+        base = 1
+        for cards in self.rounds[:last + 1]:
+            base *= cards + 1
+        code = 0
+        for counts, _ in suits:
+            code = code * base + counts
+        configuration = self._configuration_of[last][code]
+
+        tables = self._tables[last]
+        position = tables['position'][configuration].tolist()
+        group = tables['group'][configuration].tolist()
+        suit_sizes = tables['suit_sizes'][configuration].tolist()
+
+        index = int(self.offsets[last][configuration])
+        radix = 1
+        part = 0
+        for s, (_, value) in enumerate(suits):
+            k = group[s] - position[s] + 1
+            part += comb(value + k - 1, k)
+            if position[s] == group[s]:
+                index += part * radix
+                radix *= comb(suit_sizes[s] + group[s] - 1, group[s])
+                part = 0
+
+        return index
+
+    def unindex(self, round, index):
+        """Canonical deals of many indexes, the inverse of index
+
+        Args:
+            round: int round of the indexes
+            index: array_like (n,) of ints in [0, size(round))
+
+        Returns:
+            array_like: (n, k) int64 card ids, the hole cards then the
+                board, sorted within each round
+        """
+        index = np.asarray(index, dtype=np.int64)
+        n = len(index)
+        num_suits = len(self.suits)
+        num_ranks = len(self.ranks)
+        configuration = np.searchsorted(self.offsets[round], index, side='right') - 1
+        tables = self._tables[round]
+        counts = tables['counts'][configuration]
+        position = tables['position'][configuration]
+        group = tables['group'][configuration]
+        suit_sizes = tables['suit_sizes'][configuration]
+
+        rest = index - self.offsets[round][configuration]
+        part = np.zeros(n, dtype=np.int64)
+        suit_index = np.zeros((n, num_suits), dtype=np.int64)
+        for s in range(num_suits):
+            first = position[:, s] == 1
+            radix = _comb(suit_sizes[:, s] + group[:, s] - 1, group[:, s])
+            part = np.where(first, rest % radix, part)
+            rest = np.where(first, rest // radix, rest)
+
+            # largest b with comb(b, k) <= part
+            k = group[:, s] - position[:, s] + 1
+            low = k - 1
+            high = suit_sizes[:, s] + group[:, s] - 1
+            while np.any(high - low > 1):
+                middle = (low + high) // 2
+                fits = _comb(middle, k) <= part
+                low = np.where(fits, middle, low)
+                high = np.where(fits, high, middle)
+            part -= _comb(low, k)
+            suit_index[:, s] = low - k + 1
+
+        cards = []
+        used = np.zeros((n, num_suits), dtype=np.int64)
+        rank_values = np.arange(num_ranks)
+        for r in range(round + 1):
+            dealt = []
+            for s in range(num_suits):
+                count = counts[:, s, r]
+                size = _comb(num_ranks - self._popcount[used[:, s]], count)
+                colex = suit_index[:, s] % size
+                suit_index[:, s] //= size
+
+                free = ((used[:, s, None] >> rank_values) & 1) == 0
+                free_rank = np.cumsum(free, axis=1) - 1
+                dealt_mask = np.zeros(n, dtype=np.int64)
+                for t in range(int(count.max(initial=0)), 0, -1):
+                    has = count >= t
+                    # largest shifted rank x with comb(x, t) <= colex
+                    x = (_comb(rank_values[None, :], t) <= colex[:, None]).sum(axis=1) - 1
+                    colex = np.where(has, colex - _comb(x, t), colex)
+                    rank = np.argmax(free & (free_rank == x[:, None]), axis=1)
+                    dealt_mask |= np.where(has, 1 << rank, 0)
+                    dealt.append(np.where(has, np.asarray(self.ranks)[rank] * 4 + self.suits[s], -1))
+                used[:, s] |= dealt_mask
+
+            dealt = np.sort(np.stack(dealt, axis=1), axis=1)[:, -self.rounds[r]:]
+            cards.append(dealt)
+
+        return np.concatenate(cards, axis=1)
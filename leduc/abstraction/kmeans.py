@@ -0,0 +1,302 @@
+import argparse
+import json
+import time
+import multiprocessing as mp
+import numpy as np
+from collections import OrderedDict
+from leduc.abstraction.equity import GAMES, EquityTable, street_index
+from leduc.abstraction.indexer import hand_indexer
+
+
+METRICS = ('l2', 'emd')
+
+
+def _points(features, metric):
+    """Points of the features in a space where the metric is a plain norm
+
+    The earth mover's distance between two histograms over the same bins
+    is the L1 distance between their cumulative distributions.
+    """
+    features = np.asarray(features, dtype=np.float32)
+    if features.ndim == 1:
+        features = features[:, None]
+    if metric == 'emd':
+        return np.cumsum(features, axis=1)
+    return features
+
+
+def _distances(points, centers, metric):
+    """(n, k) floats of the distance of each point to each center"""
+    if metric == 'emd':
+        return np.abs(points[:, None, :] - centers[None, :, :]).sum(axis=2)
+    return ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+
+
+def assign(points, centers, metric='l2', chunk=4096):
+    """Nearest center of each point, chunk points at a time
+
+    Returns:
+        tuple: (n,) ints of the nearest center and float total distance
+    """
+    labels = np.zeros(len(points), dtype=np.int64)
+    inertia = 0.
+    for start in range(0, len(points), chunk):
+        distances = _distances(points[start:start + chunk], centers, metric)
+        labels[start:start + chunk] = distances.argmin(axis=1)
+        inertia += distances.min(axis=1).sum()
+    return labels, inertia
+
+
+def _init_centers(points, k, metric, rng, sample=10000):
+    """k-means++ seeding on a sample of the points"""
+    sample = points[rng.choice(len(points), min(sample, len(points)), replace=False)]
+    centers = [sample[rng.integers(len(sample))]]
+    closest = _distances(sample, np.array(centers), metric)[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            centers.append(sample[rng.integers(len(sample))])
+        else:
+            centers.append(sample[rng.choice(len(sample), p=closest / total)])
+        closest = np.minimum(closest, _distances(sample, np.array(centers[-1:]), metric)[:, 0])
+    return np.array(centers, dtype=np.float32)
+
+
+def minibatch_kmeans(points, k, metric='l2', batch_size=1024, iterations=100, seed=0):
+    """Mini-batch k-means (Sculley, "Web-Scale K-Means Clustering")
+
+    Every iteration assigns a random batch to the nearest centers and
+    moves each center towards its points with a step of one over the
+    number of points it has seen.
+
+    Args:
+        points: array_like (n, d) of floats, see _points
+        k: int number of clusters
+        metric: str 'l2' or 'emd' (L1 between cumulative histograms)
+        batch_size: int number of points per iteration
+        iterations: int number of mini-batches
+        seed: int random seed
+
+    Returns:
+        tuple: (k, d) float centers and float total distance of the points
+            to their centers
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(points))
+    centers = _init_centers(points, k, metric, rng)
+    counts = np.zeros(k)
+    for _ in range(iterations):
+        batch = points[rng.integers(len(points), size=min(batch_size, len(points)))]
+        labels = _distances(batch, centers, metric).argmin(axis=1)
+        for center in np.unique(labels):
+            members = batch[labels == center]
+            counts[center] += len(members)
+            step = len(members) / counts[center]
+            centers[center] += step * (members.mean(axis=0) - centers[center])
+
+    return centers, assign(points, centers, metric)[1]
+
+
+_worker = {}
+
+
+def _init_worker(points, metric):
+    _worker['points'] = points
+    _worker['metric'] = metric
+
+
+def _restart(seed, k, batch_size, iterations):
+    return minibatch_kmeans(_worker['points'], k, _worker['metric'], batch_size, iterations, seed)
+
+
+def kmeans(features, k, metric='l2', batch_size=1024, iterations=100, restarts=4, processes=None, seed=0):
+    """Clusters features with restarts of mini-batch k-means in parallel
+
+    Args:
+        features: array_like (n,) or (n, d) of floats, e.g. EHS or equity
+            histograms
+        k: int number of clusters
+        metric: str 'l2' (squared euclidean) or 'emd' (earth mover's
+            distance between histograms)
+        batch_size: int number of points per mini-batch
+        iterations: int number of mini-batches of each restart
+        restarts: int number of independently seeded runs, the one with
+            the lowest total distance is kept
+        processes: int number of processes, defaults to the cpu count
+        seed: int base random seed
+
+    Returns:
+        tuple: (k, d) float centers in the space of _points and (n,) ints of
+            the cluster of each feature
+    """
+    if metric not in METRICS:
+        raise ValueError('Unknown metric {}, expected one of {}'.format(metric, METRICS))
+
+    points = _points(features, metric)
+    tasks = [(seed + i, k, batch_size, iterations) for i in range(restarts)]
+
+    if 'fork' in mp.get_all_start_methods():
+        context = mp.get_context('fork')
+    else:
+        context = mp.get_context()
+
+    with context.Pool(processes, initializer=_init_worker, initargs=(points, metric)) as pool:
+        results = pool.starmap(_restart, tasks)
+
+    centers = min(results, key=lambda result: result[1])[0]
+    return centers, assign(points, centers, metric)[0]
+
+
+class BucketTable:
+    """The card abstraction of a street
+
+    Holds the bucket of every canonical situation of a street in a plain
+    array indexed by HandIndexer, like EquityTable. Buckets are numbered
+    by increasing mean EHS, so bucket 0 holds the weakest hands. Single
+    lookups go through HandIndexer.index_one and the most recent cache_size
+    of them are memoized, keyed on the cards of each round sorted, so the
+    memo stays bounded however many deals training visits.
+
+    Attributes:
+        game: dict of equity settings
+        street: int betting round
+        buckets: array_like (n,) of uint16 bucket of each situation
+        num_buckets: int number of buckets
+        cache_size: int number of memoized lookups
+    """
+    def __init__(self, game, street, buckets, num_buckets, cache_size=1 << 16):
+        self.game = game
+        self.street = street
+        self.buckets = buckets
+        self.num_buckets = num_buckets
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        dealt = [0] + list(game['board_cards'][:street + 1])
+        hole = game['hole_cards']
+        # slices of the hole cards and of the board dealt each round
+        self._rounds = [slice(0, hole)] + [slice(hole + before, hole + after)
+            for before, after in zip(dealt[1:], dealt[2:]) if after > before]
+
+    def __len__(self):
+        return len(self.buckets)
+
+    @classmethod
+    def from_equity(cls, table, num_buckets, metric='emd', **kwargs):
+        """Clusters the situations of an equity table into buckets
+
+        Args:
+            table: EquityTable of the street
+            num_buckets: int number of buckets
+            metric: str 'emd' clusters the equity histograms, 'l2' the EHS
+            kwargs: passed to kmeans
+
+        Returns:
+            BucketTable: the bucket of every situation of the table
+        """
+        features = table.hist if metric == 'emd' else table.ehs
+        _, labels = kmeans(features, num_buckets, metric, **kwargs)
+
+        # renumber by strength
+        num_buckets = labels.max() + 1
+        strength = np.bincount(labels, weights=table.ehs, minlength=num_buckets) / np.maximum(
+            np.bincount(labels, minlength=num_buckets), 1)
+        order = np.empty(num_buckets, dtype=np.int64)
+        order[np.argsort(strength)] = np.arange(num_buckets)
+
+        return cls(table.game, table.street, order[labels].astype(np.uint16), int(num_buckets))
+
+    def lookup(self, cards):
+        """Buckets of many situations
+
+        Args:
+            cards: array_like (n, k) of card ids, hole cards then the board
+
+        Returns:
+            array_like: (n,) ints of buckets
+        """
+        return self.buckets[street_index(self.game, self.street, cards)]
+
+    def bucket(self, card_ids):
+        """Bucket of one situation given as a tuple of card ids"""
+        key = tuple(card for cards in self._rounds for card in sorted(card_ids[cards]))
+        try:
+            bucket = self._cache[key]
+            self._cache.move_to_end(key)
+            return bucket
+        except KeyError:
+            pass
+
+        bucket = self._cache[key] = int(self.buckets[hand_indexer(self.game).index_one(key)])
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return bucket
+
+    def save(self, path):
+        """Writes the table as path.json and path.buckets.npy"""
+        with open(path + '.json', 'w') as f:
+            json.dump({'game': self.game['name'], 'deck': self.game['deck'], 'street': self.street,
+                'num_buckets': self.num_buckets}, f)
+        np.save(path + '.buckets.npy', self.buckets)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        game = GAMES[meta['game']](meta['deck'])
+        return cls(game, meta['street'], np.load(path + '.buckets.npy', mmap_mode=mmap_mode),
+            meta['num_buckets'])
+
+
+class Buckets:
+    """The card abstraction of every street, for settings['buckets']
+
+    With settings['buckets'] set, State and HoldemState replace the
+    private cards and the board of an info set with the bucket of the
+    situation, e.g. 'b7 || C 2R C/C', so every situation of a bucket
+    shares its strategy. The board is no longer part of the info set, the
+    bucket stands for it.
+
+    Attributes:
+        tables: list per street of BucketTable, a street without a table
+            keeps the cards in the info set
+    """
+    def __init__(self, tables):
+        self.tables = list(tables)
+
+    @classmethod
+    def load(cls, path, num_streets):
+        """Loads the tables saved at path.0, path.1, ... path.<num_streets - 1>"""
+        return cls([BucketTable.load('{}.{}'.format(path, street)) for street in range(num_streets)])
+
+    def label(self, hole_cards, board, street):
+        """Private part of the info set of hole cards and a board of Card
+
+        Returns:
+            str: the bucket, e.g. 'b7', or None if the street has no table
+        """
+        if street >= len(self.tables) or self.tables[street] is None:
+            return None
+        card_ids = tuple(card.id for card in hole_cards) + tuple(card.id for card in board)
+        return 'b%d' % self.tables[street].bucket(card_ids)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Card abstraction of a street by k-means over its equity table')
+    parser.add_argument('-t', '--table', required=True, help='path prefix of the equity table (see equity.py)')
+    parser.add_argument('-k', '--buckets', default=50, type=int, help='number of buckets')
+    parser.add_argument('-m', '--metric', default='emd', choices=METRICS, help='emd clusters equity histograms, l2 the EHS')
+    parser.add_argument('--batch', default=1024, type=int, help='points per mini-batch')
+    parser.add_argument('-i', '--iterations', default=100, type=int, help='mini-batches per restart')
+    parser.add_argument('-r', '--restarts', default=4, type=int, help='independent restarts')
+    parser.add_argument('-p', '--processes', default=None, type=int, help='number of processes')
+    parser.add_argument('-s', '--seed', default=0, type=int, help='random seed')
+    parser.add_argument('-o', '--output', required=True, help='path prefix of the bucket table files')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = BucketTable.from_equity(EquityTable.load(args.table), args.buckets, args.metric,
+        batch_size=args.batch, iterations=args.iterations, restarts=args.restarts,
+        processes=args.processes, seed=args.seed)
+    table.save(args.output)
+    print("{} situations in {} buckets in {:.1f}s, written to {}.*".format(
+        len(table), table.num_buckets, time.perf_counter() - start, args.output))
@@ -0,0 +1,113 @@
+from leduc.cfr.vanilla_cfr import VanillaCFR
+from leduc.cfr.mccfr import MonteCarloCFR
+from leduc.game.card import Card
+from leduc.game.state import State, LeducState
+from leduc.game.holdem import HoldemState
+from leduc.game.hand_eval import kuhn_eval, leduc_eval, holdem_eval
+
+
+# Rules of each game, the settings that do not depend on the number of
+# players. game_settings adds num_players and num_cards.
+GAMES = {
+    'kuhn': {'game': 'kuhn', 'state': State, 'hand_eval': kuhn_eval, 'num_actions': 2,
+        'num_rounds': 1, 'num_raises': 1, 'raise_size': [1]},
+    'leduc': {'game': 'leduc', 'state': LeducState, 'hand_eval': leduc_eval, 'num_actions': 3,
+        'num_rounds': 2, 'num_raises': 2, 'raise_size': [2, 4]},
+    'holdem': {'game': 'holdem', 'state': HoldemState, 'hand_eval': holdem_eval, 'num_actions': 4,
+        'num_rounds': 4, 'num_raises': 2, 'raise_size': [[1]] * 4, 'blinds': [1, 2], 'stack': 40},
+}
+
+ALGORITHMS = {'cfr': VanillaCFR, 'mccfr': MonteCarloCFR}
+
+# Named experiments. A config is a dict of the game, the number of
+# players, the algorithm, the number of iterations and any trainer
+# settings that override the game's (e.g. 'cfr_variant', 'sampling',
+# 'prune_threshold' or 'lcfr_threshold').
+CONFIGS = {
+    'cfr-kuhn2': {'game': 'kuhn', 'num_players': 2, 'algorithm': 'cfr', 'iterations': 10000},
+    'cfr-kuhn3': {'game': 'kuhn', 'num_players': 3, 'algorithm': 'cfr', 'iterations': 10000},
+    'mccfr-kuhn2': {'game': 'kuhn', 'num_players': 2, 'algorithm': 'mccfr', 'iterations': 10000},
+    'mccfr-kuhn3': {'game': 'kuhn', 'num_players': 3, 'algorithm': 'mccfr', 'iterations': 10000},
+    'mccfr-leduc2': {'game': 'leduc', 'num_players': 2, 'algorithm': 'mccfr', 'iterations': 20000},
+    'mccfr-leduc3': {'game': 'leduc', 'num_players': 3, 'algorithm': 'mccfr', 'iterations': 80000},
+    'mccfr-holdem2': {'game': 'holdem', 'num_players': 2, 'algorithm': 'mccfr', 'iterations': 10000},
+    'mccfr-holdem3': {'game': 'holdem', 'num_players': 3, 'algorithm': 'mccfr', 'iterations': 10000},
+}
+
+# keys of a config that are not trainer settings
+CONFIG_KEYS = ('name', 'game', 'num_players', 'algorithm', 'iterations')
+
+
+def game_settings(game, num_players=2, **overrides):
+    """Trainer settings of a game
+
+    Args:
+        game: str key of GAMES
+        num_players: int number of players
+        overrides: settings replacing the game's, e.g. num_actions=4 for
+            Kuhn with Fold/Pass/Call/Raise
+
+    Returns:
+        dict: settings for VanillaCFR and MonteCarloCFR
+    """
+    if game not in GAMES:
+        raise ValueError('Unknown game {}, expected one of {}'.format(game, sorted(GAMES)))
+
+    settings = dict(GAMES[game], num_players=num_players)
+    settings.update(overrides)
+    if game == 'holdem':
+        settings['num_cards'] = 2 * num_players + 5
+    else:
+        settings['num_cards'] = num_players + settings['num_rounds'] - 1
+    return settings
+
+
+def deck(game, num_players=2):
+    """Cards of a game, Kuhn and Leduc deal one more rank than players
+
+    Returns:
+        list: Card of the deck
+    """
+    if game == 'holdem':
+        return [Card(rank, suit) for rank in range(2, 15) for suit in range(1, 5)]
+
+    ranks = range(14 - num_players, 15)
+    suits = (1, 2) if game == 'leduc' else (1,)
+    return [Card(rank, suit) for suit in suits for rank in ranks]
+
+
+def resolve(config):
+    """Expands a config name or fills in the defaults of a config dict
+
+    Returns:
+        dict: config with 'name', 'game', 'num_players', 'algorithm' and
+            'iterations'
+    """
+    if isinstance(config, str):
+        if config not in CONFIGS:
+            raise ValueError('Unknown config {}, expected one of {}'.format(config, sorted(CONFIGS)))
+        config = dict(CONFIGS[config], name=config)
+
+    config = dict(config)
+    config.setdefault('num_players', 2)
+    config.setdefault('algorithm', 'mccfr')
+    config.setdefault('iterations', 1000)
+    config.setdefault('name', '{}-{}{}'.format(config['algorithm'], config['game'], config['num_players']))
+    if config['algorithm'] not in ALGORITHMS:
+        raise ValueError('Unknown algorithm {}, expected one of {}'.format(config['algorithm'], sorted(ALGORITHMS)))
+    return config
+
+
+def make(config):
+    """Builds the trainer and the deck of a config
+
+    Args:
+        config: str name in CONFIGS or config dict
+
+    Returns:
+        tuple: VanillaCFR or MonteCarloCFR and list of Card of the deck
+    """
+    config = resolve(config)
+    overrides = {key: value for key, value in config.items() if key not in CONFIG_KEYS}
+    settings = game_settings(config['game'], config['num_players'], **overrides)
+    return ALGORITHMS[config['algorithm']](settings), deck(config['game'], config['num_players'])
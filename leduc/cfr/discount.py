@@ -0,0 +1,100 @@
+class Discount:
+    """The iteration weighting rule of a CFR variant
+
+    After iteration t, the accumulated regrets and strategy sums of every
+    node are scaled as follows:
+
+    - vanilla: no discounting
+    - linear: regrets and strategy sums are scaled by t/(t+1) (Linear CFR),
+      optionally only while t is below a threshold
+    - cfr+: negative regrets are floored at 0 after every update and the
+      strategy sum is scaled by t/(t+1) (linear averaging)
+    - dcfr: positive regrets are scaled by t^alpha/(t^alpha+1), negative
+      regrets by t^beta/(t^beta+1) and strategy sums by (t/(t+1))^gamma
+
+    See Brown and Sandholm, "Solving Imperfect-Information Games via
+    Discounted Regret Minimization" for the variants.
+
+    Attributes:
+        variant: str of the update rule
+        alpha: float DCFR exponent of positive regrets
+        beta: float DCFR exponent of negative regrets
+        gamma: float DCFR exponent of the strategy sum
+        threshold: float iteration after which linear discounting stops
+    """
+    VARIANTS = ('vanilla', 'linear', 'cfr+', 'dcfr')
+
+    def __init__(self, variant='vanilla', alpha=1.5, beta=0, gamma=2, threshold=float('inf')):
+        if variant not in self.VARIANTS:
+            raise ValueError('Unknown CFR variant {}, expected one of {}'.format(variant, self.VARIANTS))
+
+        self.variant = variant
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.threshold = threshold
+
+    @classmethod
+    def from_settings(cls, json, variant='vanilla', threshold=float('inf')):
+        """Builds the rule from a settings dict
+
+        Args:
+            json: dict of settings, read for 'cfr_variant', 'dcfr_alpha',
+                'dcfr_beta' and 'dcfr_gamma'
+            variant: str of the variant used if the settings have none
+            threshold: float of the linear discounting threshold
+
+        Returns:
+            Discount: the update rule
+        """
+        return cls(json.get('cfr_variant', variant), json.get('dcfr_alpha', 1.5),
+            json.get('dcfr_beta', 0), json.get('dcfr_gamma', 2), threshold)
+
+    @property
+    def floor(self):
+        """bool of whether regrets are floored at 0 after every update"""
+        return self.variant == 'cfr+'
+
+    def active(self, t):
+        if self.variant == 'vanilla':
+            return False
+        if self.variant == 'linear':
+            return t < self.threshold
+        return True
+
+    def weights(self, t):
+        """Multipliers applied after iteration t
+
+        Args:
+            t: float of the (possibly interval scaled) iteration
+
+        Returns:
+            tuple: floats scaling positive regrets, negative regrets and
+                the strategy sum
+        """
+        linear = t / (t + 1)
+        if self.variant == 'linear':
+            return linear, linear, linear
+        if self.variant == 'cfr+':
+            return 1, 0, linear
+
+        positive = t ** self.alpha / (t ** self.alpha + 1)
+        negative = t ** self.beta / (t ** self.beta + 1)
+        return positive, negative, linear ** self.gamma
+
+    def apply(self, node_map, t):
+        """Discounts every node of a node map after iteration t
+
+        Args:
+            node_map: dict of player -> dict of info set -> Node
+            t: float of the (possibly interval scaled) iteration
+        """
+        positive, negative, strategy = self.weights(t)
+        for player_nodes in node_map.values():
+            if hasattr(player_nodes, 'discount'):
+                # array tables discount all of their rows at once
+                player_nodes.discount(positive, negative, strategy)
+                continue
+
+            for node in player_nodes.values():
+                node.discount(positive, negative, strategy)
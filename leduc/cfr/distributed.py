@@ -0,0 +1,472 @@
+import argparse
+import hashlib
+import hmac
+import os
+import pickle
+import random
+import secrets
+import socket
+import struct
+import time
+import zlib
+import multiprocessing as mp
+import numpy as np
+from leduc.cfr import configs
+from leduc.cfr.mccfr import MonteCarloCFR
+from leduc.game.deck import Deck
+
+
+# Messages are pickles, which run code when loaded, so every frame carries
+# an HMAC of a key shared by the coordinator and its workers and is only
+# unpickled once the HMAC checks out.
+HEADER = struct.Struct('!Q')
+DIGEST = hashlib.sha256
+DIGEST_SIZE = DIGEST().digest_size
+MAX_FRAME = 1 << 32
+KEY_VARIABLE = 'LEDUC_CFR_KEY'
+
+
+def encode(message, key, level=6):
+    """Pickles and compresses a message into a length prefixed, HMAC signed frame
+
+    Args:
+        message: picklable message
+        key: bytes shared by the coordinator and its workers
+        level: int zlib compression level
+
+    Returns:
+        bytes: the payload length, the HMAC of the payload and the payload
+    """
+    payload = zlib.compress(pickle.dumps(message, pickle.HIGHEST_PROTOCOL), level)
+    return HEADER.pack(len(payload)) + hmac.new(key, payload, DIGEST).digest() + payload
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError('Connection closed with {} bytes left to read'.format(size))
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv(sock, key):
+    """Reads one frame of encode
+
+    Args:
+        sock: socket to read from
+        key: bytes the frame must be signed with
+
+    Returns:
+        tuple: the message and int number of bytes read
+
+    Raises:
+        ConnectionError: if the frame is too large or its HMAC does not
+            match, before anything is unpickled
+    """
+    size, = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    if size > MAX_FRAME:
+        raise ConnectionError('Frame of {} bytes is larger than {}'.format(size, MAX_FRAME))
+    digest = _recv_exactly(sock, DIGEST_SIZE)
+    payload = _recv_exactly(sock, size)
+    if not hmac.compare_digest(digest, hmac.new(key, payload, DIGEST).digest()):
+        raise ConnectionError('Frame is not signed with the shared key')
+    return pickle.loads(zlib.decompress(payload)), HEADER.size + DIGEST_SIZE + size
+
+
+def load_key(key=None):
+    """The shared key, from the argument or the LEDUC_CFR_KEY variable
+
+    Returns:
+        bytes: the key
+
+    Raises:
+        ValueError: if neither holds a key
+    """
+    key = key if key is not None else os.environ.get(KEY_VARIABLE)
+    if not key:
+        raise ValueError('A shared key is needed, pass --key or set {}'.format(KEY_VARIABLE))
+    return key.encode() if isinstance(key, str) else key
+
+
+def snapshot(trainer):
+    """Copies the regret and strategy sums of every node
+
+    Returns:
+        dict: player -> dict of info set -> (regret sums, strategy sums)
+    """
+    return {player: {info_set: (dict(node.regret_sum.items()), dict(node.strategy_sum.items()))
+        for info_set, node in nodes.items()} for player, nodes in trainer.node_map.items()}
+
+
+def delta(trainer, base):
+    """What the nodes of a trainer gained since a snapshot
+
+    Info sets that are not in the snapshot are always part of the delta,
+    even with zero sums, so every table ends up with the same info sets.
+
+    Args:
+        trainer: MonteCarloCFR
+        base: dict of snapshot
+
+    Returns:
+        dict: player -> dict of info set -> (regret deltas, strategy deltas)
+            of the actions that changed
+    """
+    changes = {}
+    for player, nodes in trainer.node_map.items():
+        player_base = base.get(player, {})
+        player_changes = {}
+        for info_set, node in nodes.items():
+            regrets, strategies = player_base.get(info_set, ({}, {}))
+            regret_delta = {a: v - regrets.get(a, 0) for a, v in node.regret_sum.items() if v != regrets.get(a, 0)}
+            strategy_delta = {a: v - strategies.get(a, 0) for a, v in node.strategy_sum.items()
+                if v != strategies.get(a, 0)}
+            if regret_delta or strategy_delta or info_set not in player_base:
+                player_changes[info_set] = (regret_delta, strategy_delta)
+        if player_changes:
+            changes[player] = player_changes
+
+    return changes
+
+
+def merge(deltas):
+    """Sums the deltas of several workers, in order"""
+    merged = {}
+    for changes in deltas:
+        for player, player_changes in changes.items():
+            player_merged = merged.setdefault(player, {})
+            for info_set, (regret_delta, strategy_delta) in player_changes.items():
+                regrets, strategies = player_merged.setdefault(info_set, ({}, {}))
+                for a, v in regret_delta.items():
+                    regrets[a] = regrets.get(a, 0) + v
+                for a, v in strategy_delta.items():
+                    strategies[a] = strategies.get(a, 0) + v
+
+    return merged
+
+
+def apply(trainer, merged, base=None):
+    """Adds merged deltas to the nodes of a trainer
+
+    Args:
+        trainer: MonteCarloCFR
+        merged: dict of merge
+        base: dict of snapshot the deltas are added to, the trainer's own
+            nodes if None. Workers pass the snapshot of the last sync, which
+            drops their own progress since then; merged already holds it.
+    """
+    for player, player_merged in merged.items():
+        player_base = base.get(player, {}) if base is not None else None
+        for info_set, (regret_delta, strategy_delta) in player_merged.items():
+            node = trainer.get_node(player, info_set)
+            if player_base is None:
+                regrets, strategies = dict(node.regret_sum.items()), dict(node.strategy_sum.items())
+            else:
+                regrets, strategies = player_base.get(info_set, ({}, {}))
+            for a in set(regret_delta) | set(strategy_delta):
+                if a not in node.regret_sum:
+                    node.add_action(a)
+            for a in node.regret_sum.keys():
+                node.regret_sum[a] = regrets.get(a, 0) + regret_delta.get(a, 0)
+            for a in node.strategy_sum.keys():
+                node.strategy_sum[a] = strategies.get(a, 0) + strategy_delta.get(a, 0)
+
+
+def discounts(trainer, start, stop):
+    """Iterations of (start, stop] after which MonteCarloCFR.train discounts"""
+    interval = trainer.discount_interval
+    first = start // interval + 1
+    return [m * interval for m in range(first, stop // interval + 1) if trainer.discounter.active(m * interval)]
+
+
+class Coordinator:
+    """Merges the regrets of MCCFR workers on other processes or machines
+
+    Training runs in synchronous rounds. Every round each worker runs
+    sync_interval iterations on its own copy of the tables and sends back
+    the zlib compressed delta of its regret and strategy sums. The
+    coordinator sums the deltas into its tables, discounts them like
+    MonteCarloCFR.train would after as many iterations, and broadcasts the
+    merged delta with the next round, so every worker starts the round
+    with the coordinator's tables.
+
+    Attributes:
+        trainer: MonteCarloCFR holding the merged tables
+        cards: list of Card of the deck
+        num_workers: int number of workers to wait for
+        sync_interval: int iterations each worker runs per round
+        seed: int base random seed of the workers
+        iterations: int number of iterations merged so far
+        stats: dict of bytes sent and received, rounds and seconds spent
+            waiting for workers
+    """
+    def __init__(self, settings, cards, num_workers, key, sync_interval=100, host='127.0.0.1', port=0,
+            seed=0, level=6):
+        """Listens for workers
+
+        Args:
+            settings: dict of trainer settings
+            cards: list of Card of the deck
+            num_workers: int number of workers to wait for
+            key: bytes shared with the workers, frames signed with another
+                key are never unpickled
+            sync_interval: int iterations each worker runs per round
+            host: str address to listen on, '0.0.0.0' for every interface
+            port: int port to listen on, 0 picks a free one (see address)
+            seed: int base random seed of the workers
+            level: int zlib compression level of the messages
+        """
+        self.trainer = MonteCarloCFR(settings)
+        self.cards = cards
+        self.num_workers = num_workers
+        self.sync_interval = sync_interval
+        self.seed = seed
+        self.key = key
+        self.level = level
+        self.iterations = 0
+        self.stats = {'rounds': 0, 'bytes_sent': 0, 'bytes_received': 0, 'wait_seconds': 0.}
+        self.workers = []
+        self._server = socket.create_server((host, port))
+
+    @property
+    def address(self):
+        """(host, port) workers connect to"""
+        return self._server.getsockname()[:2]
+
+    def _send(self, sock, frame):
+        sock.sendall(frame)
+        self.stats['bytes_sent'] += len(frame)
+
+    def accept(self, timeout=10):
+        """Waits for every worker and sends it the game
+
+        A peer is only counted as a worker once it sends a hello signed
+        with the shared key within timeout seconds, any other is dropped.
+        """
+        while len(self.workers) < self.num_workers:
+            sock, _ = self._server.accept()
+            sock.settimeout(timeout)
+            try:
+                recv(sock, self.key)
+            except (OSError, ValueError):
+                sock.close()
+                continue
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            hello = {'worker': len(self.workers), 'num_workers': self.num_workers, 'settings': self.trainer.json,
+                'cards': self.cards, 'seed': self.seed}
+            self._send(sock, encode(hello, self.key, self.level))
+            self.workers.append(sock)
+
+    def train(self, rounds):
+        """Runs rounds of training over the workers
+
+        Args:
+            rounds: int number of rounds, each of num_workers * sync_interval
+                iterations
+
+        Returns:
+            MonteCarloCFR: the trainer of the merged tables
+        """
+        self.accept()
+        merged, discounted = None, []
+        for _ in range(rounds):
+            start = self.iterations
+            frame = encode({'start': start, 'iterations': self.sync_interval, 'merged': merged,
+                'discounts': discounted}, self.key, self.level)
+            for sock in self.workers:
+                self._send(sock, frame)
+
+            wait = time.perf_counter()
+            deltas = []
+            for sock in self.workers:
+                message, size = recv(sock, self.key)
+                self.stats['bytes_received'] += size
+                deltas.append(message)
+            self.stats['wait_seconds'] += time.perf_counter() - wait
+
+            merged = merge(deltas)
+            apply(self.trainer, merged)
+            self.iterations += self.num_workers * self.sync_interval
+            discounted = discounts(self.trainer, start, self.iterations)
+            for t in discounted:
+                self.trainer.discount(t)
+            self.trainer.trim()
+            self.stats['rounds'] += 1
+
+        return self.trainer
+
+    def close(self):
+        """Tells the workers to stop and closes every connection"""
+        frame = encode({'start': None}, self.key, self.level)
+        for sock in self.workers:
+            try:
+                self._send(sock, frame)
+            except OSError:
+                pass
+            sock.close()
+        self.workers = []
+        self._server.close()
+
+
+def connect(host, port, timeout=30):
+    """Connects to a coordinator, retrying until it listens"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection((host, port))
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(.1)
+
+
+def work(host, port, key, level=6):
+    """Runs a worker until the coordinator stops it
+
+    Each round the worker brings its tables to the coordinator's by adding
+    the merged delta to its snapshot of the last sync, runs its share of
+    the round's iterations and sends back what its tables gained.
+
+    Args:
+        host: str address of the coordinator
+        port: int port of the coordinator
+        key: bytes shared with the coordinator
+        level: int zlib compression level of the deltas
+
+    Returns:
+        int: number of iterations the worker ran
+    """
+    sock = connect(host, port)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall(encode({'hello': True}, key, level))
+    hello, _ = recv(sock, key)
+    worker, num_workers = hello['worker'], hello['num_workers']
+    random.seed(hello['seed'] + worker)
+    np.random.seed(hello['seed'] + worker)
+    trainer = MonteCarloCFR(hello['settings'])
+    deck = Deck(hello['cards'])
+    base = {}
+    ran = 0
+
+    try:
+        while True:
+            message, _ = recv(sock, key)
+            if message.get('merged') is not None:
+                apply(trainer, message['merged'], base)
+                for t in message['discounts']:
+                    trainer.discount(t)
+                base = snapshot(trainer)
+            if message['start'] is None:
+                return ran
+
+            # the workers' iterations interleave, so t counts every worker's
+            deals = deck.deals(message['iterations'], trainer.num_cards)
+            for i in range(message['iterations']):
+                trainer.iteration(message['start'] + i * num_workers + worker + 1, next(deals))
+                trainer.trim()
+            ran += message['iterations']
+            sock.sendall(encode(delta(trainer, base), key, level))
+    finally:
+        sock.close()
+
+
+def run_local(config, num_workers=2, rounds=10, sync_interval=100, seed=0):
+    """Trains a config with workers in processes of this machine over localhost
+
+    Args:
+        config: str name in CONFIGS or config dict
+        num_workers: int number of worker processes
+        rounds: int number of rounds
+        sync_interval: int iterations each worker runs per round
+        seed: int base random seed of the workers
+
+    Returns:
+        tuple: MonteCarloCFR of the merged tables, list of Card of the deck
+            and dict of the coordinator's stats
+    """
+    trainer, cards = configs.make(config)
+    key = secrets.token_bytes(32)
+    coordinator = Coordinator(trainer.json, cards, num_workers, key, sync_interval, seed=seed)
+    host, port = coordinator.address
+
+    if 'fork' in mp.get_all_start_methods():
+        context = mp.get_context('fork')
+    else:
+        context = mp.get_context()
+
+    processes = [context.Process(target=work, args=(host, port, key), daemon=True) for _ in range(num_workers)]
+    for process in processes:
+        process.start()
+    try:
+        trainer = coordinator.train(rounds)
+    finally:
+        coordinator.close()
+        for process in processes:
+            process.join()
+
+    return trainer, cards, coordinator.stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distributed MCCFR over TCP')
+    subparsers = parser.add_subparsers(dest='role', required=True)
+
+    coordinator_parser = subparsers.add_parser('coordinator', help='merge the regrets of remote workers')
+    local_parser = subparsers.add_parser('local', help='run a coordinator and its workers on this machine')
+    for role_parser in (coordinator_parser, local_parser):
+        role_parser.add_argument('-c', '--config', required=True, choices=sorted(configs.CONFIGS),
+            help='name of a config in leduc/cfr/configs.py')
+        role_parser.add_argument('-w', '--workers', default=2, type=int, help='number of workers')
+        role_parser.add_argument('-r', '--rounds', default=10, type=int, help='number of sync rounds')
+        role_parser.add_argument('-n', '--sync-interval', default=100, type=int, help='iterations per worker per round')
+        role_parser.add_argument('-s', '--seed', default=0, type=int, help='random seed')
+        role_parser.add_argument('-o', '--output', default=None, help='path of the node map pickle')
+        role_parser.add_argument('-e', '--exploitability', action='store_true', help='print the exploitability after training')
+    coordinator_parser.add_argument('--host', default='127.0.0.1',
+        help='address to listen on, 0.0.0.0 for every interface')
+    coordinator_parser.add_argument('--port', default=5555, type=int, help='port to listen on')
+
+    worker_parser = subparsers.add_parser('worker', help='run traversals for a coordinator')
+    worker_parser.add_argument('--host', required=True, help='address of the coordinator')
+    worker_parser.add_argument('--port', default=5555, type=int, help='port of the coordinator')
+    for role_parser in (coordinator_parser, worker_parser):
+        role_parser.add_argument('--key', default=None,
+            help='secret shared by the coordinator and its workers, defaults to ${}'.format(KEY_VARIABLE))
+    args = parser.parse_args()
+
+    if args.role != 'local':
+        try:
+            key = load_key(args.key)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.role == 'worker':
+        print("{} iterations run".format(work(args.host, args.port, key)))
+        raise SystemExit
+
+    start = time.perf_counter()
+    if args.role == 'local':
+        trainer, cards, stats = run_local(args.config, args.workers, args.rounds, args.sync_interval, args.seed)
+    else:
+        trainer, cards = configs.make(args.config)
+        coordinator = Coordinator(trainer.json, cards, args.workers, key, args.sync_interval, args.host, args.port, args.seed)
+        try:
+            trainer = coordinator.train(args.rounds)
+        finally:
+            coordinator.close()
+        stats = coordinator.stats
+
+    seconds = time.perf_counter() - start
+    iterations = args.rounds * args.workers * args.sync_interval
+    print("{} iterations in {:.1f}s ({:.1f}/s), {} info sets, {:.1f} KB sent, {:.1f} KB received".format(
+        iterations, seconds, iterations / seconds, sum(len(nodes) for nodes in trainer.node_map.values()),
+        stats['bytes_sent'] / 1024, stats['bytes_received'] / 1024))
+    if args.exploitability:
+        print("exploitability: {}".format(trainer.exploitability(cards)))
+    if args.output is not None:
+        with open(args.output, 'wb') as f:
+            pickle.dump(trainer.node_map, f)
@@ -0,0 +1,192 @@
+import argparse
+import json
+import pickle
+import sys
+from math import perm
+from leduc.cfr import configs
+from leduc.cfr.storage import STORAGE, node_size
+
+
+def _entry_bytes():
+    """Average bytes a dict spends per entry, on top of its keys and values"""
+    table = dict.fromkeys(range(1 << 12))
+    return sys.getsizeof(table) / len(table)
+
+
+def _cards(settings):
+    """Hole cards per player and board cards dealt by each round"""
+    if settings['game'] == 'holdem':
+        return 2, list(settings.get('board_cards', [0, 3, 4, 5]))
+    # State only ever deals one board card, see State.info_set
+    return 1, [0] + [1] * (settings['num_rounds'] - 1)
+
+
+def _buckets(settings, round):
+    """Number of buckets of a round, None if its info sets keep the cards"""
+    buckets = settings.get('buckets')
+    if buckets is None or round >= len(buckets.tables) or buckets.tables[round] is None:
+        return None
+    return buckets.tables[round].num_buckets
+
+
+def tree_size(settings, cards=None):
+    """Counts the game tree of a settings dict without training
+
+    Walks every betting sequence once with a single deal, then multiplies
+    by the ways the cards can be dealt. Info sets and public states print
+    the cards in the order they are dealt, so a round where a player sees
+    k cards has perm(deck, k) views of each betting node (or the number
+    of buckets with a card abstraction).
+
+    Args:
+        settings: dict of trainer settings, see configs.game_settings
+        cards: list of Card of the deck, the deck of configs if None
+
+    Returns:
+        dict: 'betting_nodes', 'info_sets' (list per player), 'public_states',
+            'terminal_nodes' (betting sequences), 'terminal_histories'
+            (betting sequences times deals) and 'key_bytes' (average bytes
+            of an info set string)
+    """
+    if cards is None:
+        cards = configs.deck(settings['game'], settings['num_players'])
+    trainer = configs.ALGORITHMS['cfr'](settings)
+    state_json = dict(trainer.state_json, cards=list(cards[:settings['num_cards']]))
+    num_players = settings['num_players']
+    deck = len(cards)
+    hole, board = _cards(settings)
+    last_round = settings['num_rounds'] - 1
+
+    size = {'betting_nodes': 0, 'info_sets': [0] * num_players, 'public_states': 0,
+        'terminal_nodes': 0, 'terminal_histories': 0}
+    key_bytes = 0
+    stack = [trainer.state(state_json)]
+    while stack:
+        state = stack.pop()
+        size['betting_nodes'] += 1
+        round = min(state.round, last_round)
+        if state.is_terminal:
+            size['terminal_nodes'] += 1
+            size['terminal_histories'] += perm(deck, num_players * hole + board[round])
+            continue
+
+        buckets = _buckets(settings, round)
+        views = buckets if buckets is not None else perm(deck, hole + board[round])
+        size['info_sets'][state.turn] += views
+        size['public_states'] += perm(deck, board[round])
+        key_bytes += views * sys.getsizeof(state.info_set)
+        for action in state.valid_actions:
+            stack.append(state.add(state.turn, action))
+
+    size['key_bytes'] = key_bytes / max(sum(size['info_sets']), 1)
+    return size
+
+
+def memory(settings, size):
+    """Estimates the bytes node_map takes with each storage backend
+
+    Args:
+        settings: dict of trainer settings, read for the algorithm's
+            actions, 'regret_dtype' and 'memory_limit'
+        size: dict of tree_size
+
+    Returns:
+        dict: backend -> dict of 'memory' bytes and 'disk' bytes. Array
+            tables double their arrays as they grow, so they may hold up to
+            twice the bytes of their rows
+    """
+    trainer = configs.ALGORITHMS['mccfr'](settings)
+    node = trainer.node_type(trainer.actions)
+    for values in (node.regret_sum, node.strategy_sum):
+        for action in values:
+            values[action] = 1.5
+    info_sets = sum(size['info_sets'])
+    key = size['key_bytes']
+    entry = _entry_bytes()
+
+    in_dict = info_sets * (node_size('', node) - sys.getsizeof('') + key + entry)
+    # spill tables keep an (offset, length) slot per info set in memory
+    slots = info_sets * (key + entry + sys.getsizeof((1 << 40, 1 << 10)))
+    itemsize = {'float32': 4, 'int32': 4, 'int16': 2}[settings.get('regret_dtype', 'float32')]
+    columns = len(node.actions)
+    rows = info_sets * (key + entry + sys.getsizeof(1 << 20))
+
+    return {
+        'dict': {'memory': in_dict, 'disk': 0},
+        'spill': {'memory': min(in_dict, settings.get('memory_limit', 1 << 30)) + slots,
+            'disk': info_sets * len(pickle.dumps(node))},
+        'array': {'memory': rows + info_sets * columns * (itemsize + 4), 'disk': 0},
+    }
+
+
+def benchmark(config, iterations=200, seed=0):
+    """Times a short training run of a config
+
+    Early iterations create most of the info sets, so the rate is a lower
+    bound of the rate of a long run.
+
+    Args:
+        config: str name in CONFIGS or config dict
+        iterations: int number of iterations to time
+        seed: int random seed
+
+    Returns:
+        float: iterations per second
+    """
+    config = dict(configs.resolve(config), iterations=iterations)
+    from leduc.cfr.sweep import run_config
+    return run_config(config, exploitability=False, seed=seed)['iterations_per_second']
+
+
+def estimate(config, iterations=200):
+    """Sizes the tree, the memory and the speed of a config
+
+    Args:
+        config: str name in CONFIGS or config dict
+        iterations: int number of benchmark iterations, 0 to skip it
+
+    Returns:
+        dict: tree_size, 'memory' of every backend and 'iterations_per_second'
+            (None when skipped)
+    """
+    config = configs.resolve(config)
+    trainer, cards = configs.make(config)
+    size = tree_size(trainer.json, cards)
+    size['memory'] = memory(trainer.json, size)
+    size['iterations_per_second'] = benchmark(config, iterations) if iterations else None
+    return size
+
+
+def _bytes(value):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if value < 1024 or unit == 'TB':
+            return '{:.1f} {}'.format(value, unit)
+        value /= 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Estimates the tree size, memory and speed of a config before training it')
+    parser.add_argument('-c', '--config', required=True, choices=sorted(configs.CONFIGS), help='name of a config in leduc/cfr/configs.py')
+    parser.add_argument('--set', nargs='*', default=[], metavar='KEY=VALUE', help='settings to override, e.g. num_raises=3')
+    parser.add_argument('-i', '--iterations', default=200, type=int, help='benchmark iterations (0 to skip)')
+    args = parser.parse_args()
+
+    config = configs.resolve(args.config)
+    for setting in args.set:
+        key, _, value = setting.partition('=')
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+
+    size = estimate(config, args.iterations)
+    print("betting nodes:      {:,}".format(size['betting_nodes']))
+    print("info sets:          {:,} ({})".format(sum(size['info_sets']), ', '.join('{:,}'.format(n) for n in size['info_sets'])))
+    print("public states:      {:,}".format(size['public_states']))
+    print("terminal nodes:     {:,}".format(size['terminal_nodes']))
+    print("terminal histories: {:,}".format(size['terminal_histories']))
+    for backend in STORAGE:
+        print("{:<19} {} in memory, {} on disk".format(backend + ':', _bytes(size['memory'][backend]['memory']),
+            _bytes(size['memory'][backend]['disk'])))
+    if size['iterations_per_second'] is not None:
+        print("iterations/sec:     {:.1f}".format(size['iterations_per_second']))
@@ -0,0 +1,60 @@
+def public_key(info_set):
+    """Gets the public state of an information set
+
+    Info sets are formatted as the private card followed by the
+    public state (see State.info_set and State.public_state)
+
+    Args:
+        info_set: str of the information set
+
+    Returns:
+        str: the public state the info set belongs to
+    """
+    return info_set.split(' || ', 1)[1]
+
+
+class PublicStateIndex:
+    """An index from public state to the info sets of each player
+
+    Looking up every info set that shares a public state used to be a
+    substring search over the whole node map. The index keeps the info
+    sets grouped by public state so the lookup is O(result).
+
+    Attributes:
+        index: dict of player -> dict of public state -> list of info sets
+    """
+    def __init__(self):
+        self.index = {}
+
+    @classmethod
+    def from_node_map(cls, node_map):
+        """Builds the index of an existing node map
+
+        Args:
+            node_map: dict of player -> dict of info set -> node
+
+        Returns:
+            PublicStateIndex: index over every info set of node_map
+        """
+        index = cls()
+        for player, nodes in node_map.items():
+            for info_set in nodes:
+                index.add(player, info_set)
+
+        return index
+
+    def add(self, player, info_set):
+        public_states = self.index.setdefault(player, {})
+        public_states.setdefault(public_key(info_set), []).append(info_set)
+
+    def info_sets(self, player, public_state):
+        """Gets the info sets of a player that share a public state
+
+        Args:
+            player: int of the player
+            public_state: str of the public state
+
+        Returns:
+            list: str of the info sets, empty if none are known
+        """
+        return self.index.get(player, {}).get(public_state, [])
@@ -1,12 +1,10 @@
 import argparse
 import numpy as np
 import logging
-from leduc.cfr.regret_min import RegretMin
-from leduc.cfr.vanilla_cfr import VanillaCFR
+from leduc.cfr.regret_min import RegretMin, MatrixRegretMin
 from leduc.cfr.mccfr import MonteCarloCFR
-from leduc.game.card import Card
-from leduc.game.state import State, LeducState
-from leduc.game.hand_eval import kuhn_eval, leduc_eval
+from leduc.cfr.discount import Discount
+from leduc.cfr import configs
 
 
 parser = argparse.ArgumentParser(description='Counterfactual Regret Minimization')
@@ -14,126 +12,66 @@ parser.add_argument('-i', '--iterations', type=int, help='number of iterations t
 parser.add_argument('-c','--cfr', type=int, help='(0) Run regret min or Run CFR for (1): 2 players or (2): 3 players')
 parser.add_argument('-b', '--raises', default=1, type=int, help='Number of raises per round')
 parser.add_argument('-a', '--actions', default=2, type=int, help='Number of actions')
-parser.add_argument('-g', '--game', type=int, default=0, help='Game to run (0) Kuhn or (1) Leduc')
+parser.add_argument('-g', '--game', type=int, default=0, help="Game to run (0) Kuhn, (1) Leduc or (2) Hold'em (MCCFR only)")
 parser.add_argument('-m', '--mccfr', type=int, help='(1) Run MCCFR for two player kuhn poker or (2) 3 players')
+parser.add_argument('-f', '--full-info', action='store_true', help='Use full-information regret matching for regret min')
+parser.add_argument('--plus', action='store_true', help='Use regret matching+ with full-information regret min')
+parser.add_argument('-v', '--variant', choices=Discount.VARIANTS, help='CFR update rule, linear discounting stops at 400 iterations for MCCFR unless set to linear')
+parser.add_argument('--alpha', default=1.5, type=float, help='DCFR discount exponent of positive regrets')
+parser.add_argument('--beta', default=0, type=float, help='DCFR discount exponent of negative regrets')
+parser.add_argument('--gamma', default=2, type=float, help='DCFR discount exponent of the average strategy')
+parser.add_argument('-s', '--sampling', default='external', choices=MonteCarloCFR.SAMPLING, help='MCCFR sampling scheme')
+parser.add_argument('-n', '--config', choices=sorted(configs.CONFIGS), help='Run a named config of leduc/cfr/configs.py instead of -c/-m/-g')
+parser.add_argument('-e', '--exploitability', action='store_true', help='Print the exploitability of the average strategy after training')
 args = parser.parse_args()
 
-if args.cfr == 0: 
-    print("Running regret minimization for RPS with strat [.4, .3, .3]")
-    utilities = np.array([[[0, -1, 1], [1, 0, -1], [-1, 1, 0]], [[0, 1, -1], [-1, 0, 1], [1, -1, 0]]])
-    minimization = RegretMin(3, utilities[0], np.array([.4, .3, .3]))
-    minimization.train(args.iterations)
-    print(minimization.avg_strategy())
+# games of -g
+GAMES = ['kuhn', 'leduc', 'holdem']
 
-elif args.cfr == 1:
-    settings = {'num_players':2}
 
-    if args.game == 1:
-        cards = [Card(12, 1), Card(13, 1), Card(14, 1), Card(12, 2), Card(13, 2), Card(14, 2)]
-        settings['num_actions'] = 3
-        settings['hand_eval'] = leduc_eval
-        settings['num_rounds'] = 2
-        settings['num_raises'] = 2
-        settings['raise_size'] = [2,4]
-        settings['num_cards'] = settings['num_players'] + settings['num_rounds'] - 1
-        settings['game'] = 'leduc'
-        settings['state'] = LeducState
-    else:
-        cards = [Card(12, 1), Card(13, 1), Card(14, 1)]
-        settings['hand_eval'] = kuhn_eval
-        settings['num_rounds'] = 1
-        settings['num_raises'] = 1
-        settings['num_actions'] = args.actions
-        settings['raise_size'] = [1]
-        settings['num_cards'] = settings['num_players'] + settings['num_rounds'] - 1
-        settings['game'] = 'kuhn'
-        settings['state'] = State
-        
+def add_variant(settings):
+    """Adds the update rule and sampling chosen on the command line to the settings"""
+    if args.variant is not None:
+        settings['cfr_variant'] = args.variant
+        if args.variant == 'linear':
+            settings['lcfr_threshold'] = float('inf')
+    settings['dcfr_alpha'] = args.alpha
+    settings['dcfr_beta'] = args.beta
+    settings['dcfr_gamma'] = args.gamma
+    settings['sampling'] = args.sampling
 
-    kuhn_regret = VanillaCFR(settings)
-    kuhn_regret.train(cards, args.iterations)
-    
-elif args.cfr == 2:
-    settings = {'num_players':3}
 
-    if args.game == 1:
-        cards = [Card(11, 1), Card(12, 1), Card(13, 1), Card(14, 1), Card(11, 2), Card(12, 2), Card(13, 2), Card(14, 2)]
-        settings['num_actions'] = 3
-        settings['hand_eval'] = leduc_eval
-        settings['num_rounds'] = 2
-        settings['num_raises'] = 2
-        settings['raise_size'] = [2,4]
-        settings['num_cards'] = settings['num_players'] + settings['num_rounds'] - 1
-        settings['game'] = 'leduc'
-        settings['state'] = LeducState
-    else:
-        cards = [Card(11, 1), Card(12, 1), Card(13, 1), Card(14, 1)]
-        settings['hand_eval'] = kuhn_eval
-        settings['num_rounds'] = 1
-        settings['num_raises'] = 1
-        settings['num_actions'] = args.actions
-        settings['raise_size'] = [1]
-        settings['num_cards'] = settings['num_players'] + settings['num_rounds'] - 1
-        settings['game'] = 'kuhn'
-        settings['state'] = State
+def run(trainer, cards, iterations):
+    trainer.train(cards, iterations)
+    if args.exploitability:
+        print("exploitability: {}".format(trainer.exploitability(cards)))
 
-    three_kuhn = VanillaCFR(settings)
-    three_kuhn.train(cards, args.iterations)
 
-elif args.mccfr == 1:
-    settings = {'num_players':2}
+if args.cfr == 0: 
+    print("Running regret minimization for RPS with strat [.4, .3, .3]")
+    utilities = np.array([[[0, -1, 1], [1, 0, -1], [-1, 1, 0]], [[0, 1, -1], [-1, 0, 1], [1, -1, 0]]])
+    if args.full_info:
+        minimization = MatrixRegretMin(utilities[0], opponent_strategy=np.array([.4, .3, .3]), plus=args.plus)
+    else:
+        minimization = RegretMin(3, utilities[0], np.array([.4, .3, .3]))
+    minimization.train(args.iterations)
+    print(minimization.avg_strategy())
 
-    if args.game == 1:
-        cards = [Card(12, 1), Card(13, 1), Card(14, 1), Card(12, 2), Card(13, 2), Card(14, 2)]
-        settings['num_actions'] = 3
-        settings['hand_eval'] = leduc_eval
-        settings['num_rounds'] = 2
-        settings['num_raises'] = 2
-        settings['raise_size'] = [2,4]
-        settings['num_cards'] = settings['num_players'] + settings['num_rounds'] - 1
-        settings['game'] = 'leduc'
-        settings['state'] = LeducState
+elif args.config is not None or args.cfr in (1, 2) or args.mccfr in (1, 2):
+    if args.config is not None:
+        config = configs.resolve(args.config)
     else:
-        cards = [Card(12, 1), Card(13, 1), Card(14, 1)]
-        settings['hand_eval'] = kuhn_eval
-        settings['num_rounds'] = 1
-        settings['num_raises'] = 1
-        settings['num_actions'] = args.actions
-        settings['raise_size'] = [1]
-        settings['num_cards'] = settings['num_players'] + settings['num_rounds'] - 1
-        settings['game'] = 'kuhn'
-        settings['state'] = State
+        algorithm = 'cfr' if args.cfr in (1, 2) else 'mccfr'
+        num_players = (args.cfr if algorithm == 'cfr' else args.mccfr) + 1
+        config = {'game': GAMES[args.game], 'num_players': num_players, 'algorithm': algorithm}
+        if config['game'] == 'holdem' and algorithm == 'cfr':
+            parser.error("Hold'em can only be trained with MCCFR (-m)")
+        if config['game'] == 'kuhn':
+            config['num_actions'] = args.actions
 
-    mccfr = MonteCarloCFR(settings)
-    mccfr.train(cards, args.iterations)
+    add_variant(config)
+    trainer, cards = configs.make(config)
+    run(trainer, cards, args.iterations or config['iterations'])
 
-elif args.mccfr == 2:
-    cards = np.array([i for i in range(1, 5)])
-    settings = {'num_players':3}
-                
-    if args.game == 1:
-        cards = [Card(11, 1), Card(12, 1), Card(13, 1), Card(14, 1), Card(11, 2), Card(12, 2), Card(13, 2), Card(14, 2)]
-        settings['num_actions'] = 3
-        settings['hand_eval'] = leduc_eval
-        settings['num_rounds'] = 2
-        settings['num_raises'] = 2
-        settings['raise_size'] = [2,4]
-        settings['num_cards'] = settings['num_players'] + settings['num_rounds'] - 1
-        settings['game'] = 'leduc'
-        settings['state'] = LeducState
-    else:
-        cards = [Card(11, 1), Card(12, 1), Card(13, 1), Card(14, 1)]
-        settings['hand_eval'] = kuhn_eval
-        settings['num_rounds'] = 1
-        settings['num_raises'] = 1
-        settings['num_actions'] = args.actions
-        settings['raise_size'] = [1]
-        settings['num_cards'] = settings['num_players'] + settings['num_rounds'] - 1
-        settings['game'] = 'kuhn'
-        settings['state'] = State
-        
-    mccfr = MonteCarloCFR(settings)
-    mccfr.train(cards, args.iterations)
-    
 else:
     parser.print_help()
\ No newline at end of file
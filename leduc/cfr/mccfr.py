@@ -5,6 +5,9 @@ from tqdm import tqdm
 from collections import defaultdict
 from leduc.cfr.vanilla_cfr import VanillaCFR
 from leduc.cfr.node import InfoSet
+from leduc.cfr.discount import Discount
+from leduc.cfr.storage import regret_floor
+from leduc.game.deck import Deck
 
 class MonteCarloCFR(VanillaCFR):
     """An object to run Monte Carlo Counter Factual Regret 
@@ -18,6 +21,11 @@ class MonteCarloCFR(VanillaCFR):
     for the first part of running so that early actions, which tend to be worse, 
     don't dominate later on in the running of the simulation.
 
+    Setting json['sampling'] to 'outcome' samples a single action for
+    every player instead, with importance weighted regrets and
+    exploration for the traverser (outcome sampling). 'chance' samples only
+    the deal and walks every action of every player (chance sampling).
+
 
     Attributes:
         num_players: An integer of players playing
@@ -28,93 +36,111 @@ class MonteCarloCFR(VanillaCFR):
         node_map: a dictionary of nodes of each information set
         num_betting_rounds: int of number of betting rounds
         num_raises: int of max number of raises per round
-        regret_minimum: int for the threshold to prune
+        regret_minimum: int for the threshold to prune, raised to just above
+            the floor of array tables whose dtype cannot hold it (int16)
         strategy_interval: int when to update the strategy sum
         prune_threshold: int for when to start pruning
         discount_interval: int for at n iterations, when to discount
         lcfr_threshold: int for when to discount
+        discounter: Discount of the update rule, linear CFR unless json
+            sets 'cfr_variant'
+        sampling: str of the sampling scheme, one of SAMPLING
+        exploration: float probability of a uniform action for the traverser
+            in outcome sampling
         action_mapping: dict of actions to int
         reverse_mapping: dict of ints to action
     """
-    
+    node_type = InfoSet
+    SAMPLING = ('external', 'outcome', 'chance')
+
     def __init__(self, json, **kwargs):
         """initializes the object
 
-        See object attributes for params
+        See object attributes for params, each can be set through json
         """
         super().__init__(json, **kwargs)
-        self.regret_minimum = -300000
-        self.strategy_interval = 100
-        self.prune_threshold = 200
-        self.discount_interval = 100
-        self.lcfr_threshold = 400
+        self.regret_minimum = json.get('regret_minimum', -300000)
+        floor = regret_floor(json)
+        if floor is not None:
+            # regrets never drop below the floor, so a lower threshold would never prune
+            self.regret_minimum = max(self.regret_minimum, floor / 1.03)
+        self.strategy_interval = json.get('strategy_interval', 100)
+        self.prune_threshold = json.get('prune_threshold', 200)
+        self.discount_interval = json.get('discount_interval', 100)
+        self.lcfr_threshold = json.get('lcfr_threshold', 400)
+        self.discounter = Discount.from_settings(json, 'linear', self.lcfr_threshold)
+        self.sampling = json.get('sampling', 'external')
+        self.exploration = json.get('exploration', .6)
         self.continuation = set(('1', '2', '3', '4'))
+        if self.sampling not in self.SAMPLING:
+            raise ValueError('Unknown sampling {}, expected one of {}'.format(self.sampling, self.SAMPLING))
 
-    def train(self, cards, iterations):
+    def train(self, cards, iterations, verbose=True):
         """Runs MonteCarloCFR and prints the calculated strategies
         
         Prints the average utility for each player at the
         end of training and also the optimal strategies
 
         Args:
-            cards: array-like of ints denoting each card
+            cards: list of Card of the deck
             iterations: int for number of iterations to run
+            verbose: bool of whether to show a progress bar and print the
+                strategies
         """
-        self.state_json['cards'] = cards
-        shuffle = random.shuffle
-        for t in tqdm(range(1, iterations+1), desc='Training'):
-            shuffle(cards)
-            for player in range(self.num_players):
-                state = self.state(self.state_json)
-                if t % self.strategy_interval == 0:
-                    self.update_strategy(player, state)
-                if t > self.prune_threshold:
-                    will_prune = random.random()
-                    if will_prune < .05:
-                        self.mccfr(player, state)
-                    else:
-                        self.mccfr(player, state, prune=True)
-                else:
-                    self.mccfr(player, state)
-
-            if t < self.lcfr_threshold and t % self.discount_interval == 0:
+        deals = Deck(cards).deals(iterations, self.num_cards)
+        for t in tqdm(range(1, iterations+1), desc='Training', disable=not verbose):
+            self.iteration(t, next(deals))
+            if t % self.discount_interval == 0 and self.discounter.active(t):
                 self.discount(t)
+            self.trim()
 
-        expected_utilities = self.expected_utility(cards)
+        if verbose:
+            self.print_strategies(cards)
+
+    def iteration(self, t, deal):
+        """Traverses one deal as every player
+
+        Args:
+            t: int of the iteration, read for pruning and strategy updates
+            deal: list of Card dealt this iteration
+        """
+        self.state_json['cards'] = deal
         for player in range(self.num_players):
-            print("expected utility for player {}: {}".format(
-                player, expected_utilities[player]))
-            player_info_sets = self.node_map[player]
-            print('information set:\tstrategy:\t')
-            for key in sorted(player_info_sets.keys(), key=lambda x: (len(x), x)):
-                node = player_info_sets[key]
-                strategy = node.avg_strategy()
-                if self.json['game'] == 'kuhn':
-                    if self.num_actions == 2:
-                        print("{}:\t P: {} B: {}".format(key, strategy['P'], strategy['B']))
+            state = self.state(self.state_json)
+            if self.sampling == 'outcome':
+                self.outcome_mccfr(player, state, (1,) * self.num_players, 1)
+            elif self.sampling == 'chance':
+                self.chance_mccfr(player, state, 1, 1)
+            else:
+                update = t % self.strategy_interval == 0
+                if t > self.prune_threshold:
+                    will_prune = random.random()
+                    if will_prune < .05:
+                        self.mccfr(player, state, update=update)
                     else:
-                        print("{}:\t F: {} P: {} C: {} R: {}".format(
-                            key, strategy['F'], strategy['P'], strategy['C'], strategy['R']))
-
+                        self.mccfr(player, state, prune=True, update=update)
                 else:
-                    print("{}:\t F: {} C: {} R: {}".format(key, strategy['F'], strategy['C'], strategy['R']))
+                    self.mccfr(player, state, update=update)
 
     def discount(self, t):
-        discount = (t/self.discount_interval)/((t/self.discount_interval)+ 1)
-        for player in range(self.num_players):
-            player_nodes = self.node_map[player]
-            for node in player_nodes.values():
-                node.regret_sum = {key:value * discount for key,value in node.regret_sum.items()}
-                node.strategy_sum = {key:value * discount for key,value in node.strategy_sum.items()}
+        """Discounts the node map after iteration t, counted in discount intervals"""
+        self.discounter.apply(self.node_map, t/self.discount_interval)
 
-    def mccfr(self, player, state, prune=False):
+    def mccfr(self, player, state, prune=False, update=False):
         """Main function that runs the MonteCarloCFR
 
+        The average strategies are accumulated on the same walk: when
+        update is set, every other player's node adds its current strategy
+        to its strategy sum before sampling an action. Since the other
+        players' actions are sampled, each node is reached in proportion to
+        its owner's reach, as the average strategy needs.
+
         Args:
             cards: array-like of ints denoting each card
             history: str of public betting history
             player: int of which player we are traversing with
             prune: boolean of whether to prune or not
+            update: boolean of whether to accumulate the strategy sums
 
         Returns:
             array_like: float of expected utilities
@@ -127,8 +153,7 @@ class MonteCarloCFR(VanillaCFR):
         
         if curr_player == player:
             info_set = state.info_set
-            player_nodes = self.node_map.setdefault(curr_player, {})
-            node = player_nodes.setdefault(info_set, InfoSet(self.actions))
+            node = self.get_node(curr_player, info_set)
 
             valid_actions = state.valid_actions
             strategy = node.strategy(valid_actions)
@@ -142,13 +167,13 @@ class MonteCarloCFR(VanillaCFR):
                 if prune:
                     if node.regret_sum[a] > self.regret_minimum:
                         new_state = state.add(player, a)
-                        calculated_util = self.mccfr(player, new_state, prune=True)
+                        calculated_util = self.mccfr(player, new_state, prune=True, update=update)
                         utilities[a] = calculated_util[curr_player]
                         expected_value += calculated_util * strategy[a]
                         explored.add(a)
                 else:
                     new_state = state.add(player, a)
-                    calculated_util = self.mccfr(player, new_state)
+                    calculated_util = self.mccfr(player, new_state, update=update)
                     utilities[a] = calculated_util[curr_player]
                     expected_value += calculated_util * strategy[a]
             
@@ -161,93 +186,174 @@ class MonteCarloCFR(VanillaCFR):
                     regret = utilities[a] - expected_value[curr_player]
                     node.regret_sum[a] += regret
 
+            if self.discounter.floor:
+                node.discount(1, 0, 1)
+
             return expected_value
 
         else:
             info_set = state.info_set
-            player_nodes = self.node_map.setdefault(curr_player, {})
-            node = player_nodes.setdefault(info_set, InfoSet(self.actions))
+            node = self.get_node(curr_player, info_set)
 
             valid_actions = state.valid_actions
             strategy = node.strategy(valid_actions)
+            if update:
+                for a in valid_actions:
+                    node.strategy_sum[a] += strategy[a]
+
             actions = list(strategy.keys())
             prob = list(strategy.values())
             random_action = random.choices(actions, weights=prob)[0]
             new_state = state.add(curr_player, random_action)
-            return self.mccfr(player, new_state, prune=prune)
+            return self.mccfr(player, new_state, prune=prune, update=update)
 
+    def outcome_mccfr(self, player, state, reach, sample_prob):
+        """Outcome sampling MCCFR, one sampled action at every node
 
-    def update_strategy(self, player, state):
-        """After running for a fixed number of iterations, update the average
-        strategies
-        
-        Since we are running a Monte Carlo process, we can't update
-        the strategy sum after iteration. We run for a fixed number of iterations
-        (strategy_interval) and then update the strategy so as to be sure that
-        the regrets are up to date with the current strategy
+        The traverser samples from its current strategy mixed with
+        exploration, so every action keeps being tried. Utilities are
+        divided by the probability of sampling the terminal history, which
+        keeps the regret estimates unbiased. The average strategy of the
+        other players is accumulated on the way down, each player's weighted
+        by their own reach over the sample probability (stochastically
+        weighted averaging).
 
         Args:
-            history: str of public betting history
-            player: int of which player we are updating
+            player: int of which player we are traversing with
+            state: State of the current node
+            reach: tuple of floats of each player's probability of reaching state
+            sample_prob: float probability of sampling the path to state
+
+        Returns:
+            float: importance weighted utility of player
+            float: probability of every player's actions from state to the
+                sampled terminal (the tail of the history)
         """
         if state.is_terminal:
-            return
-        
+            return state.payoff()[player] / sample_prob, 1
+
         curr_player = state.turn
+        info_set = state.info_set
+        node = self.get_node(curr_player, info_set)
+
+        valid_actions = state.valid_actions
+        strategy = node.strategy(valid_actions)
+        actions = list(valid_actions)
+        prob = [strategy[a] for a in actions]
+
         if curr_player == player:
-            info_set = state.info_set
-            player_nodes = self.node_map.setdefault(curr_player, {})
-            node = player_nodes.setdefault(info_set, InfoSet(self.actions))
-            
-            valid_actions = state.valid_actions
-            strategy = node.strategy(valid_actions)
+            explore = self.exploration / len(actions)
+            sample = [explore + (1 - self.exploration) * p for p in prob]
+        else:
+            sample = prob
+            for a, p in zip(actions, prob):
+                node.strategy_sum[a] += reach[curr_player] * p / sample_prob
 
-            actions = list(strategy.keys())
-            prob = list(strategy.values())
-            random_action = random.choices(actions, weights=prob)[0]
+        i = random.choices(range(len(actions)), weights=sample)[0]
+        random_action = actions[i]
+        new_state = state.add(curr_player, random_action)
+        new_reach = reach[:curr_player] + (reach[curr_player] * prob[i],) + reach[curr_player + 1:]
+        utility, tail = self.outcome_mccfr(player, new_state, new_reach, sample_prob * sample[i])
+
+        if curr_player == player:
+            opp_reach = np.prod(reach[:player] + reach[player + 1:])
+            weighted = utility * opp_reach * tail
+            for a, p in zip(actions, prob):
+                if a == random_action:
+                    node.regret_sum[a] += weighted * (1 - prob[i])
+                else:
+                    node.regret_sum[a] -= weighted * prob[i]
 
-            node.strategy_sum[random_action] += 1
+            if self.discounter.floor:
+                node.discount(1, 0, 1)
 
-            new_state = state.add(player, random_action)
-            self.update_strategy(player, new_state)
+        return utility, tail * prob[i]
 
-        else:
-            info_set = state.info_set
-            player_nodes = self.node_map.setdefault(curr_player, {})
-            node = player_nodes.setdefault(info_set, InfoSet(self.actions))
+    def chance_mccfr(self, player, state, reach, opp_reach):
+        """Chance sampling CFR on the deal sampled in train
 
-            valid_actions = state.valid_actions
+        Every action of every player is walked, as in VanillaCFR, but only
+        the traverser's regrets and average strategy are updated so the
+        players alternate like in the other sampling schemes.
+
+        Args:
+            player: int of which player we are traversing with
+            state: State of the current node
+            reach: float probability of the traverser reaching state
+            opp_reach: float probability of the other players reaching state
+
+        Returns:
+            array_like: float of expected utilities
+        """
+        if state.is_terminal:
+            return np.array(state.payoff())
+
+        curr_player = state.turn
+        info_set = state.info_set
+        node = self.get_node(curr_player, info_set)
+
+        valid_actions = state.valid_actions
+        strategy = node.strategy(valid_actions)
+
+        expected_value = np.zeros(self.num_players)
+        utilities = {}
+        for a in valid_actions:
+            new_state = state.add(curr_player, a)
+            if curr_player == player:
+                calculated_util = self.chance_mccfr(player, new_state, reach * strategy[a], opp_reach)
+            else:
+                calculated_util = self.chance_mccfr(player, new_state, reach, opp_reach * strategy[a])
+            utilities[a] = calculated_util[curr_player]
+            expected_value += calculated_util * strategy[a]
+
+        if curr_player == player:
             for a in valid_actions:
-                new_state = state.add(curr_player, a)
-                self.update_strategy(player, new_state)
+                node.regret_sum[a] += (utilities[a] - expected_value[curr_player]) * opp_reach
+                node.strategy_sum[a] += strategy[a] * reach
 
-    def subgame_solve(self, nature, strategy, iterations):
+            if self.discounter.floor:
+                node.discount(1, 0, 1)
+
+        return expected_value
+
+    def subgame_solve(self, nature, strategy, iterations, progress=True):
+        """Solves a subgame with MCCFR, using strategy for the leaf rollouts
+
+        Args:
+            nature: Nature root of the subgame tree
+            strategy: StrategyOverlay of the blueprint played past the leaves
+            iterations: int number of iterations to run
+            progress: bool of whether to show a progress bar
+
+        Returns:
+            dict: player -> dict of info set -> InfoSet of the subgame
+        """
+        self.rollout_strategy = strategy
         self.strategy = defaultdict(lambda: defaultdict(lambda: InfoSet(self.actions)))
-        for t in tqdm(range(1, iterations+1), desc='Subgame solving'):
-            root = random.choice(nature.children)
+        for t in tqdm(range(1, iterations+1), desc='Subgame solving', disable=not progress):
+            root = nature.sample()
             for player in range(self.num_players):
-                if t % self.strategy_interval == 0:
-                    self.subgame_update_strategy(player, root)
+                update = t % self.strategy_interval == 0
                 if t > self.prune_threshold:
                     will_prune = np.random.random()
                     if will_prune < .05:
-                        self.subgame_mccfr(player, root)
+                        self.subgame_mccfr(player, root, update=update)
                     else:
-                        self.subgame_mccfr(player, root, prune=True)
+                        self.subgame_mccfr(player, root, prune=True, update=update)
                 else:
-                    self.subgame_mccfr(player, root)
+                    self.subgame_mccfr(player, root, update=update)
 
-            if t < self.lcfr_threshold and t % self.discount_interval == 0:
-                discount = (t/self.discount_interval)/(t/self.discount_interval+ 1)
-                for player in range(self.num_players):
-                    player_nodes = self.strategy[player]
-                    for node in player_nodes.values():
-                        node.regret_sum = {key:value * discount for key,value in node.regret_sum.items()}
-                        node.strategy_sum = {key:value * discount for key,value in node.strategy_sum.items()}
+            if t % self.discount_interval == 0 and self.discounter.active(t):
+                self.discounter.apply(self.strategy, t/self.discount_interval)
 
         return self.strategy
 
-    def subgame_mccfr(self, player, tree_node, prune=False):
+    def subgame_mccfr(self, player, tree_node, prune=False, update=False):
+        """MCCFR over a subgame tree, see mccfr
+
+        Leaf nodes choose between the continuation strategies instead of
+        actions and are valued by a blueprint rollout.
+        """
         if tree_node.state.is_terminal:
             utility = tree_node.state.payoff()
             return np.array(utility)
@@ -271,12 +377,12 @@ class MonteCarloCFR(VanillaCFR):
                     for a in valid_actions:
                         if prune:
                             if node.regret_sum[a] > self.regret_minimum:
-                                calculated_util = tree_node.value(curr_player, self.node_map, a)
+                                calculated_util = tree_node.value(curr_player, self.rollout_strategy, a)
                                 utilities[a] = calculated_util[curr_player]
                                 expected_value += calculated_util * strategy[a]
                                 explored.add(a)
                         else:
-                            calculated_util = tree_node.value(curr_player, self.node_map, a)
+                            calculated_util = tree_node.value(curr_player, self.rollout_strategy, a)
                             utilities[a] = calculated_util[curr_player]
                             expected_value += calculated_util * strategy[a]
                 else:
@@ -287,13 +393,13 @@ class MonteCarloCFR(VanillaCFR):
                         if prune:
                             if node.regret_sum[a] > self.regret_minimum:
                                 next_tree_node = tree_node.children[a]
-                                calculated_util = self.subgame_mccfr(player, next_tree_node, prune=True)
+                                calculated_util = self.subgame_mccfr(player, next_tree_node, prune=True, update=update)
                                 utilities[a] = calculated_util[curr_player]
                                 expected_value += calculated_util * strategy[a]
                                 explored.add(a)
                         else:
                             next_tree_node = tree_node.children[a]
-                            calculated_util = self.subgame_mccfr(player, next_tree_node)
+                            calculated_util = self.subgame_mccfr(player, next_tree_node, update=update)
                             utilities[a] = calculated_util[curr_player]
                             expected_value += calculated_util * strategy[a]
                 
@@ -306,6 +412,9 @@ class MonteCarloCFR(VanillaCFR):
                         regret = utilities[a] - expected_value[curr_player]
                         node.regret_sum[a] += regret
 
+                if self.discounter.floor:
+                    node.discount(1, 0, 1)
+
                 return expected_value
             else:
                 #you've already encountered this info set in the game and made a decision
@@ -317,74 +426,24 @@ class MonteCarloCFR(VanillaCFR):
             if not node.is_frozen:
                 valid_actions = tree_node.state.valid_actions if not tree_node.is_leaf else self.continuation
                 strategy = node.strategy(valid_actions)
+                if update:
+                    for a in valid_actions:
+                        node.strategy_sum[a] += strategy[a]
 
                 actions = list(strategy.keys())
                 prob = list(strategy.values())
                 random_action = random.choices(actions, weights=prob)[0]
                 if tree_node.is_leaf:
-                    calculated_util = tree_node.value(curr_player, self.node_map, random_action)
+                    calculated_util = tree_node.value(curr_player, self.rollout_strategy, random_action)
                     return calculated_util
                 else:
                     next_tree_node = tree_node.children[random_action]
-                    return self.subgame_mccfr(player, next_tree_node, prune=prune)
+                    return self.subgame_mccfr(player, next_tree_node, prune=prune, update=update)
 
             else:
                 #you've already encountered this info set in the game and made a decision
                 raise NotImplementedError('Frozen action for infoset')
    
-    def subgame_update_strategy(self, player, tree_node):
-        if tree_node.state.is_terminal:
-            return
-
-        curr_player = tree_node.state.turn
-        if curr_player == player:
-            info_set = tree_node.state.info_set
-            node = self.strategy[curr_player][info_set]
-            if not node.is_frozen:
-                if tree_node.is_leaf:
-                    valid_actions = self.continuation
-                    strategy = node.strategy(valid_actions)
-
-                    actions = list(strategy.keys())
-                    prob = list(strategy.values())
-                    random_action = random.choices(actions, weights=prob)[0]
-                    node.strategy_sum[random_action] += 1
-                    return
-                else:
-                    valid_actions = tree_node.state.valid_actions
-                    strategy = node.strategy(valid_actions)
-
-                    actions = list(strategy.keys())
-                    prob = list(strategy.values())
-                    random_action = random.choices(actions, weights=prob)[0]
-                    node.strategy_sum[random_action] += 1
-                    next_tree_node = tree_node.children[random_action]
-                    self.subgame_update_strategy(player, next_tree_node)
-            else:
-                # take action 
-                raise NotImplementedError("Frozen action for infoset")
-
-        else:
-            info_set = tree_node.state.info_set
-            node = self.strategy[curr_player][info_set]
-            valid_actions = tree_node.state.valid_actions
-            if not node.is_frozen:
-                if tree_node.is_leaf:
-                    strategy = node.strategy(self.continuation)
-
-                    actions = list(strategy.keys())
-                    prob = list(strategy.values())
-                    random_action = random.choices(actions, weights=prob)[0]
-                    node.strategy_sum[random_action] += 1
-                    return
-                else:
-                    for a in valid_actions:
-                            next_tree_node = tree_node.children[a]
-                            self.subgame_update_strategy(player, next_tree_node)
-            else:
-                raise NotImplementedError('Frozen action for infoset')
-
-    
     def expected_utility(self, cards):
         """Calculates the expected utility from the average strategy
 
@@ -433,8 +492,7 @@ class MonteCarloCFR(VanillaCFR):
         try:
             player = state.turn
             info_set = state.info_set
-            player_nodes = self.node_map.setdefault(player, {})
-            node = player_nodes.setdefault(info_set, InfoSet(self.actions))
+            node = self.get_node(player, info_set)
 
             strategy = node.avg_strategy()
             util = np.zeros(self.num_players)
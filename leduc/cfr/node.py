@@ -66,6 +66,22 @@ class Node(RegretMin):
         
         return avg_strategy
 
+    def discount(self, positive, negative, strategy):
+        """Scales the accumulated regrets and strategy sum in place
+
+        Args:
+            positive: float multiplier of positive regrets
+            negative: float multiplier of negative regrets
+            strategy: float multiplier of the strategy sum
+        """
+        regret_sum = self.regret_sum
+        for action, regret in regret_sum.items():
+            regret_sum[action] = regret * (positive if regret > 0 else negative)
+
+        strategy_sum = self.strategy_sum
+        for action, value in strategy_sum.items():
+            strategy_sum[action] = value * strategy
+
     def __repr__(self):
         return 'info: {}\n strategy_sum: {}\n regret: {}\n strategy: {}\n'.format(
             self.info_set, self.strategy_sum, self.regret_sum, self.curr_strategy)
@@ -105,4 +105,143 @@ class RegretMin:
         else:
             avg_strategy = np.ones(self.actions)/self.actions
 
-        return avg_strategy
\ No newline at end of file
+        return avg_strategy
+
+class MatrixRegretMin:
+    """Full-information regret matching on a batch of two-player matrix games
+
+    Instead of sampling one action per player per iteration like RegretMin,
+    every iteration updates the regrets of all actions against the exact
+    expected utility of the other player's strategy. All games of the
+    batch are updated together as array operations, so solving many small
+    normal-form games costs about the same number of Python steps as one.
+
+    Attributes:
+        utilities: a (G, N, M) array of the row player's payoffs in G games
+        opponent_utilities: a (G, N, M) array of the column player's payoffs
+        opponent_strategy: a (G, M) array of a fixed column strategy or None
+        plus: bool of whether to use regret matching+ (floored regrets and
+            linearly weighted averages)
+        regret_sum: list of the (G, N) and (G, M) accumulated regrets
+        strategy_sum: list of the (G, N) and (G, M) accumulated strategies
+        iterations: int number of iterations run so far
+    """
+    def __init__(self, utilities, opponent_utilities=None, opponent_strategy=None, plus=False):
+        """Initializes the MatrixRegretMin class
+
+        Args:
+            utilities: a (N, M) or (G, N, M) array of the row player's payoffs
+            opponent_utilities: array of the column player's payoffs, the
+                negated utilities (zero-sum) if None
+            opponent_strategy: a (M,) or (G, M) array of a fixed column
+                strategy. Only the row player learns when it is given
+            plus: bool of whether to use regret matching+
+        """
+        utilities = np.asarray(utilities, dtype=float)
+        self.single = utilities.ndim == 2
+        self.utilities = utilities[None] if self.single else utilities
+        if opponent_utilities is None:
+            self.opponent_utilities = -self.utilities
+        else:
+            opponent_utilities = np.asarray(opponent_utilities, dtype=float)
+            self.opponent_utilities = opponent_utilities[None] if self.single else opponent_utilities
+
+        num_games, num_rows, num_cols = self.utilities.shape
+        self.opponent_strategy = None
+        if opponent_strategy is not None:
+            self.opponent_strategy = np.broadcast_to(np.asarray(opponent_strategy, dtype=float),
+                (num_games, num_cols))
+
+        self.plus = plus
+        self.regret_sum = [np.zeros((num_games, num_rows)), np.zeros((num_games, num_cols))]
+        self.strategy_sum = [np.zeros((num_games, num_rows)), np.zeros((num_games, num_cols))]
+        self.iterations = 0
+
+    @staticmethod
+    def regret_matching(regret_sum):
+        """Regret matched strategies of a batch of regret vectors
+
+        Args:
+            regret_sum: a (G, N) array of accumulated regrets
+
+        Returns:
+            strategy: a (G, N) array of strategies, uniform where no regret is positive
+        """
+        positive = np.maximum(regret_sum, 0)
+        norm_sum = positive.sum(axis=1, keepdims=True)
+        uniform = np.full_like(positive, 1 / positive.shape[1])
+
+        return np.divide(positive, norm_sum, out=uniform, where=norm_sum > 0)
+
+    def train(self, iterations):
+        """Runs full-information regret matching
+
+        Args:
+            iterations: int of how many iterations to run
+        """
+        row_regret, col_regret = self.regret_sum
+        row_sum, col_sum = self.strategy_sum
+        for _ in range(iterations):
+            self.iterations += 1
+            weight = self.iterations if self.plus else 1
+            row = self.regret_matching(row_regret)
+            if self.opponent_strategy is None:
+                col = self.regret_matching(col_regret)
+            else:
+                col = self.opponent_strategy
+
+            row_utility = np.einsum('gnm,gm->gn', self.utilities, col)
+            row_regret += row_utility - np.einsum('gn,gn->g', row, row_utility)[:, None]
+            row_sum += row * weight
+
+            if self.opponent_strategy is None:
+                col_utility = np.einsum('gnm,gn->gm', self.opponent_utilities, row)
+                col_regret += col_utility - np.einsum('gm,gm->g', col, col_utility)[:, None]
+                col_sum += col * weight
+
+            if self.plus:
+                np.maximum(row_regret, 0, out=row_regret)
+                np.maximum(col_regret, 0, out=col_regret)
+
+    def _average(self, strategy_sum):
+        avg_strategy = self.regret_matching(strategy_sum)
+
+        return avg_strategy[0] if self.single else avg_strategy
+
+    def avg_strategy(self):
+        """Calculates the row player's average strategy in every game
+
+        Returns:
+            avg_strategy: a (N,) or (G, N) array of average strategies
+        """
+        return self._average(self.strategy_sum[0])
+
+    def opponent_avg_strategy(self):
+        """Calculates the column player's average strategy in every game
+
+        Returns:
+            avg_strategy: a (M,) or (G, M) array, the fixed strategy if one was given
+        """
+        if self.opponent_strategy is not None:
+            return self.opponent_strategy[0] if self.single else self.opponent_strategy
+
+        return self._average(self.strategy_sum[1])
+
+    def exploitability(self):
+        """Exploitability of the average strategies of zero-sum games
+
+        Returns:
+            float or array_like: how much a best responder gains against
+                the average strategies (0 at a Nash equilibrium)
+        """
+        row = self.regret_matching(self.strategy_sum[0])
+        if self.opponent_strategy is None:
+            col = self.regret_matching(self.strategy_sum[1])
+        else:
+            col = self.opponent_strategy
+
+        best_row = np.einsum('gnm,gm->gn', self.utilities, col).max(axis=1)
+        best_col = np.einsum('gnm,gn->gm', self.utilities, row).min(axis=1)
+        exploitability = best_row - best_col
+
+        return exploitability[0] if self.single else exploitability
@@ -0,0 +1,588 @@
+import mmap
+import os
+import pickle
+import sys
+import tempfile
+import numpy as np
+from collections import OrderedDict
+from leduc.cfr.node import InfoSet
+
+
+STORAGE = ('dict', 'spill', 'array')
+REGRET_DTYPES = ('float32', 'int32', 'int16')
+# fixed point units per chip integer regrets get at least by default
+MIN_REGRET_SCALE = 100
+
+
+def make_table(json, player, node_type=InfoSet, actions=()):
+    """Creates the info set table of one player
+
+    Args:
+        json: dict of settings, read for 'storage' (one of STORAGE),
+            'memory_limit' (bytes kept in memory by all players together)
+            and 'spill_path' (prefix of the spill files, a temporary file if
+            None) of spill tables and 'regret_dtype', 'regret_scale',
+            'regret_minimum' and 'regret_floor' of array tables
+        player: int of the player the table belongs to
+        node_type: class of the nodes stored in the table
+        actions: list of str of the actions of every node
+
+    Returns:
+        dict, SpillTable or ArrayTable: an empty table of info set -> node
+    """
+    storage = json.get('storage', 'dict')
+    if storage == 'dict':
+        return {}
+    if storage == 'array':
+        dtype = json.get('regret_dtype', 'float32')
+        floor = json.get('regret_floor', 1.03 * json.get('regret_minimum', -300000))
+        return ArrayTable(node_type, actions, dtype, json.get('regret_scale'), floor)
+    if storage == 'spill':
+        memory_limit = json.get('memory_limit', 1 << 30) // json['num_players']
+        path = json.get('spill_path')
+        if path is not None:
+            path = '{}.{}'.format(path, player)
+        return SpillTable(memory_limit, path)
+
+    raise ValueError('Unknown storage {}, expected one of {}'.format(storage, STORAGE))
+
+
+def regret_range(dtype='float32', scale=None, floor=-309000.):
+    """Fixed point scale and clamping range of the regrets of an ArrayTable
+
+    Int types default to at least MIN_REGRET_SCALE units per chip, and when
+    the floor does not fit the dtype at that scale the floor is raised
+    instead (int16 holds about +-327 chips).
+
+    Args:
+        dtype: str of the regret dtype, one of REGRET_DTYPES
+        scale: float fixed point units per chip of int types, picked from
+            the floor if None
+        floor: float smallest regret wanted
+
+    Returns:
+        tuple: float scale, float floor and float ceiling of stored regrets
+    """
+    if dtype not in REGRET_DTYPES:
+        raise ValueError('Unknown regret dtype {}, expected one of {}'.format(dtype, REGRET_DTYPES))
+
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'i':
+        return 1, floor, float(np.finfo(dtype).max)
+
+    info = np.iinfo(dtype)
+    if scale is None:
+        # the floor is clamped to what fits rather than dropping below
+        # MIN_REGRET_SCALE, where most updates round to 0
+        scale = max(MIN_REGRET_SCALE, min(1000, info.max / abs(floor)))
+    elif scale < 1:
+        raise ValueError('A regret scale of {} rounds regret updates below a chip to 0, use at least 1'.format(scale))
+    return scale, max(floor, info.min / scale), info.max / scale
+
+
+def regret_floor(json):
+    """Smallest regret the array tables of a settings dict store, None
+    for the other backends"""
+    if json.get('storage', 'dict') != 'array':
+        return None
+    floor = json.get('regret_floor', 1.03 * json.get('regret_minimum', -300000))
+    return regret_range(json.get('regret_dtype', 'float32'), json.get('regret_scale'), floor)[1]
+
+
+def node_size(info_set, node):
+    """Estimates the bytes an info set and its node take in memory"""
+    size = sys.getsizeof(info_set) + sys.getsizeof(node) + sys.getsizeof(vars(node))
+    for value in vars(node).values():
+        size += sys.getsizeof(value)
+        if isinstance(value, (dict, set)):
+            values = value.values() if isinstance(value, dict) else value
+            size += sum(sys.getsizeof(v) for v in values)
+
+    return size
+
+
+class SpillTable:
+    """An info set table that keeps its hot nodes in memory and spills cold
+    ones to a memory mapped file
+
+    Nodes live in an LRU ordered dict until it holds more than the memory
+    limit. Cold nodes are pickled into an append only file and read back
+    through an mmap on their next lookup. Each node keeps its slot in the
+    file and is rewritten in place when it still fits. Space of moved nodes
+    is reclaimed by compacting the file once it is mostly garbage.
+
+    Trainers hold on to nodes for a whole traversal, so nothing is evicted
+    on lookup. The table only shrinks back under its limit in trim, which
+    the trainers call between iterations.
+
+    Attributes:
+        memory_limit: int of bytes of nodes kept in memory (estimated)
+        hot: OrderedDict of info set -> node in memory, least recent first
+        slots: dict of info set -> (offset, length) of its record in the file
+        hits: int number of lookups served from memory
+        misses: int number of lookups read from disk
+        evictions: int number of nodes written to disk
+    """
+    def __init__(self, memory_limit, path=None):
+        self.memory_limit = memory_limit
+        self.path = path
+        self.hot = OrderedDict()
+        self.slots = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._node_bytes = None
+        self._end = 0
+        self._garbage = 0
+        self._dirty = False
+        self._map = None
+        self._file = open(path, 'w+b') if path is not None else tempfile.TemporaryFile()
+
+    @property
+    def capacity(self):
+        """int number of nodes kept in memory after trim"""
+        if self._node_bytes is None:
+            return sys.maxsize
+        return max(1, self.memory_limit // self._node_bytes)
+
+    def __getitem__(self, info_set):
+        hot = self.hot
+        try:
+            node = hot[info_set]
+        except KeyError:
+            node = self._load(info_set)
+            self.misses += 1
+            hot[info_set] = node
+            return node
+
+        self.hits += 1
+        hot.move_to_end(info_set)
+        return node
+
+    def __setitem__(self, info_set, node):
+        if self._node_bytes is None:
+            self._node_bytes = node_size(info_set, node)
+        self.hot[info_set] = node
+        self.hot.move_to_end(info_set)
+
+    def __contains__(self, info_set):
+        return info_set in self.hot or info_set in self.slots
+
+    def __iter__(self):
+        yield from list(self.hot)
+        for info_set in list(self.slots):
+            if info_set not in self.hot:
+                yield info_set
+
+    def __len__(self):
+        return len(self.hot) + sum(1 for info_set in self.slots if info_set not in self.hot)
+
+    def __reduce__(self):
+        # pickles as a plain dict, so saved strategies load without the table
+        return dict, (list(self.items()),)
+
+    def get(self, info_set, default=None):
+        try:
+            return self[info_set]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        for info_set in self:
+            yield info_set, self.peek(info_set)
+
+    def values(self):
+        """Yields every node, writing changes to cold nodes back to disk"""
+        for info_set in list(self.hot):
+            yield self.hot[info_set]
+
+        for info_set in list(self.slots):
+            if info_set not in self.hot:
+                node = self._load(info_set)
+                yield node
+                self._write(info_set, node)
+
+    def peek(self, info_set):
+        """Gets a node without bringing it into memory or counting a lookup"""
+        try:
+            return self.hot[info_set]
+        except KeyError:
+            return self._load(info_set)
+
+    def trim(self):
+        """Spills the least recently used nodes until under the memory limit"""
+        capacity = self.capacity
+        hot = self.hot
+        while len(hot) > capacity:
+            info_set, node = hot.popitem(last=False)
+            self._write(info_set, node)
+            self.evictions += 1
+
+        if self._garbage > max(self._end // 2, 1 << 20):
+            self._compact()
+
+        self._flush()
+
+    def stats(self):
+        """Gets the counters of the table
+
+        Returns:
+            dict: nodes in memory and on disk, lookup hits and misses,
+                evictions and bytes of the spill file
+        """
+        return {'hot': len(self.hot), 'spilled': len(self.slots), 'hits': self.hits,
+            'misses': self.misses, 'evictions': self.evictions, 'file_bytes': self._end}
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _flush(self):
+        if self._dirty:
+            self._file.flush()
+            self._dirty = False
+
+    def _load(self, info_set):
+        offset, length = self.slots[info_set]
+        self._flush()
+        if self._map is None or len(self._map) < offset + length:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return pickle.loads(self._map[offset:offset + length])
+
+    def _write(self, info_set, node):
+        data = pickle.dumps(node, pickle.HIGHEST_PROTOCOL)
+        slot = self.slots.get(info_set)
+        if slot is not None and len(data) <= slot[1]:
+            offset = slot[0]
+            self._garbage += slot[1] - len(data)
+        else:
+            if slot is not None:
+                self._garbage += slot[1]
+            offset = self._end
+            self._end += len(data)
+
+        self._file.seek(offset)
+        self._file.write(data)
+        self._dirty = True
+        self.slots[info_set] = (offset, len(data))
+
+    def _compact(self):
+        """Rewrites the spill file with only the live records"""
+        records = [(info_set, self._load(info_set)) for info_set in self.slots if info_set not in self.hot]
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+        self._file.seek(0)
+        self._file.truncate()
+        self.slots = {}
+        self._end = 0
+        self._garbage = 0
+        for info_set, node in records:
+            self._write(info_set, node)
+
+
+class RowView:
+    """A dict-like view of one row of an ArrayTable array
+
+    Attributes:
+        table: ArrayTable the row belongs to
+        row: int of the row
+        regrets: bool of whether the row is of the regrets (scaled) or of
+            the strategy sums
+    """
+    __slots__ = ('table', 'row', 'regrets')
+
+    def __init__(self, table, row, regrets):
+        self.table = table
+        self.row = row
+        self.regrets = regrets
+
+    @property
+    def array(self):
+        # looked up on every access, the table replaces its arrays as it grows
+        return self.table.regrets if self.regrets else self.table.strategy_sums
+
+    def __getitem__(self, action):
+        value = self.array[self.row, self.table.columns[action]]
+        if self.regrets:
+            return float(value) / self.table.scale
+        return float(value)
+
+    def __setitem__(self, action, value):
+        if self.regrets:
+            value = self.table.store(value)
+        self.array[self.row, self.table.columns[action]] = value
+
+    def __contains__(self, action):
+        return action in self.table.columns
+
+    def __iter__(self):
+        return iter(self.table.columns)
+
+    def __len__(self):
+        return len(self.table.columns)
+
+    def get(self, action, default=None):
+        if action not in self.table.columns:
+            return default
+        return self[action]
+
+    def keys(self):
+        return self.table.columns.keys()
+
+    def values(self):
+        values = self.array[self.row].tolist()
+        if self.regrets:
+            return [value / self.table.scale for value in values]
+        return values
+
+    def items(self):
+        return zip(self.table.columns, self.values())
+
+
+class ArrayNode:
+    """An info set node backed by a row of an ArrayTable
+
+    It has the interface of the node_type of its table, but regrets and
+    strategy sums live in the table's arrays and are read and written
+    through RowView.
+
+    Attributes:
+        table: ArrayTable the node belongs to
+        row: int of the node's row
+        regret_sum: RowView of the accumulated regrets
+        strategy_sum: RowView of the average strategy sum
+        curr_strategy: dict of the last average strategy
+    """
+    __slots__ = ('table', 'row', 'regret_sum', 'strategy_sum', 'curr_strategy')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+        self.regret_sum = RowView(table, row, True)
+        self.strategy_sum = RowView(table, row, False)
+        self.curr_strategy = {}
+
+    @property
+    def actions(self):
+        return set(self.table.columns)
+
+    @property
+    def is_frozen(self):
+        return self.row in self.table.frozen
+
+    @is_frozen.setter
+    def is_frozen(self, frozen):
+        if frozen:
+            self.table.frozen.add(self.row)
+        else:
+            self.table.frozen.discard(self.row)
+
+    def strategy(self, actions, weight=1):
+        """Calculates the new strategy based on regrets, see Node.strategy
+
+        Args:
+            actions: set of valid actions
+            weight: float of probability that you are at that info set
+
+        Returns:
+            dict: action -> probability of each valid action
+        """
+        table = self.table
+        for a in actions:
+            if a not in table.columns:
+                table.add_action(a)
+
+        columns = table.columns
+        regrets = table.regrets[self.row].tolist()
+        positive = {a: regrets[columns[a]] for a in actions if regrets[columns[a]] > 0}
+        norm_sum = sum(positive.values())
+
+        if norm_sum > 0:
+            strat = {a: positive.get(a, 0) / norm_sum for a in actions}
+        else:
+            strat = {a: 1 / len(actions) for a in actions}
+
+        if table.accumulate:
+            strategy_sums = table.strategy_sums
+            for a, p in strat.items():
+                strategy_sums[self.row, columns[a]] += p * weight
+
+        return strat
+
+    def avg_strategy(self):
+        actions = [a for a in self.table.columns if not a.isdigit()]
+        sums = self.strategy_sum
+        values = [sums[a] for a in actions]
+        norm_sum = sum(values)
+
+        if norm_sum > 0:
+            avg_strategy = {a: value / norm_sum for a, value in zip(actions, values)}
+        else:
+            avg_strategy = {a: 1 / len(actions) for a in actions}
+
+        self.curr_strategy = avg_strategy
+
+        return avg_strategy
+
+    def add_action(self, action):
+        if action not in self.table.columns:
+            self.table.add_action(action)
+
+    def discount(self, positive, negative, strategy):
+        self.table.discount_rows(positive, negative, strategy, self.row)
+
+    def clear(self):
+        self.table.regrets[self.row] = 0
+        self.table.strategy_sums[self.row] = 0
+
+    def to_node(self):
+        """Copies the row into a standalone node of the table's node_type"""
+        node = self.table.node_type(self.table.actions)
+        for a in self.table.columns:
+            if a not in node.actions:
+                node.add_action(a)
+        node.regret_sum = dict(self.regret_sum.items())
+        node.strategy_sum = dict(self.strategy_sum.items())
+        if hasattr(node, 'is_frozen'):
+            node.is_frozen = self.is_frozen
+
+        return node
+
+
+class ArrayTable:
+    """An info set table stored as two 2D arrays, one row per info set
+
+    Regrets are float32 or fixed point int32/int16 (regret * scale rounded)
+    and strategy sums are float32, which takes 4-8x less memory than the
+    dicts of python floats in InfoSet. Stored regrets are clamped to
+    [floor, largest value of the dtype]; the floor sits a little below the
+    pruning threshold (regret_minimum), so pruned actions stay pruned
+    without the regrets of int types wrapping around. See regret_range for
+    the scale and floor of int types.
+
+    Attributes:
+        node_type: class whose interface the nodes mimic
+        actions: list of str of the actions every node is created with
+        columns: dict of action -> column
+        rows: dict of info set -> row
+        regrets: array_like of the regrets
+        strategy_sums: array_like of float32 strategy sums
+        scale: float fixed point units per unit of regret
+        floor: float smallest regret stored
+        accumulate: bool of whether strategy adds to the strategy sum (Node)
+            or not (InfoSet)
+        frozen: set of rows of frozen info sets
+    """
+    def __init__(self, node_type, actions, dtype='float32', scale=None, floor=-309000.):
+        self.node_type = node_type
+        self.actions = list(actions)
+        self.columns = {}
+        for a in node_type(actions).actions:
+            self.columns[a] = len(self.columns)
+        self.rows = {}
+        self.scale, self.floor, self.ceiling = regret_range(dtype, scale, floor)
+        self.dtype = np.dtype(dtype)
+        self.integer = self.dtype.kind == 'i'
+        self.accumulate = not issubclass(node_type, InfoSet)
+        self.frozen = set()
+
+        self.regrets = np.zeros((16, len(self.columns)), dtype=self.dtype)
+        self.strategy_sums = np.zeros((16, len(self.columns)), dtype=np.float32)
+
+    def store(self, regret):
+        """Converts a regret to its stored value, clamped to the table's range"""
+        regret = min(max(regret, self.floor), self.ceiling)
+        if self.integer:
+            return round(regret * self.scale)
+        return regret
+
+    def __getitem__(self, info_set):
+        return ArrayNode(self, self.rows[info_set])
+
+    def __setitem__(self, info_set, node):
+        try:
+            row = self.rows[info_set]
+        except KeyError:
+            row = self.rows[info_set] = len(self.rows)
+            if row == len(self.regrets):
+                self.regrets = np.concatenate((self.regrets, np.zeros_like(self.regrets)))
+                self.strategy_sums = np.concatenate((self.strategy_sums, np.zeros_like(self.strategy_sums)))
+
+        view = ArrayNode(self, row)
+        for a in node.actions:
+            view.add_action(a)
+        view.clear()
+        for a, value in node.regret_sum.items():
+            view.regret_sum[a] = value
+        for a, value in node.strategy_sum.items():
+            view.strategy_sum[a] = value
+        view.is_frozen = getattr(node, 'is_frozen', False)
+
+    def __contains__(self, info_set):
+        return info_set in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __reduce__(self):
+        # pickles as a plain dict of nodes, so saved strategies load without numpy tables
+        return dict, ([(info_set, self[info_set].to_node()) for info_set in self.rows],)
+
+    def get(self, info_set, default=None):
+        try:
+            return self[info_set]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.rows.keys()
+
+    def values(self):
+        for row in self.rows.values():
+            yield ArrayNode(self, row)
+
+    def items(self):
+        for info_set, row in self.rows.items():
+            yield info_set, ArrayNode(self, row)
+
+    def add_action(self, action):
+        """Adds a column for an action no node had before"""
+        self.columns[action] = len(self.columns)
+        self.regrets = np.pad(self.regrets, ((0, 0), (0, 1)))
+        self.strategy_sums = np.pad(self.strategy_sums, ((0, 0), (0, 1)))
+
+    def discount(self, positive, negative, strategy):
+        """Scales the regrets and strategy sums of every node, see Node.discount"""
+        self.discount_rows(positive, negative, strategy, slice(0, len(self.rows)))
+
+    def discount_rows(self, positive, negative, strategy, rows):
+        regrets = self.regrets[rows].astype(np.float64)
+        regrets *= np.where(regrets > 0, positive, negative)
+        if self.integer:
+            regrets = np.rint(regrets)
+        self.regrets[rows] = regrets
+        self.strategy_sums[rows] *= strategy
+
+    def stats(self):
+        """Gets the size of the table
+
+        Returns:
+            dict: number of info sets, columns and bytes of the arrays
+        """
+        return {'info_sets': len(self.rows), 'columns': len(self.columns),
+            'bytes': self.regrets[:len(self.rows)].nbytes + self.strategy_sums[:len(self.rows)].nbytes}
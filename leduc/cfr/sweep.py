@@ -0,0 +1,181 @@
+import argparse
+import csv
+import json
+import random
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+from itertools import product
+from leduc.cfr import configs
+
+
+# columns of a sweep result, in table order
+COLUMNS = ('name', 'game', 'num_players', 'algorithm', 'iterations', 'seconds', 'iterations_per_second',
+    'info_sets', 'exploitability', 'error')
+
+
+def grid(base, **axes):
+    """Configs of every combination of values of some settings
+
+    e.g. grid('mccfr-leduc2', cfr_variant=['linear', 'dcfr'], prune_threshold=[200, 1000])
+    gives four configs named like 'mccfr-leduc2 cfr_variant=dcfr prune_threshold=200'.
+
+    Args:
+        base: str name in CONFIGS or config dict
+        axes: list of values of each setting
+
+    Returns:
+        list: config dicts
+    """
+    base = configs.resolve(base)
+    keys = sorted(axes)
+    sweep = []
+    for values in product(*(axes[key] for key in keys)):
+        config = dict(base, **dict(zip(keys, values)))
+        config['name'] = ' '.join([base['name']] + ['{}={}'.format(key, value) for key, value in zip(keys, values)])
+        sweep.append(config)
+
+    return sweep
+
+
+def run_config(config, exploitability=True, seed=0):
+    """Trains one config and measures it
+
+    Args:
+        config: str name in CONFIGS or config dict
+        exploitability: bool of whether to compute the exploitability of
+            the average strategy, never done for Hold'em
+        seed: int random seed
+
+    Returns:
+        dict: the COLUMNS of the run, exploitability is None when skipped
+            and error is always None (see _run)
+    """
+    config = configs.resolve(config)
+    random.seed(seed)
+    np.random.seed(seed)
+    trainer, cards = configs.make(config)
+
+    start = time.perf_counter()
+    trainer.train(cards, config['iterations'], verbose=False)
+    seconds = time.perf_counter() - start
+
+    result = {key: config[key] for key in ('name', 'game', 'num_players', 'algorithm', 'iterations')}
+    result['seconds'] = seconds
+    result['iterations_per_second'] = config['iterations'] / seconds if seconds > 0 else float('inf')
+    result['info_sets'] = sum(len(nodes) for nodes in trainer.node_map.values())
+    result['exploitability'] = None
+    if exploitability and config['game'] != 'holdem':
+        result['exploitability'] = float(trainer.exploitability(cards))
+    result['error'] = None
+
+    return result
+
+
+def _run(task):
+    """Runs a config, a failing one gives a row with its error instead
+    of aborting the whole sweep"""
+    config, exploitability, seed = task
+    try:
+        return run_config(config, exploitability, seed)
+    except Exception as e:
+        result = dict.fromkeys(COLUMNS)
+        result.update({key: config[key] for key in ('name', 'game', 'num_players', 'algorithm', 'iterations')})
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+        return result
+
+
+def sweep(sweep_configs, processes=None, exploitability=True, seed=0):
+    """Trains many configs in parallel, one process per config
+
+    Every config trains with the same seed, so configs that differ in a
+    single setting see the same deals.
+
+    Args:
+        sweep_configs: list of str names in CONFIGS or config dicts
+        processes: int number of processes, defaults to the cpu count
+        exploitability: bool of whether to compute exploitabilities
+        seed: int random seed of every run
+
+    Returns:
+        list: result dicts of run_config, in the order of sweep_configs
+    """
+    tasks = [(configs.resolve(config), exploitability, seed) for config in sweep_configs]
+
+    if 'fork' in mp.get_all_start_methods():
+        context = mp.get_context('fork')
+    else:
+        context = mp.get_context()
+
+    # one task at a time per worker, runs take very different times
+    with context.Pool(processes, maxtasksperchild=1) as pool:
+        return pool.map(_run, tasks, chunksize=1)
+
+
+def table(results):
+    """Formats sweep results as a plain text table
+
+    Returns:
+        str: one row per result under a header of COLUMNS
+    """
+    def cell(value):
+        if value is None:
+            return '-'
+        if isinstance(value, float):
+            return '{:.4g}'.format(value)
+        return str(value)
+
+    rows = [list(COLUMNS)] + [[cell(result[column]) for column in COLUMNS] for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+    lines = ['  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+
+def _value(text):
+    """Parses a grid value as json, falling back to a string"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Trains many CFR configs in parallel and tabulates the results')
+    parser.add_argument('-c', '--configs', nargs='+', default=['cfr-kuhn2', 'mccfr-kuhn2', 'mccfr-leduc2'],
+        help='names of configs in leduc/cfr/configs.py')
+    parser.add_argument('-g', '--grid', nargs='*', default=[], metavar='KEY=VALUES',
+        help='settings to sweep over every config, e.g. cfr_variant=linear,dcfr prune_threshold=200,1000')
+    parser.add_argument('-i', '--iterations', default=None, type=int, help='iterations of every config instead of its own')
+    parser.add_argument('-p', '--processes', default=None, type=int, help='number of processes')
+    parser.add_argument('-s', '--seed', default=0, type=int, help='random seed of every run')
+    parser.add_argument('--no-exploitability', action='store_true', help='skip the exploitability of the results')
+    parser.add_argument('-o', '--output', default=None, help='path of a .csv or .json file of the results')
+    args = parser.parse_args()
+
+    axes = {}
+    for axis in args.grid:
+        key, _, values = axis.partition('=')
+        axes[key] = [_value(value) for value in values.split(',')]
+
+    sweep_configs = []
+    for name in args.configs:
+        sweep_configs.extend(grid(name, **axes))
+    if args.iterations is not None:
+        for config in sweep_configs:
+            config['iterations'] = args.iterations
+
+    start = time.perf_counter()
+    results = sweep(sweep_configs, args.processes, not args.no_exploitability, args.seed)
+    print(table(results))
+    print("{} configs in {:.1f}s".format(len(results), time.perf_counter() - start), file=sys.stderr)
+
+    if args.output is not None:
+        with open(args.output, 'w', newline='') as f:
+            if args.output.endswith('.json'):
+                json.dump(results, f, indent=2)
+            else:
+                writer = csv.DictWriter(f, COLUMNS)
+                writer.writeheader()
+                writer.writerows(results)
@@ -5,6 +5,11 @@ from itertools import permutations
 from tqdm import tqdm
 from collections import defaultdict
 from leduc.cfr.node import Node
+from leduc.cfr.index import PublicStateIndex
+from leduc.cfr.discount import Discount
+from leduc.cfr.storage import make_table
+from leduc.game.deck import Deck
+from leduc.game.holdem import holdem_actions
 
 class VanillaCFR:
     """An object to run Vanilla Counterfactual regret on Kuhn poker, or other games
@@ -20,8 +25,13 @@ class VanillaCFR:
         num_players: An integer of players playing
         num_actions: An integer of actions
         actions: A list of strings of the allowed actions
-        node_map: a dictionary of nodes of each information set
+        node_map: a dictionary of nodes of each information set, the
+            table of each player is made by storage.make_table
+        public_index: a PublicStateIndex over the info sets of node_map
+        discounter: Discount of the update rule (json 'cfr_variant')
     """
+    node_type = Node
+
     def __init__(self, json, **kwargs):
         """Initializes the Vanilla CFR
 
@@ -45,11 +55,13 @@ class VanillaCFR:
                 self.actions = ['P', 'B']
             else:
                 self.actions = ['F', 'P', 'C', 'R']
-        else:
-            if json['game'] == 'leduc':
-                self.actions = ['F', 'C', 'R']
-                
+        elif json['game'] == 'leduc':
+            self.actions = ['F', 'C', 'R']
+        elif json['game'] == 'holdem':
+            self.actions = holdem_actions(json['raise_size'])
+
         self.node_map = {}
+        self.discounter = Discount.from_settings(json)
 
         self.json = json
         self.state_json = {'num_players': json['num_players'], 
@@ -59,43 +71,112 @@ class VanillaCFR:
                         'hand_eval':json['hand_eval'],
                         'raise_size':json['raise_size'],
                         'actions':self.actions}
+        if json['game'] == 'holdem':
+            for key in ('blinds', 'stack', 'board_cards'):
+                if key in json:
+                    self.state_json[key] = json[key]
+        if 'buckets' in json:
+            self.state_json['buckets'] = json['buckets']
+
+    @property
+    def node_map(self):
+        return self._node_map
+
+    @node_map.setter
+    def node_map(self, node_map):
+        """Replaces the node map and re-indexes it by public state"""
+        self._node_map = node_map
+        self.public_index = PublicStateIndex.from_node_map(node_map)
+
+    def get_node(self, player, info_set):
+        """Gets the node of an info set, creating and indexing it if new
+
+        Args:
+            player: int of the player acting at the info set
+            info_set: str of the information set
 
-    def train(self, cards, iterations):
+        Returns:
+            Node: the node of the info set
+        """
+        try:
+            player_nodes = self.node_map[player]
+        except KeyError:
+            player_nodes = self.node_map[player] = make_table(self.json, player, self.node_type, self.actions)
+
+        try:
+            return player_nodes[info_set]
+        except KeyError:
+            player_nodes[info_set] = self.node_type(self.actions)
+            self.public_index.add(player, info_set)
+            # array tables copy the node into a row and hand out views of it
+            return player_nodes[info_set]
+
+    def trim(self):
+        """Brings disk backed tables back under their memory limit
+
+        Called between iterations, when no traversal holds on to nodes
+        """
+        for player_nodes in self.node_map.values():
+            trim = getattr(player_nodes, 'trim', None)
+            if trim is not None:
+                trim()
+
+    def storage_stats(self):
+        """Gets the counters of each disk backed table
+
+        Returns:
+            dict: player -> dict of counters (see SpillTable.stats and ArrayTable.stats)
+        """
+        return {player: player_nodes.stats() for player, player_nodes in self.node_map.items()
+            if hasattr(player_nodes, 'stats')}
+
+    def train(self, cards, iterations, verbose=True):
         """Runs CFR and prints the calculated strategies
         
         Prints the average utility for each player at the
         end of training and also the optimal strategies
 
         Args:
-            cards: array-like of ints denoting each card
+            cards: list of Card of the deck
             iterations: int for number of iterations to run
+            verbose: bool of whether to show a progress bar and print the
+                strategies
         """
-        self.state_json['cards'] = cards
-        for _ in tqdm(range(1, iterations+1), desc='Training'):
-            np.random.shuffle(cards)
+        deals = Deck(cards).deals(iterations, self.num_cards)
+        for t in tqdm(range(1, iterations+1), desc='Training', disable=not verbose):
+            self.state_json['cards'] = next(deals)
             prob = tuple(np.ones(self.num_players))
             hand = self.state(self.state_json)
             self.cfr(hand, prob)
+            if self.discounter.active(t):
+                self.discounter.apply(self.node_map, t)
+            self.trim()
+
+        if verbose:
+            self.print_strategies(cards)
 
-        expected_utilities = self.expected_utility(cards)
+    def print_strategies(self, cards):
+        """Prints the expected utilities and the average strategy of every info set
+
+        Hold'em has far too many deals to enumerate, so its expected
+        utilities are skipped.
+
+        Args:
+            cards: list of Card of the deck
+        """
+        if self.json['game'] != 'holdem':
+            expected_utilities = self.expected_utility(cards)
         for player in range(self.num_players):
-            print("expected utility for player {}: {}".format(
-                player, expected_utilities[player]))
+            if self.json['game'] != 'holdem':
+                print("expected utility for player {}: {}".format(
+                    player, expected_utilities[player]))
             player_info_sets = self.node_map[player]
             print('information set:\tstrategy:\t')
             for key in sorted(player_info_sets.keys(), key=lambda x: (len(x), x)):
                 node = player_info_sets[key]
                 strategy = node.avg_strategy()
-                if self.json['game'] == 'kuhn':
-                    if self.num_actions == 2:
-                        print("{}:\t P: {} B: {}".format(key, strategy['P'], strategy['B']))
-                    else:
-                        print("{}:\t F: {} P: {} C: {} R: {}".format(
-                            key, strategy['F'], strategy['P'], strategy['C'], strategy['R']))
-
-                else:
-                    print("{}:\t F: {} C: {} R: {}".format(key, strategy['F'], strategy['C'], strategy['R']))
-
+                print("{}:\t {}".format(key, ' '.join(
+                    "{}: {}".format(a, strategy.get(a, 0)) for a in self.actions)))
 
     def cfr(self, hand, probability):    
         """Runs the VanillaCFR algorithm
@@ -120,8 +201,7 @@ class VanillaCFR:
 
         player = hand.turn
         info_set = hand.info_set
-        player_nodes = self.node_map.setdefault(player, {})
-        node = player_nodes.setdefault(info_set, Node(self.actions))
+        node = self.get_node(player, info_set)
 
         valid_actions = hand.valid_actions
         strategy = node.strategy(valid_actions, probability[player])
@@ -146,6 +226,9 @@ class VanillaCFR:
             regret = utilities[a] - node_util[player]
             node.regret_sum[a] += regret * opp_prob
 
+        if self.discounter.floor:
+            node.discount(1, 0, 1)
+
         return node_util
 
     def expected_utility(self, cards):
@@ -207,4 +290,106 @@ class VanillaCFR:
                 new_hand = hand.add(player, a)
                 util += self.traverse_tree(new_hand) * strategy[a]
 
-        return util
\ No newline at end of file
+        return util
+
+    def deals(self, cards):
+        """Every ordered deal of num_cards from cards
+
+        Args:
+            cards: array_like of the deck
+
+        Returns:
+            list: lists of cards, private cards first then the board
+        """
+        return [list(t) for t in set(permutations(cards, self.num_cards))]
+
+    def best_response(self, cards, player, best=True):
+        """Value of a best response against the average strategy
+
+        Walks the public tree once with every deal at the same time, so a
+        player's action can be chosen per info set over all deals that
+        share it. Info sets the other players never reached are played
+        uniformly.
+
+        Args:
+            cards: array_like of the deck
+            player: int of the best responding player
+            best: bool, if False player follows the average strategy instead
+
+        Returns:
+            float: expected utility of player
+        """
+        deals = self.deals(cards)
+        states = []
+        for deal in deals:
+            self.state_json['cards'] = deal
+            states.append(self.state(self.state_json))
+
+        values = self._best_response(states, np.ones(len(states)), player, best)
+        return values.mean()
+
+    def exploitability(self, cards):
+        """Exploitability of the average strategy profile
+
+        Args:
+            cards: array_like of the deck
+
+        Returns:
+            float: NashConv divided by the number of players, the mean gain
+                of a best response over the average strategy
+        """
+        nash_conv = 0
+        for player in range(self.num_players):
+            nash_conv += self.best_response(cards, player) - self.best_response(cards, player, best=False)
+
+        return nash_conv / self.num_players
+
+    def _avg_strategy(self, curr_player, info_set, actions):
+        node = self.node_map.get(curr_player, {}).get(info_set)
+        weights = [node.strategy_sum.get(a, 0) if node is not None else 0 for a in actions]
+        norm_sum = sum(weights)
+        if norm_sum > 0:
+            return [w / norm_sum for w in weights]
+
+        return [1 / len(actions)] * len(actions)
+
+    def _best_response(self, states, reach, player, best):
+        """Helper that returns the utility of player for every deal
+
+        Args:
+            states: list of State, one per deal, all at the same public state
+            reach: array_like of floats of the other players' reach per deal
+            player: int of the best responding player
+            best: bool of whether player best responds
+
+        Returns:
+            array_like: floats of player's utility per deal
+        """
+        first = states[0]
+        if first.is_terminal:
+            return np.array([state.payoff()[player] for state in states])
+
+        curr_player = first.turn
+        actions = sorted(first.valid_actions)
+        info_sets = [state.info_set for state in states]
+        strategies = np.array([self._avg_strategy(curr_player, info_set, actions) for info_set in info_sets])
+
+        child_values = np.zeros((len(states), len(actions)))
+        for i, a in enumerate(actions):
+            children = [state.add(curr_player, a) for state in states]
+            child_reach = reach if curr_player == player else reach * strategies[:, i]
+            child_values[:, i] = self._best_response(children, child_reach, player, best)
+
+        if curr_player != player or not best:
+            return (child_values * strategies).sum(axis=1)
+
+        groups = defaultdict(list)
+        for i, info_set in enumerate(info_sets):
+            groups[info_set].append(i)
+
+        values = np.zeros(len(states))
+        for members in groups.values():
+            action_values = reach[members] @ child_values[members]
+            values[members] = child_values[members, np.argmax(action_values)]
+
+        return values
@@ -0,0 +1,59 @@
+import argparse
+import time
+import numpy as np
+from leduc.game.card import Card
+from leduc.game.hand_eval import tables, evaluate, evaluate_one, holdem_eval
+
+
+def benchmark(hands=1000000, size=7, batch=100000, seed=0):
+    """Measures the throughput of the Hold'em evaluator
+
+    Args:
+        hands: int number of hands scored by the batched evaluator
+        size: int number of cards per hand, 5 to 7
+        batch: int number of hands per call of evaluate
+        seed: int random seed of the hands
+
+    Returns:
+        dict: seconds to build the tables and hands per second of evaluate,
+            evaluate_one and holdem_eval
+    """
+    start = time.perf_counter()
+    tables()
+    build = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    deck = np.arange(8, 60)
+    cards = rng.random((hands, len(deck))).argsort(axis=1)[:, :size] + 8
+
+    start = time.perf_counter()
+    for i in range(0, hands, batch):
+        evaluate(cards[i:i + batch])
+    batched = hands / (time.perf_counter() - start)
+
+    single = cards[:min(hands, 100000)].tolist()
+    start = time.perf_counter()
+    for hand in single:
+        evaluate_one(hand)
+    scalar = len(single) / (time.perf_counter() - start)
+
+    card_hands = [[Card.from_id(card) for card in hand] for hand in single]
+    start = time.perf_counter()
+    for hand in card_hands:
+        holdem_eval(hand[:2], hand[2:])
+    objects = len(card_hands) / (time.perf_counter() - start)
+
+    return {'build_seconds': build, 'evaluate': batched, 'evaluate_one': scalar, 'holdem_eval': objects}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput of the Hold'em hand evaluator")
+    parser.add_argument('-n', '--hands', default=1000000, type=int, help='number of hands to score')
+    parser.add_argument('-k', '--cards', default=7, type=int, help='cards per hand (5 to 7)')
+    parser.add_argument('-b', '--batch', default=100000, type=int, help='hands per batched call')
+    args = parser.parse_args()
+
+    result = benchmark(args.hands, args.cards, args.batch)
+    print("tables built in {:.2f}s".format(result['build_seconds']))
+    for name in ('evaluate', 'evaluate_one', 'holdem_eval'):
+        print("{}: {:,.0f} hands/s".format(name, result[name]))
@@ -0,0 +1,116 @@
+from collections import deque
+
+
+_trees = {}
+
+
+def betting_tree(json):
+    """Gets the betting tree of a game, building it once per configuration
+
+    Args:
+        json: dict of State settings
+
+    Returns:
+        BettingTree: the shared tree of num_players, num_rounds, num_raises,
+            raise_size and actions of json
+    """
+    key = (json['num_players'], json['num_rounds'], json['num_raises'],
+        tuple(json['raise_size']), tuple(sorted(json['actions'])))
+    try:
+        return _trees[key]
+    except KeyError:
+        tree = _trees[key] = BettingTree(json)
+        return tree
+
+
+class BettingTree:
+    """The betting structure of a game, precomputed as tables
+
+    The betting of a hand does not depend on the cards, so every public
+    betting history can be enumerated once. Each node of the tree gets an
+    id and the tables below hold everything State tracks about betting, so
+    a State walks the tree with a dict lookup per action instead of parsing
+    the action and recomputing bets.
+
+    The lists and history strings in the tables are shared by every State
+    at that node and must never be changed in place.
+
+    Attributes:
+        actions: set of str of the actions the tree was built with
+        children: list per node of dict of action -> child node id
+        valid: list per node of frozenset of the valid actions
+        history: list per node of the betting history (list of lists of str)
+        history_str: list per node of str of the history
+        bets: list per node of list of ints of each player's bets
+        players_in: list per node of list of bool of the players still in
+        round: list per node of int of the betting round
+        turn: list per node of int of the player to act
+        raises: list per node of int of raises made this round
+        terminal: list per node of bool of whether the hand is over
+    """
+    def __init__(self, json):
+        """Builds the tree by playing every betting sequence from the root
+
+        Args:
+            json: dict of State settings
+        """
+        from leduc.game.state import State
+
+        self.actions = set(json['actions'])
+        self.children = []
+        self.valid = []
+        self.history = []
+        self.history_str = []
+        self.bets = []
+        self.players_in = []
+        self.round = []
+        self.turn = []
+        self.raises = []
+        self.terminal = []
+
+        root = State(dict(json, cards=None, betting_tree=False))
+        queue = deque([(self._add(root), root)])
+        while queue:
+            node, state = queue.popleft()
+            if self.terminal[node]:
+                continue
+
+            for action in sorted(self.valid[node]):
+                child_state = state.add(state.turn, action)
+                child = self._add(child_state)
+                self.children[node][action] = child
+                # raises are recorded with their size, e.g. 'R' as '2R'
+                self.children[node][child_state.history[state.round][-1]] = child
+                queue.append((child, child_state))
+
+    def __len__(self):
+        return len(self.children)
+
+    def _add(self, state):
+        self.children.append({})
+        self.valid.append(frozenset(state.valid_actions))
+        self.history.append(state.history)
+        self.history_str.append(str(state.history))
+        self.bets.append(state.bets)
+        self.players_in.append(state.players_in)
+        self.round.append(state.round)
+        self.turn.append(state.turn)
+        self.raises.append(state.raises)
+        self.terminal.append(state.is_terminal)
+
+        return len(self.children) - 1
+
+    def move(self, state, node):
+        """Sets the betting of state to the one at node
+
+        Args:
+            state: State to change in place
+            node: int id of the node
+        """
+        state.node = node
+        state._history = self.history[node]
+        state.bets = self.bets[node]
+        state.players_in = self.players_in[node]
+        state.round = self.round[node]
+        state.turn = self.turn[node]
+        state.raises = self.raises[node]
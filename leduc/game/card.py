@@ -24,9 +24,20 @@ class Card:
     def __init__(self, rank, suit):
         self.rank = rank
         self.suit = suit
+        self._repr = '{}{}'.format(self.CARD_STRING[rank], self.SUIT_STRING[suit])
+
+    @classmethod
+    def from_id(cls, card_id):
+        """Builds a card from its integer encoding, see id"""
+        return cls(card_id // 4, card_id % 4 + 1)
+
+    @property
+    def id(self):
+        """int encoding of the card, rank * 4 + suit - 1"""
+        return self.rank * 4 + self.suit - 1
 
     def __repr__(self):
-        return '{}{}'.format(self.CARD_STRING[self.rank], self.SUIT_STRING[self.suit])
+        return self._repr
 
     def __eq__(self, card):
         return card.rank == self.rank
@@ -35,7 +46,5 @@ class Card:
         return self.rank < card.rank
 
     def __hash__(self):
-        return hash(repr(self))
-
-
-
+        # same cards as hashing repr, without formatting a string
+        return hash((self.rank, self.suit))
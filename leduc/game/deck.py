@@ -0,0 +1,93 @@
+import numpy as np
+from leduc.game.card import Card
+
+
+def ranks(card_ids):
+    """Ranks of integer encoded cards (see Card.id)
+
+    Args:
+        card_ids: array_like of ints of cards
+
+    Returns:
+        array_like: ints of the ranks
+    """
+    return np.asarray(card_ids) // 4
+
+
+def suits(card_ids):
+    """Suits of integer encoded cards (see Card.id)
+
+    Args:
+        card_ids: array_like of ints of cards
+
+    Returns:
+        array_like: ints of the suits, 1 to 4 as in Card
+    """
+    return np.asarray(card_ids) % 4 + 1
+
+
+class Deck:
+    """A deck of integer encoded cards that deals in bulk
+
+    Shuffling a list of Card every iteration was one of the costs of the
+    training loop. The deck draws many permutations at once with numpy and
+    hands out deals as lists of the deck's own Card objects, so no card is
+    created or formatted while dealing.
+
+    Attributes:
+        cards: list of Card of the deck
+        ids: array_like of ints of the encoded cards
+    """
+    def __init__(self, cards):
+        self.cards = list(cards)
+        self.ids = np.array([card.id for card in self.cards])
+
+    @classmethod
+    def from_ids(cls, card_ids):
+        return cls([Card.from_id(int(card_id)) for card_id in card_ids])
+
+    def __len__(self):
+        return len(self.cards)
+
+    def permutations(self, n, size=None):
+        """Draws n random deals at once
+
+        Args:
+            n: int number of deals
+            size: int number of cards of each deal, the whole deck if None
+
+        Returns:
+            array_like: (n, size) ints of positions in the deck
+        """
+        size = len(self.cards) if size is None else size
+        return np.random.random((n, len(self.cards))).argsort(axis=1)[:, :size]
+
+    def deal_ids(self, n, size=None):
+        """Draws n random deals of encoded cards
+
+        Returns:
+            array_like: (n, size) ints of encoded cards
+        """
+        return self.ids[self.permutations(n, size)]
+
+    def to_cards(self, positions):
+        """Converts positions in the deck to its Card objects"""
+        cards = self.cards
+        return [cards[i] for i in positions]
+
+    def deals(self, n, size=None, chunk=4096):
+        """Yields n random deals, drawn chunk at a time
+
+        Args:
+            n: int number of deals
+            size: int number of cards of each deal, the whole deck if None
+            chunk: int number of deals drawn per numpy call
+
+        Yields:
+            list: Card of each deal
+        """
+        cards = self.cards
+        while n > 0:
+            for positions in self.permutations(min(chunk, n), size).tolist():
+                yield [cards[i] for i in positions]
+            n -= chunk
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def kuhn_eval(card, public):
     return card.rank
 
@@ -7,4 +10,232 @@ def leduc_eval(hole_card, board):
     if cards.count(hole_card) > 1:
         return 15*14 + hole_card.rank
 
-    return 14 * max(cards).rank + min(cards).rank
\ No newline at end of file
+    return 14 * max(cards).rank + min(cards).rank
+
+
+def leduc_evaluate(cards):
+    """Scores many Leduc hands at once, with the values of leduc_eval
+
+    Args:
+        cards: array_like (n, 2) of ints of the hole card and the board
+            card encoded as in Card.id
+
+    Returns:
+        array_like: (n,) ints of hand values, higher is better
+    """
+    ranks = np.asarray(cards) // 4
+    hole = ranks[:, 0]
+    board = ranks[:, 1]
+    return np.where(hole == board, 15 * 14 + hole,
+        14 * np.maximum(hole, board) + np.minimum(hole, board))
+
+
+# Hand values are category * 13**5 + the five deciding ranks in base 13,
+# with ranks 0 (deuce) to 12 (ace)
+HIGH_CARD, PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = range(9)
+CATEGORIES = ('high card', 'pair', 'two pair', 'trips', 'straight', 'flush',
+    'full house', 'quads', 'straight flush')
+NUM_RANKS = 13
+MAX_COUNT = 4
+MAX_CARDS = 7
+
+_tables = {}
+
+
+def _value(category, ranks):
+    value = category
+    for i in range(5):
+        value = value * NUM_RANKS + (ranks[i] if i < len(ranks) else 0)
+    return value
+
+
+def _straight(mask):
+    """Highest rank of a straight in a 13 bit rank mask, -1 if none"""
+    for high in range(12, 3, -1):
+        if (mask >> (high - 4)) & 0b11111 == 0b11111:
+            return high
+    # the wheel, ace to five
+    if mask & 0b1000000001111 == 0b1000000001111:
+        return 3
+    return -1
+
+
+def _rank_value(counts):
+    """Best non flush hand of a multiset of ranks, given as counts per rank"""
+    ranks = [r for r in range(12, -1, -1) for _ in range(counts[r])]
+    by_count = sorted(((counts[r], r) for r in range(13) if counts[r]), reverse=True)
+    mask = sum(1 << r for r in range(13) if counts[r])
+    top_count, top = by_count[0]
+
+    if top_count == 4:
+        return _value(QUADS, [top, max(r for r in ranks if r != top)])
+    trips = [r for c, r in by_count if c >= 3]
+    pairs = [r for c, r in by_count if c >= 2]
+    if trips and len(pairs) >= 2:
+        pair = max(r for r in pairs if r != trips[0])
+        return _value(FULL_HOUSE, [trips[0], pair])
+    high = _straight(mask)
+    if high >= 0:
+        return _value(STRAIGHT, [high])
+    if trips:
+        return _value(TRIPS, [trips[0]] + [r for r in ranks if r != trips[0]][:2])
+    if len(pairs) >= 2:
+        first, second = sorted(pairs, reverse=True)[:2]
+        return _value(TWO_PAIR, [first, second] + [r for r in ranks if r not in (first, second)][:1])
+    if pairs:
+        return _value(PAIR, [pairs[0]] + [r for r in ranks if r != pairs[0]][:3])
+    return _value(HIGH_CARD, ranks[:5])
+
+
+def _flush_value(mask):
+    """Best straight flush or flush of a 13 bit rank mask of one suit"""
+    high = _straight(mask)
+    if high >= 0:
+        return _value(STRAIGHT_FLUSH, [high])
+    return _value(FLUSH, [r for r in range(12, -1, -1) if mask >> r & 1][:5])
+
+
+def _multisets(rank, size, counts):
+    if rank == NUM_RANKS:
+        if size == 0:
+            yield counts
+        return
+    for count in range(min(MAX_COUNT, size) + 1):
+        counts[rank] = count
+        yield from _multisets(rank + 1, size - count, counts)
+    counts[rank] = 0
+
+
+def tables():
+    """Builds the evaluator's lookup tables once per process
+
+    Non flush hands only depend on the multiset of their ranks, which is
+    perfect hashed into a dense index: multisets of a given size are
+    ordered by the count of each rank in turn and offsets[r, k, c] counts
+    the multisets of k cards over ranks r.. that have fewer than c cards of
+    rank r. Flushes and straight flushes are looked up by the 13 bit rank
+    mask of the flush suit.
+
+    Returns:
+        dict: 'offsets' (13, 8, 5) ints, 'ranks' (8, n) ints of hand value
+            per card count and multiset index, 'flush' (8192,) ints of
+            hand value per rank mask, 0 under 5 cards
+    """
+    if _tables:
+        return _tables
+
+    # ways[r][k]: multisets of k cards over ranks r..12
+    ways = [[0] * (MAX_CARDS + 1) for _ in range(NUM_RANKS + 1)]
+    ways[NUM_RANKS][0] = 1
+    for r in range(NUM_RANKS - 1, -1, -1):
+        for k in range(MAX_CARDS + 1):
+            ways[r][k] = sum(ways[r + 1][k - c] for c in range(min(MAX_COUNT, k) + 1))
+
+    offsets = np.zeros((NUM_RANKS, MAX_CARDS + 1, MAX_COUNT + 1), dtype=np.int64)
+    for r in range(NUM_RANKS):
+        for k in range(MAX_CARDS + 1):
+            for c in range(1, MAX_COUNT + 1):
+                previous = ways[r + 1][k - c + 1] if k - c + 1 >= 0 else 0
+                offsets[r, k, c] = offsets[r, k, c - 1] + previous
+
+    rank_values = np.zeros((MAX_CARDS + 1, ways[0][MAX_CARDS]), dtype=np.int64)
+    for size in range(5, MAX_CARDS + 1):
+        # _multisets yields in index order
+        for index, counts in enumerate(_multisets(0, size, [0] * NUM_RANKS)):
+            rank_values[size, index] = _rank_value(counts)
+
+    flush = np.zeros(1 << NUM_RANKS, dtype=np.int64)
+    for mask in range(1 << NUM_RANKS):
+        if bin(mask).count('1') >= 5:
+            flush[mask] = _flush_value(mask)
+
+    _tables.update(offsets=offsets, ranks=rank_values, flush=flush,
+        offsets_list=offsets.tolist(), ranks_list=rank_values.tolist(), flush_list=flush.tolist())
+    return _tables
+
+
+def evaluate(cards):
+    """Scores many 5 to 7 card hands at once
+
+    Args:
+        cards: array_like (n, k) of ints of cards encoded as in Card.id,
+            5 <= k <= 7
+
+    Returns:
+        array_like: (n,) ints of hand values, higher is better
+    """
+    t = tables()
+    cards = np.asarray(cards)
+    n, size = cards.shape
+    ranks = cards // 4 - 2
+    suits = cards % 4
+
+    rows = np.repeat(np.arange(n) * NUM_RANKS, size)
+    counts = np.bincount(rows + ranks.ravel(), minlength=n * NUM_RANKS).reshape(n, NUM_RANKS)
+
+    remaining = size - np.cumsum(counts, axis=1) + counts
+    index = t['offsets'][np.arange(NUM_RANKS), remaining, counts].sum(axis=1)
+    values = t['ranks'][size, index]
+
+    bits = np.left_shift(1, ranks)
+    for suit in range(4):
+        in_suit = suits == suit
+        mask = np.where(in_suit, bits, 0).sum(axis=1)
+        flush = np.where(in_suit.sum(axis=1) >= 5, t['flush'][mask], 0)
+        values = np.maximum(values, flush)
+
+    return values
+
+
+def evaluate_one(card_ids):
+    """Scores one 5 to 7 card hand, see evaluate
+
+    Args:
+        card_ids: list of ints of cards encoded as in Card.id
+
+    Returns:
+        int: hand value, higher is better
+    """
+    t = tables()
+    counts = [0] * NUM_RANKS
+    masks = [0, 0, 0, 0]
+    suit_counts = [0, 0, 0, 0]
+    for card in card_ids:
+        rank = card // 4 - 2
+        suit = card % 4
+        counts[rank] += 1
+        masks[suit] |= 1 << rank
+        suit_counts[suit] += 1
+
+    offsets = t['offsets_list']
+    remaining = len(card_ids)
+    index = 0
+    for r, count in enumerate(counts):
+        if count:
+            index += offsets[r][remaining][count]
+            remaining -= count
+    value = t['ranks_list'][len(card_ids)][index]
+
+    for suit in range(4):
+        if suit_counts[suit] >= 5:
+            value = max(value, t['flush_list'][masks[suit]])
+
+    return value
+
+
+def category(value):
+    """Name of the category of a hand value, e.g. 'two pair'"""
+    return CATEGORIES[value // NUM_RANKS ** 5]
+
+
+def holdem_eval(hole_cards, board):
+    """Scores hole cards and a board of Card, for HoldemState's hand_eval
+
+    Args:
+        hole_cards: list of Card of the player
+        board: list of Card of the board, 5 to 7 cards with the hole cards
+
+    Returns:
+        int: hand value, higher is better
+    """
+    return evaluate_one([card.id for card in hole_cards] + [card.id for card in board])
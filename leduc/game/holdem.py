@@ -0,0 +1,338 @@
+_configs = {}
+
+
+def raise_action(fraction):
+    """Name of the raise of a pot fraction, e.g. 0.5 -> 'R50'"""
+    return 'R%d' % round(fraction * 100)
+
+
+def holdem_actions(raise_size):
+    """Every action of a bet abstraction
+
+    Args:
+        raise_size: list per round of lists of pot fractions
+
+    Returns:
+        list: str of fold, check/call, each raise and all in
+    """
+    fractions = sorted(set(fraction for sizes in raise_size for fraction in sizes))
+    return ['F', 'C'] + [raise_action(fraction) for fraction in fractions] + ['A']
+
+
+class HoldemConfig:
+    """The rules of a Hold'em game, shared by every state of it
+
+    Attributes:
+        num_players: int number of players
+        num_rounds: int number of betting rounds
+        num_raises: int max number of raises per round
+        blinds: list of ints posted by the first players
+        stacks: list of ints of each player's starting stack
+        board_cards: list per round of int of board cards dealt by then
+        raise_size: list per round of list of (action, pot fraction)
+        hand_eval: function of (hole cards, board) -> comparable score
+        actions: list of str of every action
+        buckets: Buckets card abstraction, None to keep the cards in the
+            info set
+    """
+    def __init__(self, json):
+        self.num_players = json['num_players']
+        self.num_rounds = json['num_rounds']
+        self.num_raises = json['num_raises']
+        self.blinds = list(json.get('blinds', [1, 2]))
+        stack = json.get('stack', 200)
+        self.stacks = list(stack) if isinstance(stack, (list, tuple)) else [stack] * self.num_players
+        self.board_cards = list(json.get('board_cards', [0, 3, 4, 5]))
+        self.raise_size = [[(raise_action(fraction), fraction) for fraction in sizes]
+            for sizes in json['raise_size']]
+        self.hand_eval = json['hand_eval']
+        self.raise_fraction = [dict(sizes) for sizes in self.raise_size]
+        self.actions = holdem_actions(json['raise_size'])
+        self.buckets = json.get('buckets')
+        self.big_blind = max(self.blinds)
+        # the button acts last after the flop, in heads up it is the small blind
+        self.button = self.num_players - 1 if self.num_players > 2 else 0
+        self.first_to_act = len(self.blinds) % self.num_players
+
+    @classmethod
+    def from_settings(cls, json):
+        key = (json['num_players'], json['num_rounds'], json['num_raises'], tuple(json.get('blinds', [1, 2])),
+            str(json.get('stack', 200)), tuple(tuple(sizes) for sizes in json['raise_size']),
+            tuple(json.get('board_cards', [0, 3, 4, 5])), json['hand_eval'], id(json.get('buckets')))
+        try:
+            return _configs[key]
+        except KeyError:
+            config = _configs[key] = cls(json)
+            return config
+
+
+class HoldemState:
+    """A hand of no limit Hold'em for any number of players
+
+    It has the interface the trainers use on State (turn, info_set,
+    valid_actions, add, is_terminal and payoff), with blinds, stacks, side
+    pots and several board cards. Bets are abstracted to fractions of the
+    pot after calling ('R50' raises half the pot) and all in ('A').
+
+    The rules live in a shared HoldemConfig and a state only holds the
+    per hand lists, so copying a state copies a few short lists.
+
+    Cards are dealt as a flat list: player i holds cards[2i:2i+2] and the
+    board is cards[2 * num_players:].
+
+    Attributes:
+        config: HoldemConfig of the game
+        cards: list of Card of the deal
+        round: int of the betting round, num_rounds once the hand is over
+        turn: int of the player to act
+        bets: list of ints of each player's chips in the pot
+        stacks: list of ints of each player's chips behind
+        players_in: list of bool of the players that have not folded
+        raises: int number of raises this round
+        last_raise: int size of the last raise, the minimum raise
+        to_act: int number of players still to act this round
+    """
+    __slots__ = ('config', 'cards', 'round', 'turn', 'bets', 'stacks', 'players_in',
+        'raises', 'last_raise', 'to_act', '_history', 'winners')
+
+    def __init__(self, json):
+        config = self.config = HoldemConfig.from_settings(json)
+        num_players = config.num_players
+        self.cards = json['cards']
+        self.round = 0
+        self.raises = 0
+        self.last_raise = config.big_blind
+        self._history = [[] for _ in range(config.num_rounds)]
+        self.players_in = [True] * num_players
+        self.stacks = list(config.stacks)
+        self.bets = [0] * num_players
+        for player, blind in enumerate(config.blinds):
+            amount = min(blind, self.stacks[player])
+            self.bets[player] += amount
+            self.stacks[player] -= amount
+
+        self.to_act = sum(1 for stack in self.stacks if stack > 0)
+        self.turn = self._next_player(config.first_to_act - 1)
+
+    def __repr__(self):
+        return str(self._history)
+
+    def __copy__(self):
+        new_state = HoldemState.__new__(HoldemState)
+        new_state.config = self.config
+        new_state.cards = self.cards
+        new_state.round = self.round
+        new_state.turn = self.turn
+        new_state.bets = self.bets[:]
+        new_state.stacks = self.stacks[:]
+        new_state.players_in = self.players_in[:]
+        new_state.raises = self.raises
+        new_state.last_raise = self.last_raise
+        new_state.to_act = self.to_act
+        new_state._history = [actions[:] for actions in self._history]
+
+        return new_state
+
+    @property
+    def num_players(self):
+        return self.config.num_players
+
+    @property
+    def num_rounds(self):
+        return self.config.num_rounds
+
+    @property
+    def actions(self):
+        return self.config.actions
+
+    @property
+    def history(self):
+        return self._history
+
+    @property
+    def board(self):
+        """list of Card of the board dealt so far"""
+        start = 2 * self.config.num_players
+        dealt = self.config.board_cards[min(self.round, self.config.num_rounds - 1)]
+        return self.cards[start:start + dealt]
+
+    def hole_cards(self, player):
+        return self.cards[2 * player:2 * player + 2]
+
+    @property
+    def history_str(self):
+        return '/'.join(' '.join(actions) for actions in self._history[:self.round + 1])
+
+    @property
+    def public_state(self):
+        if self.round > 0:
+            return "%s || %s" % (''.join(map(repr, self.board)), self.history_str)
+
+        return self.history_str
+
+    @property
+    def info_set(self):
+        """Gets the info set of the player to act
+
+        Formatted like State.info_set: the hole cards, the board after the
+        first round, then the betting history. With a card abstraction the
+        bucket of the hole cards and the board replaces both.
+        """
+        buckets = self.config.buckets
+        if buckets is not None:
+            bucket = buckets.label(self.hole_cards(self.turn), self.board, self.round)
+            if bucket is not None:
+                return "%s || %s" % (bucket, self.history_str)
+
+        hole = ''.join(map(repr, self.hole_cards(self.turn)))
+        return "%s || %s" % (hole, self.public_state)
+
+    @property
+    def is_terminal(self):
+        return self.round >= self.config.num_rounds or self.players_in.count(True) == 1
+
+    @property
+    def valid_actions(self):
+        player = self.turn
+        bets = self.bets
+        to_call = max(bets) - bets[player]
+        stack = self.stacks[player]
+
+        valid = {'C'}
+        if to_call > 0:
+            valid.add('F')
+
+        if stack > to_call and self.raises < self.config.num_raises:
+            pot = sum(bets) + to_call
+            for action, fraction in self.config.raise_size[self.round]:
+                raise_by = round(fraction * pot)
+                if raise_by >= self.last_raise and to_call + raise_by < stack:
+                    valid.add(action)
+            valid.add('A')
+
+        return valid
+
+    def _next_player(self, player):
+        """First player after player that has not folded and is not all in"""
+        num_players = self.config.num_players
+        for i in range(1, num_players + 1):
+            nxt = (player + i) % num_players
+            if self.players_in[nxt] and self.stacks[nxt] > 0:
+                return nxt
+
+        return player
+
+    def add(self, player, action, deep=True):
+        """Plays an action and returns the new state
+
+        Args:
+            player: int of the player acting
+            action: str of the action
+            deep: bool of whether to copy the state or change it in place
+
+        Returns:
+            HoldemState: the state after the action
+        """
+        new_state = self.__copy__() if deep else self
+        bets = new_state.bets
+        stacks = new_state.stacks
+        to_call = max(bets) - bets[player]
+
+        new_state._history[new_state.round].append(action)
+        if action == 'F':
+            new_state.players_in[player] = False
+            new_state.to_act -= 1
+        elif action == 'C':
+            amount = min(to_call, stacks[player])
+            bets[player] += amount
+            stacks[player] -= amount
+            new_state.to_act -= 1
+        else:
+            if action == 'A':
+                amount = stacks[player]
+            else:
+                fraction = self.config.raise_fraction[new_state.round][action]
+                amount = min(to_call + round(fraction * (sum(bets) + to_call)), stacks[player])
+
+            bets[player] += amount
+            stacks[player] -= amount
+            raise_by = amount - to_call
+            if raise_by > 0:
+                new_state.raises += 1
+                new_state.last_raise = max(new_state.last_raise, raise_by)
+                # everyone else still able to bet has to act again
+                new_state.to_act = sum(1 for i, stack in enumerate(stacks)
+                    if i != player and stack > 0 and new_state.players_in[i])
+            else:
+                new_state.to_act -= 1
+
+        if new_state.players_in.count(True) == 1:
+            return new_state
+
+        if new_state.to_act <= 0:
+            new_state._next_round()
+        else:
+            new_state.turn = new_state._next_player(player)
+
+        return new_state
+
+    def _next_round(self):
+        config = self.config
+        self.round += 1
+        self.raises = 0
+        self.last_raise = config.big_blind
+        if self.round >= config.num_rounds:
+            return
+
+        able = sum(1 for i, stack in enumerate(self.stacks) if stack > 0 and self.players_in[i])
+        if able <= 1:
+            # nobody is left to bet against, deal the rest of the board
+            self.round = config.num_rounds
+            return
+
+        self.to_act = able
+        self.turn = self._next_player(config.button)
+
+    def payoff(self):
+        """Calculates the payoff of a terminal state, splitting side pots
+
+        Returns:
+            list: floats of each player's winnings minus their bets
+        """
+        bets = self.bets
+        num_players = self.config.num_players
+        payoffs = [-bet for bet in bets]
+
+        if self.players_in.count(True) == 1:
+            winner = self.players_in.index(True)
+            payoffs[winner] += sum(bets)
+            self.winners = [winner]
+            return payoffs
+
+        start = 2 * num_players
+        board = self.cards[start:start + self.config.board_cards[-1]]
+        hand_eval = self.config.hand_eval
+        scores = {i: hand_eval(self.hole_cards(i), board) for i in range(num_players) if self.players_in[i]}
+
+        previous = 0
+        self.winners = None
+        for level in sorted(set(bets)):
+            if level <= 0:
+                continue
+            pot = sum(min(bet, level) - min(bet, previous) for bet in bets)
+            eligible = [i for i in scores if bets[i] >= level]
+            if not eligible:
+                # only folded players put chips in this layer, hand them back
+                eligible = [i for i in range(num_players) if bets[i] >= level]
+                winners = eligible
+            else:
+                best = max(scores[i] for i in eligible)
+                winners = [i for i in eligible if scores[i] == best]
+
+            if self.winners is None:
+                self.winners = winners
+            for w in winners:
+                payoffs[w] += pot / len(winners)
+            previous = level
+
+        return payoffs
@@ -1,5 +1,6 @@
 import numpy as np
-from copy import deepcopy, copy
+from copy import copy
+from leduc.game.betting import betting_tree
 
 class State:
     """Game/hand rules class inspired from https://github.com/tansey/pycfr
@@ -15,6 +16,10 @@ class State:
         bets: list of ints for how much each player has bet
         _history: 2d array/list of str for public betting history
         round: int for which round it is
+        tree: BettingTree of the game, None if json['betting_tree'] is False
+        node: int id of the state in tree, None once off the tree
+        buckets: Buckets card abstraction of json['buckets'], None to
+            keep the cards in the info set
     """
     def __init__(self, json):
         """Initializes the class
@@ -39,20 +44,36 @@ class State:
         self.raise_size = json['raise_size']
         self.actions = set(json['actions'])
         self.json = json
+        self.buckets = json.get('buckets')
+        if json.get('betting_tree', True):
+            self.tree = betting_tree(json)
+            self.node = 0
+        else:
+            self.tree = None
+            self.node = None
 
     def __repr__(self):
         return str(self.history)
 
     def __copy__(self):
-        new_instance = State(self.json)
+        # the betting lists are never changed in place (see add), so they
+        # can be shared with the copy
+        new_instance = self.__class__.__new__(self.__class__)
         new_instance.__dict__.update(self.__dict__)
-        new_instance._history = deepcopy(self._history)
-        new_instance.raises = deepcopy(self.raises)
-        new_instance.bets = deepcopy(self.bets)
-        new_instance.players_in = deepcopy(self.players_in)
 
         return new_instance
 
+    def __getstate__(self):
+        # the tree is shared per process, rebuild it instead of pickling it
+        state = self.__dict__.copy()
+        state['tree'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.node is not None:
+            self.tree = betting_tree(self.json)
+
     def bet(self, player, amount):
         """Increment the amount a player has bet by 'amount'"
 
@@ -66,14 +87,21 @@ class State:
     def history(self):
         return self._history
      
+    @property
+    def history_str(self):
+        """str of the betting history, precomputed on the betting tree"""
+        if self.node is not None:
+            return self.tree.history_str[self.node]
+        return str(self._history)
+
     @property
     def public_state(self):
         if self.round > 0:
             board_cards = self.cards[self.num_players]
-            public = "%s || %s" % (board_cards, self.history)
+            public = "%s || %s" % (board_cards, self.history_str)
 
         else:
-            public = "%s" % self.history
+            public = self.history_str
 
         return public
 
@@ -84,6 +112,9 @@ class State:
         Returns:
             bool: if the hand is in a terminal state
         """
+        if self.node is not None:
+            return self.tree.terminal[self.node]
+
         if self.players_in.count(True) == 1:
             return True
         
@@ -110,18 +141,29 @@ class State:
         """
         player = self.turn
         card = self.cards[player]
+        if self.buckets is not None:
+            board = [self.cards[self.num_players]] if self.round > 0 else []
+            bucket = self.buckets.label([card], board, self.round)
+            if bucket is not None:
+                return "%s || %s" % (bucket, self.history_str)
+
         if self.round > 0:
             # this will be a problem later on when there are more than one board cards
             board_cards = self.cards[self.num_players]
-            info_set = "%s || %s || %s" %(card, board_cards, self.history)
+            info_set = "%s || %s || %s" %(card, board_cards, self.history_str)
 
         else:
-            info_set = "%s || %s" %(card, self.history)
+            info_set = "%s || %s" %(card, self.history_str)
 
         return info_set
 
     @property
     def valid_actions(self): 
+        # off-tree actions added to self.actions (see NestedSearch) are
+        # not in the tree's tables
+        if self.node is not None and len(self.actions) == len(self.tree.actions):
+            return self.tree.valid[self.node]
+
         num_raised = self.raises
         if num_raised < self.num_raises:
             valid = self.actions
@@ -137,14 +179,30 @@ class State:
             player: int which player is making that action
             action: str of which action they are taking
 
+        Actions on the betting tree are a table lookup. Off-tree actions
+        (e.g. raise sizes outside the abstraction) are played out by the
+        rules below and leave the state off the tree.
+
         Returns:
             new_hand: a modified Hand object
         """
+        if self.node is not None:
+            child = self.tree.children[self.node].get(action)
+            if child is not None:
+                new_hand = copy(self) if deep else self
+                self.tree.move(new_hand, child)
+                return new_hand
+
         if deep:
             new_hand = copy(self)
         else: 
             new_hand = self
 
+        new_hand.node = None
+        new_hand._history = [list(actions) for actions in self._history]
+        new_hand.bets = list(self.bets)
+        new_hand.players_in = list(self.players_in)
+
         if 'R' in action:
             if len(action) <= 1:
                 action = str(self.raise_size[self.round]) + action
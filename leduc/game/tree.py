@@ -46,10 +46,8 @@ class Node:
             while not state.is_terminal:
                 curr_player = state.turn
                 info_set = state.info_set
-                node = self.node_map[curr_player][info_set]
-
                 valid_actions = state.valid_actions
-                strategy = node.strategy(valid_actions)
+                strategy = self.node_map[curr_player].strategy(info_set, valid_actions)
                 if curr_player == player:
                     if action in self.renorm_mapping.keys():
                         strategy = self.bias_strategy(strategy, action, valid_actions)
@@ -76,23 +74,60 @@ class Node:
         return strategy
 
 class Nature:
-    def __init__(self, state):
+    """The chance node at the root of a subgame
+
+    Without ranges every deal is equally likely. With ranges, each deal is
+    weighted by the reach probability of every player's card, and deals
+    that contradict the board already dealt are dropped. If the ranges
+    leave no weight on any deal (their mass only sits on cards that
+    conflict), the deals fall back to equal weights.
+
+    Attributes:
+        children: list of Node for each possible deal
+        weights: list of floats of the probability of each deal
+        round: int of the round the subgame starts in
+    """
+    def __init__(self, state, ranges=None):
         self.children = []
+        self.weights = []
         self.round = state.round
         cards = state.cards
+        num_players = state.num_players
+        board = str(cards[num_players]) if state.round > 0 else None
         all_combos = [list(t) for t in permutations(cards, 3)]
         for combo in all_combos:
+            weight = 1
+            if ranges is not None:
+                if board is not None and str(combo[num_players]) != board:
+                    continue
+                for player in range(num_players):
+                    weight *= ranges[player].get(str(combo[player]), 0)
+
             copy_state = copy(state)
             copy_state.cards = combo
             self.children.append(Node(copy_state, copy_state.round))
+            self.weights.append(weight)
+
+        if not self.children:
+            raise ValueError('No deal matches the board {}'.format(board))
+
+        if sum(self.weights) > 0:
+            live = [i for i, weight in enumerate(self.weights) if weight > 0]
+            self.children = [self.children[i] for i in live]
+            self.weights = [self.weights[i] for i in live]
+        else:
+            self.weights = [1] * len(self.children)
+
+    def sample(self):
+        return random.choices(self.children, weights=self.weights)[0]
 
     def __repr__(self):
         return str(self.children)
 
 
 class Subgame:
-    def __init__(self, state):
-        self.root = Nature(state)
+    def __init__(self, state, ranges=None):
+        self.root = Nature(state, ranges)
         
     def build_tree(self, strategy):
         node = self.root
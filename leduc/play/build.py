@@ -0,0 +1,56 @@
+import argparse
+import os
+import pickle
+import random
+import time
+import numpy as np
+from leduc.cfr.mccfr import MonteCarloCFR
+from leduc.play.play import SETTINGS, BLUEPRINT_PATH, leduc_cards, validate_blueprint
+
+
+def build_blueprint(iterations=20000, path=BLUEPRINT_PATH, settings=SETTINGS, seed=None):
+    """Trains a blueprint with MCCFR and writes it where servers load it
+
+    The blueprint is validated before it replaces the file at path, and is
+    written to a temporary file first so a running server never reads a
+    half written one.
+
+    Args:
+        iterations: int number of MCCFR iterations
+        path: str of the blueprint pickle
+        settings: dict of game settings
+        seed: int random seed, None to leave the generators as they are
+
+    Returns:
+        dict: player -> dict of info set -> InfoSet of the blueprint
+    """
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    trainer = MonteCarloCFR(settings)
+    trainer.train(leduc_cards(), iterations)
+    blueprint = trainer.node_map
+    validate_blueprint(blueprint, settings)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(blueprint, f)
+    os.replace(path + '.tmp', path)
+
+    return blueprint
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Trains the blueprint the server plays offline')
+    parser.add_argument('-i', '--iterations', default=20000, type=int, help='number of MCCFR iterations')
+    parser.add_argument('-o', '--output', default=BLUEPRINT_PATH, help='path of the blueprint pickle')
+    parser.add_argument('-s', '--seed', default=None, type=int, help='random seed')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    blueprint = build_blueprint(args.iterations, args.output, seed=args.seed)
+    print("{} info sets trained in {:.1f}s, written to {}".format(
+        sum(len(nodes) for nodes in blueprint.values()), time.perf_counter() - start, args.output))
@@ -0,0 +1,212 @@
+import argparse
+import pickle
+import random
+import multiprocessing as mp
+import numpy as np
+from copy import copy
+from leduc.cfr.mccfr import MonteCarloCFR
+from leduc.search.search import NestedSearch
+from leduc.play.play import SETTINGS, BLUEPRINT_PATH, leduc_cards
+
+
+class BlueprintAgent:
+    """Plays the average strategy of a blueprint
+
+    The average strategy of each info set is normalized once and cached,
+    so every later visit is a dict lookup and a weighted draw.
+
+    Attributes:
+        node_map: dict of player -> dict of info set -> InfoSet
+    """
+    def __init__(self, node_map):
+        self.node_map = node_map
+        self._strategies = {}
+
+    def start(self, state, seat):
+        pass
+
+    def observe(self, player, action):
+        pass
+
+    def act(self, state):
+        player = state.turn
+        info_set = state.info_set
+        try:
+            actions, weights = self._strategies[player, info_set]
+        except KeyError:
+            actions = sorted(state.valid_actions)
+            node = self.node_map.get(player, {}).get(info_set)
+            weights = [node.strategy_sum.get(a, 0) for a in actions] if node is not None else []
+            if sum(weights) <= 0:
+                weights = [1] * len(actions)
+            self._strategies[player, info_set] = actions, weights
+
+        return random.choices(actions, weights=weights)[0]
+
+
+class SearchAgent:
+    """Plays a blueprint refined by NestedSearch at every betting round
+
+    Attributes:
+        mccfr: MonteCarloCFR holding the blueprint
+        iterations: int number of iterations of each subgame search
+    """
+    def __init__(self, settings, node_map, iterations=100):
+        self.mccfr = MonteCarloCFR(settings)
+        self.mccfr.node_map = node_map
+        self.iterations = iterations
+
+    def start(self, state, seat):
+        self.seat = seat
+        self.search = NestedSearch(self.mccfr, copy(state), seat, verbose=0)
+        self.search.iterations = self.iterations
+
+    def observe(self, player, action):
+        if player != self.seat:
+            self.search.opponent_turn(action)
+        self.search.check_new_round()
+
+    def act(self, state):
+        return self.search.traverser_turn()
+
+
+def play_hand(agents, state):
+    """Plays one hand headless
+
+    Args:
+        agents: list of agents, one per seat
+        state: State at the start of the hand
+
+    Returns:
+        list: floats of the payoff of each seat
+    """
+    for seat, agent in enumerate(agents):
+        agent.start(state, seat)
+
+    while not state.is_terminal:
+        player = state.turn
+        action = agents[player].act(state)
+        state = state.add(player, action)
+        for agent in agents:
+            agent.observe(player, action)
+
+    return state.payoff()
+
+
+_blueprints = {}
+_worker = {}
+
+
+def make_agent(spec, settings):
+    """Builds an agent from a picklable spec
+
+    Args:
+        spec: dict with the blueprint 'path' and optionally the number of
+            'search' iterations (0 plays the blueprint alone)
+        settings: dict of game settings
+
+    Returns:
+        BlueprintAgent or SearchAgent
+    """
+    path = spec['path']
+    if path not in _blueprints:
+        with open(path, 'rb') as f:
+            _blueprints[path] = pickle.load(f)
+
+    if spec.get('search'):
+        return SearchAgent(settings, _blueprints[path], spec['search'])
+
+    return BlueprintAgent(_blueprints[path])
+
+
+def _init_worker(hero, field, settings, cards):
+    num_players = settings['num_players']
+    _worker['hero'] = make_agent(hero, settings)
+    _worker['field'] = [make_agent(field, settings) for _ in range(num_players - 1)]
+    _worker['settings'] = settings
+    _worker['cards'] = cards
+
+
+def _play_deals(seed, deals):
+    """Plays duplicate deals, rotating the hero through every seat
+
+    Returns:
+        array_like: float of the hero's mean payoff over the rotations of each deal
+    """
+    random.seed(seed)
+    settings = _worker['settings']
+    num_players = settings['num_players']
+    state_json = copy(MonteCarloCFR(settings).state_json)
+    hero = _worker['hero']
+    field = _worker['field']
+
+    values = np.zeros(deals)
+    for deal in range(deals):
+        cards = random.sample(_worker['cards'], len(_worker['cards']))
+        state_json['cards'] = cards
+        for seat in range(num_players):
+            agents = field[:seat] + [hero] + field[seat:]
+            payoffs = play_hand(agents, settings['state'](state_json))
+            values[deal] += payoffs[seat] / num_players
+
+    return values
+
+
+def evaluate(hero, field, hands, settings=SETTINGS, cards=None, processes=None,
+        seed=0, chunk=500, big_blind=1):
+    """Evaluates the hero against a field of copies of another agent
+
+    Every deal is played once with the hero in each seat (duplicate
+    poker), which cancels most of the luck of the cards. Deals are spread
+    over a pool of processes.
+
+    Args:
+        hero: dict agent spec (see make_agent) of the agent evaluated
+        field: dict agent spec of the opponents
+        hands: int number of hands to play
+        settings: dict of game settings
+        cards: list of Card of the deck, Leduc if None
+        processes: int number of processes, defaults to the cpu count
+        seed: int base random seed
+        chunk: int number of deals played per task
+        big_blind: float size of the big blind (the ante in Leduc)
+
+    Returns:
+        dict: hands played, hero's mbb/hand and its 95% confidence half-width
+    """
+    cards = leduc_cards() if cards is None else cards
+    num_players = settings['num_players']
+    deals = max(2, hands // num_players)
+    tasks = [(seed + i, min(chunk, deals - start)) for i, start in enumerate(range(0, deals, chunk))]
+
+    if 'fork' in mp.get_all_start_methods():
+        context = mp.get_context('fork')
+    else:
+        context = mp.get_context()
+
+    with context.Pool(processes, initializer=_init_worker,
+            initargs=(hero, field, settings, cards)) as pool:
+        values = np.concatenate(pool.starmap(_play_deals, tasks))
+
+    scale = 1000 / big_blind
+    std_error = values.std(ddof=1) / np.sqrt(len(values))
+
+    return {'hands': len(values) * num_players, 'mbb_per_hand': values.mean() * scale,
+        'ci95': 1.96 * std_error * scale}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Head to head evaluation of two strategies')
+    parser.add_argument('-a', '--hero', default=BLUEPRINT_PATH, help='blueprint pickle of the evaluated agent')
+    parser.add_argument('-b', '--field', default=BLUEPRINT_PATH, help='blueprint pickle of the opponents')
+    parser.add_argument('--hero-search', default=0, type=int, help='subgame search iterations of the hero (0 for none)')
+    parser.add_argument('--field-search', default=0, type=int, help='subgame search iterations of the opponents (0 for none)')
+    parser.add_argument('-n', '--hands', default=100000, type=int, help='number of hands to play')
+    parser.add_argument('-p', '--processes', default=None, type=int, help='number of processes')
+    parser.add_argument('-s', '--seed', default=0, type=int, help='random seed')
+    args = parser.parse_args()
+
+    result = evaluate({'path': args.hero, 'search': args.hero_search},
+        {'path': args.field, 'search': args.field_search}, args.hands,
+        processes=args.processes, seed=args.seed)
+    print("{} hands: {:.1f} +/- {:.1f} mbb/hand".format(result['hands'], result['mbb_per_hand'], result['ci95']))
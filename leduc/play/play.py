@@ -3,40 +3,106 @@ import random
 import sys
 import os
 import numpy as np
-from pluribus.search.search import NestedSearch
-from pluribus.cfr.mccfr import MonteCarloCFR
-from pluribus.game.card import Card
-from pluribus.game.hand_eval import leduc_eval
-from pluribus.game.state import LeducState
+from copy import copy
+from leduc.search.search import NestedSearch
+from leduc.cfr.mccfr import MonteCarloCFR
+from leduc.game.card import Card
+from leduc.game.hand_eval import leduc_eval
+from leduc.game.state import LeducState
 
+BLUEPRINT_PATH = 'pluribus/blueprint/leduc_strat.p'
+SETTINGS = {'num_players':2, 'num_actions':3, 'hand_eval': leduc_eval,
+    'num_rounds':2, 'num_raises':2, 'raise_size':[2,4],
+    'num_cards': 3, 'game': 'leduc', 'state': LeducState
+}
 
-class Game:
-    def __init__(self):
-        self.cards = [Card(12, 1), Card(13, 1), Card(14, 1), Card(12, 2), Card(13, 2), Card(14, 2)]
-        self.human = True
-        settings = {'num_players':2, 'num_actions':3, 'hand_eval': leduc_eval,
-            'num_rounds':2, 'num_raises':2, 'raise_size':[2,4],
-            'num_cards': 3, 'game': 'leduc', 'state': LeducState
-        }
 
-        self.mccfr = MonteCarloCFR(settings)
-        try:
-            with open('pluribus/blueprint/leduc_strat.p', 'rb') as f:
-                blueprint = pickle.load(f)
+def leduc_cards():
+    return [Card(12, 1), Card(13, 1), Card(14, 1), Card(12, 2), Card(13, 2), Card(14, 2)]
+
+
+def validate_blueprint(node_map, settings=SETTINGS, cards=None):
+    """Checks that a blueprint can play the game of settings
+
+    Every player needs a strategy and the first player to act needs an
+    opening info set for every private card.
+
+    Args:
+        node_map: dict of player -> dict of info set -> InfoSet
+        settings: dict of game settings
+        cards: list of Card of the deck, Leduc if None
+
+    Raises:
+        ValueError: naming what the blueprint is missing
+    """
+    if not isinstance(node_map, dict):
+        raise ValueError('The blueprint is a {}, not a node map'.format(type(node_map).__name__))
+
+    missing = [player for player in range(settings['num_players']) if not node_map.get(player)]
+    if missing:
+        raise ValueError('The blueprint has no strategy for players {}'.format(missing))
+
+    cards = leduc_cards() if cards is None else cards
+    state_json = dict(MonteCarloCFR(settings).state_json)
+    for i, card in enumerate(cards):
+        state_json['cards'] = [card] + cards[:i] + cards[i + 1:]
+        state = settings['state'](state_json)
+        if state.info_set not in node_map[state.turn]:
+            raise ValueError('The blueprint has no opening info set for {}'.format(state.info_set))
 
-            self.mccfr.node_map = blueprint
 
-        except:
-            print('\n\n{}\nNo blueprint strategy was found.\n\
-                \nCreating a new one\n{}\n\n'.format('*'*100, '*'*100)) 
-           
-            self.mccfr.train(self.cards, 20000)
+def load_trainer(path=BLUEPRINT_PATH, settings=SETTINGS):
+    """Loads and validates a blueprint into a trainer games can share
 
-            
-            with open('pluribus/blueprint/leduc_strat.p', 'wb') as f:
-                pickle.dump(self.mccfr.node_map, f)
+    Servers call this once at startup. Building the trainer indexes the
+    whole blueprint by public state, so games take a shallow copy of it
+    (see Game) instead of loading the blueprint again.
 
-        self.state_json = self.mccfr.state_json
+    Args:
+        path: str of the blueprint pickle, see leduc.play.build
+        settings: dict of game settings
+
+    Returns:
+        MonteCarloCFR: trainer holding the blueprint
+
+    Raises:
+        FileNotFoundError: if there is no blueprint at path
+        ValueError: if the blueprint does not fit the game
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError('No blueprint at {}, build one with python -m leduc.play.build -o {}'.format(path, path))
+
+    with open(path, 'rb') as f:
+        blueprint = pickle.load(f)
+    validate_blueprint(blueprint, settings)
+
+    trainer = MonteCarloCFR(settings)
+    trainer.node_map = blueprint
+    return trainer
+
+
+class Game:
+    def __init__(self, pool=None, game_id=None, trainer=None, cache=None):
+        """Sets up a game against the blueprint
+
+        Args:
+            pool: SearchPool solving the subgames, searches run in the
+                caller if None
+            game_id: hashable id of the game in the pool
+            trainer: MonteCarloCFR of load_trainer shared by every game,
+                the blueprint at BLUEPRINT_PATH is loaded if None
+            cache: DecisionCache of precomputed subgame strategies, if any
+        """
+        self.cards = leduc_cards()
+        self.human = True
+        self.pool = pool
+        self.game_id = game_id
+        self.cache = cache
+
+        # subgame solving sets attributes on the trainer, so every game
+        # gets its own shallow copy of the shared one
+        self.mccfr = copy(trainer if trainer is not None else load_trainer())
+        self.state_json = dict(self.mccfr.state_json)
         self.state_json['cards'] = self.cards
 
     def _handle_action(self):
@@ -76,7 +142,8 @@ class Game:
         np.random.shuffle(self.cards)
         print("Cards are {}".format(self.cards))
         state = LeducState(self.state_json)
-        self.search = NestedSearch(self.mccfr, state, 1)
+        self.search = NestedSearch(self.mccfr, state, 1, pool=self.pool, game_id=self.game_id,
+            cache=self.cache)
 
     def state(self):
         if not self.search.terminal:
@@ -0,0 +1,200 @@
+import sys
+import time
+import uuid
+from threading import RLock
+from leduc.cfr.storage import node_size
+
+
+class GameHandle:
+    """A game held by the registry and what it knows about its owner
+
+    Attributes:
+        game_id: str id of the game, also the Socket.IO room of its table
+        player: str name of the player
+        game: Game being played
+        created: float clock time the game was created
+        last_seen: float clock time of the last access
+    """
+    def __init__(self, game_id, player, game, now):
+        self.game_id = game_id
+        self.player = player
+        self.game = game
+        self.created = now
+        self.last_seen = now
+
+    @property
+    def room(self):
+        return self.game_id
+
+
+def game_memory(game):
+    """Estimates the bytes a game holds on top of the shared blueprint
+
+    Only the game's own strategy delta and ranges are counted, the
+    blueprint they overlay is shared by every game.
+
+    Args:
+        game: Game with a started search, or not started yet
+
+    Returns:
+        int: estimated bytes
+    """
+    search = getattr(game, 'search', None)
+    if search is None:
+        return sys.getsizeof(game)
+
+    size = sys.getsizeof(game) + sys.getsizeof(search)
+    for nodes in search.strategy.delta.values():
+        size += sum(node_size(info_set, node) for info_set, node in nodes.items())
+    for ranges in (search.ranges, search.root_ranges):
+        for player_range in ranges.values():
+            size += sys.getsizeof(player_range) + sum(sys.getsizeof(card) for card in player_range)
+
+    return size
+
+
+class GameRegistry:
+    """The games a server is playing, kept server side
+
+    The web session only holds a game id. The registry maps it to the
+    game, gives every game its own room so many tables play at once, and
+    drops games that have been idle for too long or the least recently
+    used ones when there are more than max_games. Every method is thread
+    safe, Socket.IO handlers of different players may run concurrently.
+
+    Attributes:
+        factory: function of game id -> a new Game
+        idle_timeout: float seconds a game may go unused before eviction
+        max_games: int max number of games kept, None for no limit
+        games: dict of game id -> GameHandle
+        created: int number of games created
+        evicted: int number of games dropped for being idle or over max_games
+    """
+    def __init__(self, factory, idle_timeout=1800, max_games=None, clock=time.monotonic):
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.max_games = max_games
+        self.games = {}
+        self.created = 0
+        self.evicted = 0
+        self._clock = clock
+        self._lock = RLock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self.games)
+
+    def __contains__(self, game_id):
+        with self._lock:
+            return game_id in self.games
+
+    def create(self, player, game_id=None):
+        """Starts a new game, replacing the one game_id held if any
+
+        Args:
+            player: str name of the player
+            game_id: str id of the game to replace, a new id if None
+
+        Returns:
+            GameHandle: the handle of the new game
+        """
+        self.evict_idle()
+        if game_id is not None:
+            self.close(game_id)
+        else:
+            game_id = uuid.uuid4().hex
+
+        game = self.factory(game_id)
+        with self._lock:
+            handle = self.games[game_id] = GameHandle(game_id, player, game, self._clock())
+            self.created += 1
+            overflow = len(self.games) - self.max_games if self.max_games is not None else 0
+            if overflow > 0:
+                oldest = sorted((h for h in self.games.values() if h is not handle), key=lambda h: h.last_seen)
+                victims = oldest[:overflow]
+            else:
+                victims = []
+
+        for victim in victims:
+            if self.close(victim.game_id):
+                with self._lock:
+                    self.evicted += 1
+
+        return handle
+
+    def get(self, game_id):
+        """Gets a game and marks it as used
+
+        Args:
+            game_id: str id of the game
+
+        Returns:
+            Game: the game, None if there is none or it was evicted
+        """
+        with self._lock:
+            handle = self.games.get(game_id)
+            if handle is None:
+                return None
+            handle.last_seen = self._clock()
+            return handle.game
+
+    def close(self, game_id):
+        """Drops a game and cancels its queued searches
+
+        Returns:
+            bool: whether there was a game to drop
+        """
+        with self._lock:
+            handle = self.games.pop(game_id, None)
+        if handle is None:
+            return False
+
+        search = getattr(handle.game, 'search', None)
+        if search is not None:
+            search.cancel()
+        return True
+
+    def evict_idle(self, now=None):
+        """Drops every game idle for longer than idle_timeout
+
+        Returns:
+            list: str ids of the dropped games
+        """
+        now = self._clock() if now is None else now
+        with self._lock:
+            idle = [game_id for game_id, handle in self.games.items()
+                if now - handle.last_seen > self.idle_timeout]
+
+        evicted = [game_id for game_id in idle if self.close(game_id)]
+        with self._lock:
+            self.evicted += len(evicted)
+        return evicted
+
+    def memory(self):
+        """Estimates the memory held per game
+
+        Returns:
+            dict: game id -> estimated bytes, see game_memory
+        """
+        with self._lock:
+            handles = list(self.games.values())
+
+        return {handle.game_id: game_memory(handle.game) for handle in handles}
+
+    def stats(self):
+        """Summarizes the registry for the metrics endpoint
+
+        Returns:
+            dict: number of games, games created and evicted, total and
+                largest estimated bytes and the oldest idle time in seconds
+        """
+        memory = self.memory()
+        now = self._clock()
+        with self._lock:
+            idle = [now - handle.last_seen for handle in self.games.values()]
+            stats = {'games': len(self.games), 'created': self.created, 'evicted': self.evicted}
+
+        stats['memory_bytes'] = sum(memory.values())
+        stats['memory_max_bytes'] = max(memory.values(), default=0)
+        stats['idle_max'] = max(idle, default=0)
+        return stats
@@ -0,0 +1,137 @@
+from copy import deepcopy
+from leduc.cfr.node import InfoSet
+from leduc.cfr.index import PublicStateIndex
+
+
+class PlayerOverlay:
+    """One player's info sets seen through a StrategyOverlay
+
+    Reads fall through to the shared blueprint unless the game has its
+    own copy of the info set. Anything that changes a node has to go
+    through writable, which copies the blueprint node into the delta first.
+
+    Attributes:
+        blueprint: dict of info set -> InfoSet shared by every game
+        delta: dict of info set -> InfoSet owned by this game
+        index: PublicStateIndex of the delta
+        player: int of the player the info sets belong to
+    """
+    def __init__(self, blueprint, delta, index, player):
+        self.blueprint = blueprint
+        self.delta = delta
+        self.index = index
+        self.player = player
+
+    def __getitem__(self, info_set):
+        try:
+            return self.delta[info_set]
+        except KeyError:
+            return self.blueprint[info_set]
+
+    def __setitem__(self, info_set, node):
+        if info_set not in self.delta:
+            self.index.add(self.player, info_set)
+        self.delta[info_set] = node
+
+    def __contains__(self, info_set):
+        return info_set in self.delta or info_set in self.blueprint
+
+    def __iter__(self):
+        yield from self.delta
+        for info_set in self.blueprint:
+            if info_set not in self.delta:
+                yield info_set
+
+    def __len__(self):
+        return len(self.blueprint) + sum(1 for info_set in self.delta if info_set not in self.blueprint)
+
+    def get(self, info_set, default=None):
+        try:
+            return self[info_set]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        for info_set in self:
+            yield info_set, self[info_set]
+
+    def writable(self, info_set):
+        """Gets a node that can be changed without touching the blueprint
+
+        Args:
+            info_set: str of the information set
+
+        Returns:
+            InfoSet: this game's copy of the node
+        """
+        try:
+            return self.delta[info_set]
+        except KeyError:
+            node = deepcopy(self.blueprint[info_set])
+            self[info_set] = node
+            return node
+
+    def strategy(self, info_set, actions):
+        """Regret matched strategy of an info set over actions
+
+        InfoSet.strategy adds actions it has not seen before, so the
+        node is copied first if actions holds an off-tree action. Info sets
+        the blueprint never reached (e.g. after an off-tree raise) start
+        out uniform in the delta.
+
+        Args:
+            info_set: str of the information set
+            actions: set of valid actions
+
+        Returns:
+            dict: action -> probability
+        """
+        try:
+            node = self[info_set]
+        except KeyError:
+            node = self[info_set] = InfoSet(actions)
+
+        if not actions <= node.actions:
+            node = self.writable(info_set)
+
+        return node.strategy(actions)
+
+
+class StrategyOverlay:
+    """A copy-on-write view over a shared blueprint strategy
+
+    NestedSearch used to deepcopy the whole blueprint for every game. The
+    overlay keeps the blueprint shared and read-only and stores only the
+    info sets a game changes (off-tree actions, frozen decisions and
+    subgame results) in a small per-game delta.
+
+    Attributes:
+        blueprint: dict of player -> dict of info set -> InfoSet
+        delta: dict of player -> dict of info set -> InfoSet for this game
+        index: PublicStateIndex of the info sets in delta
+    """
+    def __init__(self, blueprint, delta=None):
+        self.blueprint = blueprint
+        self.delta = {} if delta is None else delta
+        self.index = PublicStateIndex.from_node_map(self.delta)
+
+    def __getitem__(self, player):
+        return PlayerOverlay(self.blueprint.get(player, {}), self.delta.setdefault(player, {}),
+            self.index, player)
+
+    def __contains__(self, player):
+        return player in self.blueprint or player in self.delta
+
+    def __iter__(self):
+        return iter(set(self.blueprint) | set(self.delta))
+
+    def __len__(self):
+        return len(set(self.blueprint) | set(self.delta))
+
+    @property
+    def touched(self):
+        """int number of info sets this game holds its own copy of"""
+        return sum(len(nodes) for nodes in self.delta.values())
@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import random
+import shelve
+import time
+from copy import copy
+from threading import Lock
+from leduc.search.search import NestedSearch
+
+
+# shelve key of the blueprint and iteration count the entries were solved with
+META_KEY = '__blueprint__'
+
+
+def fingerprint(blueprint_path, settings):
+    """Hashes a blueprint pickle and the settings it is played with
+
+    Args:
+        blueprint_path: str of the blueprint pickle
+        settings: dict of game settings, classes and functions count by name
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(blueprint_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(repr(sorted((key, getattr(value, '__qualname__', value)) for key, value in settings.items())).encode())
+    return digest.hexdigest()
+
+
+class DecisionCache:
+    """Subgame strategies solved ahead of time, stored on disk
+
+    Most hands go through the same few public states with similar
+    ranges, so NestedSearch looks its subgames up here before solving.
+    A subgame is keyed by its public state, the actions of the
+    abstraction and the players' ranges at its root, each reach
+    probability rounded to a multiple of quantum. Entries are written by
+    fill, servers open the cache read-only and fall back to a live
+    search on a miss. The cache records the fingerprint of the blueprint
+    and the iterations its subgames were solved with, and refuses to open
+    against another blueprint.
+
+    Attributes:
+        path: str of the shelve file
+        quantum: float step the range probabilities are rounded to
+        blueprint: str fingerprint of the blueprint
+        iterations: int iterations of each subgame solve, None if unknown
+        writable: bool of whether put may add entries
+        hits: int number of lookups that found a strategy
+        misses: int number of lookups that did not
+    """
+    def __init__(self, path, blueprint, flag='r', quantum=.05, iterations=None):
+        """Opens the cache
+
+        Args:
+            path: str of the shelve file
+            blueprint: str fingerprint of the blueprint the subgames are
+                solved against
+            flag: str shelve flag, 'r' to read only, 'c' to create or update
+            quantum: float step the range probabilities are rounded to
+            iterations: int iterations of each subgame solve, checked
+                against the cache's when both are known
+
+        Raises:
+            ValueError: if the cache was filled against another blueprint
+                or with another number of iterations
+        """
+        self.path = path
+        self.quantum = quantum
+        self.writable = flag != 'r'
+        self.hits = 0
+        self.misses = 0
+        self._db = shelve.open(path, flag=flag)
+        self._lock = Lock()
+
+        meta = self._db.get(META_KEY)
+        if meta is None and self.writable and len(self._db) == 0:
+            meta = self._db[META_KEY] = {'blueprint': blueprint, 'iterations': iterations}
+        if meta is None or meta['blueprint'] != blueprint:
+            self._db.close()
+            raise ValueError('The decision cache at {} was not filled against this blueprint, '
+                'fill a new one with python -m leduc.search.cache'.format(path))
+        if iterations is not None and meta['iterations'] not in (None, iterations):
+            self._db.close()
+            raise ValueError('The decision cache at {} was filled with {} iterations per subgame, not {}'.format(
+                path, meta['iterations'], iterations))
+        if meta['iterations'] is None and iterations is not None and self.writable:
+            meta = self._db[META_KEY] = dict(meta, iterations=iterations)
+        self.blueprint = blueprint
+        self.iterations = meta['iterations']
+
+    def __len__(self):
+        with self._lock:
+            return len(self._db) - 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._db
+
+    def key(self, public_state, ranges):
+        """Key of the subgame rooted at a state
+
+        Args:
+            public_state: State at the root of the subgame
+            ranges: dict of player -> dict of card -> reach probability
+
+        Returns:
+            str: the public state, the actions and the range signature
+        """
+        signature = ' '.join(','.join('{}:{}'.format(card, round(prob / self.quantum))
+            for card, prob in sorted(player_range.items())) for _, player_range in sorted(ranges.items()))
+
+        return '{} | {} | {}'.format(public_state.public_state, ' '.join(sorted(public_state.actions)), signature)
+
+    def get(self, key):
+        """Gets a cached subgame strategy
+
+        Every call unpickles a fresh copy, so the caller may change it.
+
+        Returns:
+            dict: player -> dict of info set -> InfoSet, None on a miss
+        """
+        with self._lock:
+            strategy = self._db.get(key)
+            if strategy is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return strategy
+
+    def put(self, key, strategy):
+        """Stores a subgame strategy (see MonteCarloCFR.subgame_solve)"""
+        if not self.writable:
+            raise ValueError('The decision cache at {} is read-only'.format(self.path))
+
+        with self._lock:
+            self._db[key] = {player: dict(nodes) for player, nodes in strategy.items()}
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._db) - 1, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def fill(cache, trainer, cards, hands, iterations=1000, seed=0):
+    """Solves the subgames reached in blueprint self-play into a cache
+
+    Hands are played with a NestedSearch for a rotating seat against
+    opponents playing the blueprint, so subgames are solved roughly in
+    proportion to how often real hands reach them. Subgames already in
+    the cache are not solved again.
+
+    Args:
+        cache: DecisionCache opened for writing
+        trainer: MonteCarloCFR holding the blueprint
+        cards: list of Card of the deck
+        hands: int number of hands to play
+        iterations: int number of iterations of each subgame solve
+        seed: int random seed
+
+    Returns:
+        int: number of subgames added to the cache
+    """
+    random.seed(seed)
+    before = len(cache)
+    state_json = dict(trainer.state_json)
+    num_players = trainer.num_players
+
+    for hand in range(hands):
+        state_json['cards'] = random.sample(cards, len(cards))
+        state = trainer.state(state_json)
+        search = NestedSearch(copy(trainer), state, hand % num_players, verbose=0, cache=cache)
+        search.iterations = iterations
+
+        while not search.terminal:
+            if search.turn == search.leduc:
+                search.traverser_turn()
+            else:
+                abstract_state = search.abstract_state
+                strategy = search.strategy[search.turn].strategy(abstract_state.info_set,
+                    abstract_state.valid_actions)
+                search.opponent_turn(random.choices(list(strategy), weights=list(strategy.values()))[0])
+            search.check_new_round()
+
+    return len(cache) - before
+
+
+if __name__ == '__main__':
+    from leduc.play.play import BLUEPRINT_PATH, SETTINGS, load_trainer, leduc_cards
+
+    parser = argparse.ArgumentParser(description='Fills the decision cache with the subgames of blueprint self-play')
+    parser.add_argument('-b', '--blueprint', default=BLUEPRINT_PATH, help='path of the blueprint pickle')
+    parser.add_argument('-o', '--output', required=True, help='path of the decision cache')
+    parser.add_argument('-n', '--hands', default=1000, type=int, help='number of self-play hands')
+    parser.add_argument('-i', '--iterations', default=1000, type=int, help='iterations of each subgame solve')
+    parser.add_argument('-q', '--quantum', default=.05, type=float, help='rounding step of the range signature')
+    parser.add_argument('-s', '--seed', default=0, type=int, help='random seed')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    trainer = load_trainer(args.blueprint)
+    cache = DecisionCache(args.output, fingerprint(args.blueprint, SETTINGS), 'c', args.quantum, args.iterations)
+    added = fill(cache, trainer, leduc_cards(), args.hands, args.iterations, args.seed)
+    print("{} subgames added in {:.1f}s, {} in {}".format(added, time.perf_counter() - start, len(cache), args.output))
+    cache.close()
@@ -0,0 +1,199 @@
+import os
+import time
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from leduc.game.tree import Subgame
+from leduc.search.blueprint import StrategyOverlay
+
+# every worker process holds one trainer wrapping the shared blueprint
+_trainer = None
+
+
+def _init_worker(settings, blueprint):
+    """Sets up the subgame solver of a worker process
+
+    With the fork start method the blueprint is inherited from the
+    parent rather than pickled, so every worker reads the same
+    copy-on-write pages.
+
+    Args:
+        settings: dict of game settings used to build the MonteCarloCFR
+        blueprint: dict of the blueprint node map
+    """
+    global _trainer
+    from leduc.cfr.mccfr import MonteCarloCFR
+    _trainer = MonteCarloCFR(settings)
+    _trainer.node_map = blueprint
+
+
+def _warm(delay):
+    """Builds the per process caches of a worker (the betting tree)
+
+    Returns:
+        int: pid of the worker
+    """
+    _trainer.state(dict(_trainer.state_json, cards=None))
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _solve(public_state, iterations, delta, ranges):
+    """Solves the subgame rooted at public_state inside a worker
+
+    Args:
+        public_state: State at the root of the subgame
+        iterations: int number of subgame iterations to run
+        delta: dict of the game's StrategyOverlay delta
+        ranges: dict of player -> dict of card -> reach probability, or None
+
+    Returns:
+        dict: player -> dict of info set -> InfoSet of the subgame strategy
+    """
+    overlay = StrategyOverlay(_trainer.node_map, delta)
+    subgame = Subgame(public_state, ranges)
+    tree = subgame.build_tree(overlay)
+    strategy = _trainer.subgame_solve(tree, overlay, iterations, progress=False)
+
+    return {player: dict(nodes) for player, nodes in strategy.items()}
+
+
+class SearchPool:
+    """A pool of processes that solve subgames in the background
+
+    Games submit search jobs and keep playing (or wait on the result)
+    instead of solving inside the caller, so one slow search does not
+    hold up every other game served by the same process.
+
+    Attributes:
+        workers: int number of worker processes
+        executor: ProcessPoolExecutor running the subgame solves
+        jobs: dict of game id -> set of outstanding futures
+        latencies: deque of the most recent job latencies in seconds
+        completed: int number of jobs that finished
+        cancelled: int number of jobs cancelled before they finished
+        failed: int number of jobs that raised
+    """
+    def __init__(self, settings, blueprint, workers=None, history=1000):
+        """Starts the worker processes
+
+        Args:
+            settings: dict of game settings used to build the MonteCarloCFR
+            blueprint: dict of the blueprint node map shared by all workers
+            workers: int number of processes, defaults to the cpu count
+            history: int number of latencies kept for the metrics
+        """
+        if 'fork' in mp.get_all_start_methods():
+            context = mp.get_context('fork')
+        else:
+            context = mp.get_context()
+
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+            initializer=_init_worker, initargs=(settings, blueprint))
+        self.jobs = {}
+        self.latencies = deque(maxlen=history)
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self._lock = Lock()
+
+    def prewarm(self, delay=.1):
+        """Starts every worker and waits until it is ready to solve
+
+        Worker processes are started on demand and import the trainer and
+        build their caches on their first job. Prewarming does that at
+        startup, so the first searches are not slower than later ones.
+
+        Args:
+            delay: float seconds each warm up job holds its worker, so
+                that the jobs land on different workers
+
+        Returns:
+            int: number of distinct workers that answered
+        """
+        futures = [self.executor.submit(_warm, delay) for _ in range(self.workers)]
+        return len(set(future.result() for future in futures))
+
+    def submit(self, game_id, public_state, iterations, delta=None, ranges=None):
+        """Queues a subgame solve for a game
+
+        Args:
+            game_id: hashable id of the game submitting the job
+            public_state: State at the root of the subgame
+            iterations: int number of subgame iterations to run
+            delta: dict of the game's StrategyOverlay delta, if any
+            ranges: dict of player -> dict of card -> reach probability, if any
+
+        Returns:
+            Future: resolves to the subgame strategy returned by _solve
+        """
+        start = time.monotonic()
+        future = self.executor.submit(_solve, public_state, iterations, delta or {}, ranges)
+        with self._lock:
+            self.jobs.setdefault(game_id, set()).add(future)
+
+        future.add_done_callback(lambda f: self._finish(game_id, f, start))
+        return future
+
+    def _finish(self, game_id, future, start):
+        with self._lock:
+            futures = self.jobs.get(game_id)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self.jobs[game_id]
+
+            if future.cancelled():
+                self.cancelled += 1
+            elif future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+                self.latencies.append(time.monotonic() - start)
+
+    def cancel(self, game_id):
+        """Cancels every queued job of a game
+
+        Jobs that already started keep running in their worker, but their
+        futures are dropped so the result is never merged.
+
+        Args:
+            game_id: hashable id of the game
+
+        Returns:
+            int: number of jobs that were cancelled before starting
+        """
+        with self._lock:
+            futures = list(self.jobs.pop(game_id, ()))
+
+        return sum(future.cancel() for future in futures)
+
+    @property
+    def queue_depth(self):
+        with self._lock:
+            return sum(len(futures) for futures in self.jobs.values())
+
+    def stats(self):
+        """Summarizes the queue depth and latency of the pool
+
+        Returns:
+            dict: queue depth, job counters and latency percentiles in seconds
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = {'queue_depth': sum(len(futures) for futures in self.jobs.values()),
+                'games': len(self.jobs), 'completed': self.completed,
+                'cancelled': self.cancelled, 'failed': self.failed}
+
+        if latencies:
+            stats['latency_mean'] = sum(latencies) / len(latencies)
+            stats['latency_p50'] = latencies[len(latencies) // 2]
+            stats['latency_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * .95))]
+            stats['latency_max'] = latencies[-1]
+
+        return stats
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,22 +1,35 @@
 import random
-from copy import deepcopy
+from copy import copy, deepcopy
 from leduc.cfr.mccfr import MonteCarloCFR
 from leduc.game.tree import Subgame
+from leduc.search.blueprint import StrategyOverlay
+from leduc.search.translation import ActionTranslator
 class NestedSearch:
     # we need to figure out a way to 'freeze' infosets for actions that have already occured
     # basically we don't want to calculate new strategy for that action just everything after
     # again if we are passing things make sure we copy everything
     # 
     # we need to figure out a way to speed up subgame solving
-    def __init__(self, mccfr, hand, traverser, verbose=1):
+    def __init__(self, mccfr, hand, traverser, verbose=1, pool=None, game_id=None, cache=None):
         self.game_state = hand
-        self.public_state = hand
+        self.abstract_state = copy(hand)
+        self.public_state = self.abstract_state
         self.mccfr = mccfr
-        self.strategy = mccfr.node_map
+        self.blueprint = mccfr.node_map
+        self.strategy = StrategyOverlay(self.blueprint)
+        self.index = mccfr.public_index
+        self.translator = ActionTranslator.from_state(hand)
+        deck = [str(card) for card in hand.cards]
+        self.ranges = {player: {card: 1 / len(deck) for card in deck} for player in range(hand.num_players)}
+        self.root_ranges = deepcopy(self.ranges)
         self.leduc = traverser
         self.cards = deepcopy(hand.cards)
-        self.blueprint = deepcopy(mccfr.node_map)
         self.verbose = verbose
+        self.iterations = 1000
+        self.pool = pool
+        self.game_id = game_id if game_id is not None else id(self)
+        self.cache = cache
+        self._pending = None
 
     @property
     def turn(self):
@@ -32,56 +45,157 @@ class NestedSearch:
 
     @property
     def info_set(self):
-        return self.game_state.info_set
+        return self.abstract_state.info_set
 
     @property
     def payoff(self):
         return self.game_state.payoff()
 
     def search(self):
-        subgame = Subgame(self.public_state)
+        """Solves the subgame rooted at the current public state
+
+        A strategy found in the DecisionCache is merged right away. On a
+        miss, with a SearchPool the solve is queued in the background and
+        merged the next time the strategy is needed, otherwise it runs
+        here (and is added to the cache if it is writable).
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.public_state, self.root_ranges)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cancel()
+                self.merge(cached)
+                return
+
+        if self.pool is not None:
+            self.cancel()
+            delta = {player: dict(nodes) for player, nodes in self.strategy.delta.items()}
+            self._pending = self.pool.submit(self.game_id, copy(self.public_state), self.iterations,
+                delta, self.root_ranges)
+            return
+
+        subgame = Subgame(self.public_state, self.root_ranges)
         tree = subgame.build_tree(self.strategy)
         strat = self.strategy
 
-        subgame_strategy = self.mccfr.subgame_solve(tree, strat, 1000)
+        subgame_strategy = self.mccfr.subgame_solve(tree, strat, self.iterations, progress=bool(self.verbose))
+        if key is not None and self.cache.writable:
+            self.cache.put(key, subgame_strategy)
+        self.merge(subgame_strategy)
 
+    def wait(self):
+        """Blocks until a queued search has finished and merges its result"""
+        if self._pending is not None:
+            future, self._pending = self._pending, None
+            self.merge(future.result())
+
+    def cancel(self):
+        """Drops the queued search of this game, if there is one"""
+        if self._pending is not None:
+            self._pending = None
+            self.pool.cancel(self.game_id)
+
+    def merge(self, subgame_strategy):
         for player in self.strategy:
             strat = self.strategy[player]
-            for key in subgame_strategy[player]:
+            for key, subgame_node in subgame_strategy.get(player, {}).items():
                 if key not in strat:
-                    strat[key] = subgame_strategy[player][key]
+                    strat[key] = subgame_node
                 else:
-                    strat[key].strategy_sum = {k:value + subgame_strategy[player][key].strategy_sum[k] for k, value in strat[key].strategy_sum.items()}
+                    node = strat.writable(key)
+                    node.strategy_sum = {k:value + subgame_node.strategy_sum.get(k, 0) for k, value in node.strategy_sum.items()}
+
+    def public_info_sets(self, player, public_state):
+        """Gets every info set of a player at a public state
+
+        Args:
+            player: int of the player
+            public_state: str of the public state
+
+        Returns:
+            set: str of the info sets in the blueprint or this game's delta
+        """
+        info_sets = set(self.index.info_sets(player, public_state))
+        info_sets.update(self.strategy.index.info_sets(player, public_state))
+
+        return info_sets
+
+    def update_range(self, player, public_state, action, valid_actions):
+        """Conditions a player's range on the action they played
+
+        Every card of the range is weighted by the probability that the
+        current (regret matched) strategy plays action from the info set
+        holding that card, the strategy traverser_turn samples from. Cards
+        whose info set is in neither the blueprint nor the delta play the
+        uniform strategy a new node starts with. If the strategy never plays
+        the action with any card, the range is left as it was.
+
+        Args:
+            player: int of the player that acted
+            public_state: str of the public state the action was played in
+            action: str of the abstract action played
+            valid_actions: set of str of the actions valid at public_state
+        """
+        new_range = dict(self.ranges[player])
+        player_nodes = self.strategy[player]
+        for card, prob in new_range.items():
+            if prob > 0:
+                info_set = '{} || {}'.format(card, public_state)
+                new_range[card] = prob * player_nodes.strategy(info_set, valid_actions).get(action, 0)
+
+        norm_sum = sum(new_range.values())
+        if norm_sum > 0:
+            self.ranges[player] = {card: prob / norm_sum for card, prob in new_range.items()}
 
     def opponent_turn(self, action):
+        """Plays an opponent action
+
+        Off-tree raises are translated onto the abstraction's raise sizes
+        for the strategy lookups. The real action is still played in
+        game_state. Only when the translation is too far off is the
+        action added to the abstraction and the subgame searched again.
+
+        Args:
+            action: str of the action played
+        """
+        self.wait()
         player = self.turn
-        info_set = self.game_state.info_set
-        node = self.strategy[player][info_set]
+        player_nodes = self.strategy[player]
+        node = player_nodes.get(self.abstract_state.info_set)
+        known = node.curr_strategy.keys() if node is not None else ()
         
         amount = None
         if len(action) > 1:
             amount = int(action[:-1])
 
-        if action not in node.curr_strategy.keys() and amount != self.public_state.raise_size[self.public_state.round]:
-            self.public_state.actions.add(action)
-            public_state = self.public_state.public_state
-            for state, node in self.strategy[player].items():
-                if public_state in state:
-                    node.add_action(action)
+        abstract_action = action
+        if action not in known and amount is not None and amount != self.public_state.raise_size[self.abstract_state.round]:
+            abstract_action, error = self.translator.translate(self.abstract_state, amount)
+            if not self.translator.is_close(error):
+                abstract_action = action
+                self.public_state.actions.add(action)
+                self.translator = ActionTranslator.from_state(self.public_state)
+                public_state = self.abstract_state.public_state
+                for state in self.public_info_sets(player, public_state):
+                    player_nodes.writable(state).add_action(action)
 
-            self.search()
+                self.search()
 
         if self.verbose:
             print("player {} played {}".format(player, action), flush=True)
 
+        self.update_range(player, self.abstract_state.public_state, abstract_action,
+            self.abstract_state.valid_actions)
         self.game_state = self.game_state.add(player, action)
+        self.abstract_state = self.abstract_state.add(player, abstract_action)
 
     def traverser_turn(self):
-        info_set = self.game_state.info_set
+        self.wait()
+        info_set = self.abstract_state.info_set
         player_nodes = self.strategy[self.leduc]
-        node = player_nodes[info_set]
-        valid_actions = self.game_state.valid_actions
-        strategy = node.strategy(valid_actions)
+        valid_actions = self.abstract_state.valid_actions
+        strategy = player_nodes.strategy(info_set, valid_actions)
         actions = list(strategy.keys())
         prob = list(strategy.values())
 
@@ -89,13 +203,16 @@ class NestedSearch:
         if self.verbose:
             print("leduc played {}".format(action))
 
+        self.update_range(self.leduc, self.abstract_state.public_state, action, valid_actions)
         self.game_state = self.game_state.add(self.leduc, action)
-        player_nodes[info_set].is_frozen = True
+        self.abstract_state = self.abstract_state.add(self.leduc, action)
+        player_nodes.writable(info_set).is_frozen = True
 
         return action
 
     def check_new_round(self):
         if self.terminal:
+            self.cancel()
             if self.verbose:
                 print("The game has ended")
                 payoffs = self.game_state.payoff()
@@ -110,7 +227,8 @@ class NestedSearch:
         if self.game_state.round > self.public_state.round:
             if self.verbose:
                 print("New round. The current state of the game is {}".format(self.game_state.public_state))
-            self.public_state = self.game_state
+            self.public_state = self.abstract_state
+            self.root_ranges = deepcopy(self.ranges)
             self.search()
             return True
 
@@ -0,0 +1,136 @@
+import random
+import numpy as np
+from bisect import bisect_left
+
+
+_translators = {}
+
+
+def pseudo_harmonic(a, b, x):
+    """Probability of mapping bet x onto the smaller abstract bet a
+
+    Pseudo-harmonic action mapping from Ganzfried and Sandholm, with every
+    size given as a fraction of the pot and a <= x <= b.
+
+    Args:
+        a: float of the smaller abstract bet
+        b: float of the larger abstract bet
+        x: float of the bet to translate
+
+    Returns:
+        float: probability of choosing a, b is chosen otherwise
+    """
+    return ((b - x) * (1 + a)) / ((b - a) * (1 + x))
+
+
+class ActionTranslator:
+    """Maps off-tree raise sizes onto the raise sizes of the abstraction
+
+    The pseudo-harmonic mapping depends on the raise amount and the pot,
+    so it is precomputed for every (pot, amount) pair up to max_pot and
+    max_amount. Translating a raise is then a table lookup and a single
+    random draw. Raises outside the table fall back to computing it.
+
+    Attributes:
+        sizes: list per round of sorted (raise amount, action) pairs, a
+            call being a raise of 0
+        max_error: float above which the translation is not trusted
+        tables: list per round of (lower, upper, p_lower, error) arrays
+    """
+    def __init__(self, sizes, max_error=.25, max_pot=128, max_amount=64):
+        """Precomputes the interpolation tables
+
+        Args:
+            sizes: list per round of (raise amount, action) pairs
+            max_error: float of the largest relative error still translated
+            max_pot: int largest pot of the tables
+            max_amount: int largest raise amount of the tables
+        """
+        self.sizes = [sorted(round_sizes) for round_sizes in sizes]
+        self.max_error = max_error
+        self.tables = [self._table(round_sizes, max_pot, max_amount) for round_sizes in self.sizes]
+
+    @classmethod
+    def from_state(cls, state, **kwargs):
+        """Builds a translator for the raise sizes of a State
+
+        Each round translates between calling (a raise of 0), the round's
+        raise size and every raise of a fixed amount (e.g. '6R') added to
+        the state's actions, so a raise randomizes between the two abstract
+        sizes around it and a small one may become a call.
+
+        Translators are read-only, so one is built per abstraction and
+        shared by every game.
+
+        Args:
+            state: State whose raise_size per round and actions are the
+                abstraction
+
+        Returns:
+            ActionTranslator: translator onto the actions of each round
+        """
+        raises = sorted((int(a[:-1]), a) for a in state.actions if len(a) > 1 and a.endswith('R') and a[:-1].isdigit())
+        key = (tuple(state.raise_size), tuple(raises), tuple(sorted(kwargs.items())))
+        try:
+            return _translators[key]
+        except KeyError:
+            sizes = [[(0, 'C'), (size, 'R')] + [r for r in raises if r[0] != size] for size in state.raise_size]
+            translator = _translators[key] = cls(sizes, **kwargs)
+            return translator
+
+    def _table(self, sizes, max_pot, max_amount):
+        amounts = np.array([size for size, _ in sizes], dtype=float)
+        x = np.arange(max_amount + 1, dtype=float)
+        pot = np.arange(1, max_pot + 1, dtype=float)[:, None]
+
+        upper = np.minimum(np.searchsorted(amounts, x), len(amounts) - 1)
+        lower = np.maximum(upper - 1, 0)
+        inside = (x > amounts[0]) & (x <= amounts[-1])
+        lower = np.where(inside, lower, upper)
+
+        a = amounts[lower] / pot
+        b = amounts[upper] / pot
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_lower = np.where(inside & (upper != lower), pseudo_harmonic(a, b, x / pot), 1.)
+
+        # expected error over the two bracketing sizes the raise maps onto
+        error = (p_lower * np.abs(x - amounts[lower]) + (1 - p_lower) * np.abs(amounts[upper] - x)) / np.maximum(x, 1)
+
+        return lower, upper, p_lower, error
+
+    def _lookup(self, round, pot, amount):
+        lower, upper, p_lower, error = self.tables[round]
+        if 1 <= pot <= p_lower.shape[0] and 0 <= amount < len(lower):
+            return lower[amount], upper[amount], p_lower[pot - 1, amount], error[pot - 1, amount]
+
+        amounts = [size for size, _ in self.sizes[round]]
+        up = min(bisect_left(amounts, amount), len(amounts) - 1)
+        low = up - 1 if amounts[0] < amount <= amounts[-1] else up
+        p = 1.
+        if low != up:
+            p = pseudo_harmonic(amounts[low] / pot, amounts[up] / pot, amount / pot)
+        error = p * abs(amount - amounts[low]) + (1 - p) * abs(amounts[up] - amount)
+
+        return low, up, p, error / max(amount, 1)
+
+    def translate(self, state, amount):
+        """Translates a raise of the player to act in state
+
+        Args:
+            state: State the raise is made in
+            amount: int the raise is on top of calling
+
+        Returns:
+            str: the abstract action, a raise or a call
+            float: expected relative error between amount and the abstract
+                sizes bracketing it
+        """
+        player = state.turn
+        pot = sum(state.bets) + max(state.bets) - state.bets[player]
+        lower, upper, p_lower, error = self._lookup(state.round, int(pot), int(amount))
+        index = lower if random.random() < p_lower else upper
+
+        return self.sizes[state.round][index][1], float(error)
+
+    def is_close(self, error):
+        return error <= self.max_error
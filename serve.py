@@ -1,11 +1,58 @@
-from flask import Flask, render_template, request, session, flash, redirect
+import argparse
+import uuid
+from flask import Flask, render_template, request, session, flash, redirect, jsonify
 from flask_socketio import SocketIO, join_room, leave_room, emit
-from leduc.play.play import Game
+from leduc.play.registry import GameRegistry
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'poker'
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 socketio = SocketIO(app)
+trainer = None
+search_pool = None
+decision_cache = None
+
+def new_game(game_id):
+    from leduc.play.play import Game
+    return Game(pool=search_pool, game_id=game_id, trainer=trainer, cache=decision_cache)
+
+# games live server side, the session only holds the game id
+registry = GameRegistry(new_game, idle_timeout=1800, max_games=1000)
+
+def setup(blueprint_path=None, workers=None, cache_path=None):
+    """Loads the blueprint and starts the search pool, once per server
+
+    Runs before the server accepts connections, so a missing or broken
+    blueprint stops the server at startup and the first hand pays for
+    no loading, imports or process start ups that later hands do not.
+
+    Args:
+        blueprint_path: str of the blueprint pickle, see leduc.play.build
+        workers: int number of search processes, defaults to the cpu count
+        cache_path: str of a DecisionCache filled by leduc.search.cache
+            against the same blueprint, every subgame is searched live if
+            None
+    """
+    global trainer, search_pool, decision_cache
+    from leduc.play.play import BLUEPRINT_PATH, SETTINGS, load_trainer
+    from leduc.search.pool import SearchPool
+    from leduc.search.cache import DecisionCache, fingerprint
+
+    blueprint_path = blueprint_path or BLUEPRINT_PATH
+    trainer = load_trainer(blueprint_path)
+    if cache_path is not None:
+        decision_cache = DecisionCache(cache_path, fingerprint(blueprint_path, SETTINGS))
+
+    search_pool = SearchPool(trainer.json, trainer.node_map, workers)
+    search_pool.prewarm()
+
+    # builds the caches a game start needs (betting tree, translator)
+    handle = registry.create('warm up')
+    handle.game.start_game()
+    registry.close(handle.game_id)
+
+def current_game():
+    return registry.get(session.get('game_id'))
 
 @app.route('/', methods=['GET', 'POST'])
 def hello_world():
@@ -13,7 +60,6 @@ def hello_world():
         if len(request.form['name']) < 1:
             flash('Pick a name')
         else:
-            session['room'] = 'room'
             session['name'] = request.form['name']
             return redirect('/play')
 
@@ -24,11 +70,22 @@ def start_game():
     if request.method == 'GET':
         return render_template('game.html') 
 
+@app.route('/metrics')
+def metrics():
+    stats = {'registry': registry.stats()}
+    if search_pool is not None:
+        stats['search'] = search_pool.stats()
+    if decision_cache is not None:
+        stats['cache'] = decision_cache.stats()
+
+    return jsonify(stats)
+
 @socketio.on('joined', namespace='/chat')
 def joined(message):
     """Sent by clients when they enter a room.
-    A status message is broadcast to all people in the room."""
-    room = session.get('room')
+    A status message is broadcast to all people in the room.
+    Every player gets a room of their own, named after their game."""
+    room = session.setdefault('game_id', uuid.uuid4().hex)
     join_room(room)
     emit('status', {'msg': session.get('name') + ' has entered the room.'}, room=room)
 
@@ -36,25 +93,27 @@ def joined(message):
 def text(message):
     """Sent by a client when the user entered a new message.
     The message is sent to all people in the room."""
-    room = session.get('room')
+    room = session.get('game_id')
     emit('message', {'msg': session.get('name') + ': ' + message['msg']}, room=room)
 
 @socketio.on('left', namespace='/chat')
 def left(message):
     """Sent by clients when they leave a room.
     A status message is broadcast to all people in the room."""
-    room = session.get('room')
+    room = session.get('game_id')
     leave_room(room)
+    registry.close(session.pop('game_id', None))
     emit('status', {'msg': session.get('name') + ' has left the room.'}, room=room)
 
 @socketio.on('start', namespace='/chat')
 def start(message):
-    room = session.get('room')
-    game = Game()
+    handle = registry.create(session.get('name'), session.get('game_id'))
+    session['game_id'] = room = handle.game_id
+    join_room(room)
+    game = handle.game
     game.start_game()
     emit('status', {'msg': "Starting the game. You are player 1"}, room=room)
     emit('status', {'msg': 'Your private card is {}'.format(game.cards[0])})
-    session['game'] = game
 
     if game.state() == 0:
         emit('status', {'msg': "It's your turn. Choose an action"})
@@ -66,7 +125,11 @@ def start(message):
 
 @socketio.on('turn', namespace='/chat')
 def turn(message):
-    game = session.get('game')
+    game = current_game()
+    if game is None:
+        emit('status', {'msg': "Your game has expired. Start a new one"})
+        return
+
     if game.state() == 0:
         action = message['action']
         if message['action'] == 'Fold':
@@ -101,4 +164,12 @@ def turn(message):
     
 
 if __name__ == '__main__':
-    socketio.run(app, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Serves games against the blueprint')
+    parser.add_argument('-b', '--blueprint', default=None, help='path of the blueprint pickle')
+    parser.add_argument('-w', '--workers', default=None, type=int, help='number of search processes')
+    parser.add_argument('-c', '--cache', default=None, help='path of a decision cache of precomputed subgames')
+    args = parser.parse_args()
+
+    setup(args.blueprint, args.workers, args.cache)
+    # the reloader would start a second server process, loading everything again
+    socketio.run(app, debug=True, use_reloader=False)
\ No newline at end of file
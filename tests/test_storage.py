@@ -0,0 +1,28 @@
+from leduc.cfr import configs
+from leduc.cfr.storage import ArrayTable, regret_range
+
+
+def test_held_node_survives_resize():
+    trainer, _ = configs.make(dict(configs.CONFIGS['mccfr-leduc2'], storage='array'))
+    node = trainer.get_node(0, 'Ks || A')
+    node.regret_sum['C'] = 5
+    node.strategy_sum['C'] = 1
+    for i in range(40):
+        trainer.get_node(0, 'Ks || {}'.format(i))
+    trainer.node_map[0].add_action('R2')
+
+    node.regret_sum['C'] = 7
+    node.strategy_sum['C'] = 2
+    stored = trainer.node_map[0]['Ks || A']
+    assert stored.regret_sum['C'] == 7
+    assert stored.strategy_sum['C'] == 2
+
+
+def test_int16_keeps_pruning_above_the_floor():
+    trainer, _ = configs.make(dict(configs.CONFIGS['mccfr-leduc2'], storage='array', regret_dtype='int16'))
+    table = trainer.get_node(0, 'Ks || A').table
+    assert table.floor == regret_range('int16', None, 1.03 * -300000)[1]
+    assert table.floor < trainer.regret_minimum < 0
+
+    trainer, _ = configs.make(dict(configs.CONFIGS['mccfr-leduc2'], storage='array'))
+    assert trainer.regret_minimum == -300000